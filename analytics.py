@@ -3,13 +3,32 @@
 """
 
 import os
-from typing import List, Dict, Optional
-from datetime import datetime
+import threading
+from collections import Counter
+from typing import Any, Callable, List, Dict, Iterable, Iterator, Optional
+import math
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, timedelta
+from itertools import chain
 from constants import (
     STATUS_PENDING, STATUS_DONE,
     FIELD_ID, FIELD_DESCRIPTION, FIELD_STATUS,
-    FIELD_CREATED_AT, FIELD_COMPLETED_AT
+    FIELD_CREATED_AT, FIELD_COMPLETED_AT, FIELD_CATEGORY, FIELD_PRIORITY,
+    EVENT_DELETED, EVENT_CLEARED, EVENT_DONE,
+    COMPLETION_TIME_QUANTILES, SKETCH_RELATIVE_ACCURACY, GRANULARITY_DAY,
+    TASK_OVERLOAD_THRESHOLD, FORECAST_WINDOW_DAYS, FORECAST_EWMA_ALPHA,
+    MSG_FORECAST_HEADER, MSG_FORECAST_RATES, MSG_FORECAST_CLEAR, MSG_FORECAST_NO_CLEAR,
+    MSG_FORECAST_EMPTY, MSG_FORECAST_THRESHOLD, MSG_FORECAST_OVER_THRESHOLD,
+    MSG_EXPORT_SUCCESS, MSG_EXPORT_FAILED, REPORT_WRITE_BUFFER,
+    REPORT_TASK_FIELDS, REPORT_TASK_HEADERS, REPORT_FORMAT_TXT, REPORT_FILE_STEM,
+    ANALYSIS_CACHE_SIZE, REPORT_CACHE_MAX_CHARS, META_COMPLETION_PREFIX
 )
+from exporters import get_exporter
+from indexes import TaskIndex
+from rollups import DailyRollups
+from sketches import QuantileSketch
+from task_table import TaskTable
+from timestamps import to_epoch_us
 
 
 # ==================== 统计计算器 ====================
@@ -22,7 +41,7 @@ class TaskStatistics:
         初始化统计计算器
 
         Args:
-            tasks: 任务列表
+            tasks: 任务列表，或列式任务表 TaskTable（按列计数）
         """
         self.tasks = tasks
 
@@ -32,10 +51,14 @@ class TaskStatistics:
 
     def calculate_completed(self) -> int:
         """计算已完成任务数"""
+        if isinstance(self.tasks, TaskTable):
+            return self.tasks.count(FIELD_STATUS, STATUS_DONE)
         return len([t for t in self.tasks if t.status == STATUS_DONE])
 
     def calculate_pending(self) -> int:
         """计算待办任务数"""
+        if isinstance(self.tasks, TaskTable):
+            return self.tasks.count(FIELD_STATUS, STATUS_PENDING)
         return len([t for t in self.tasks if t.status == STATUS_PENDING])
 
     def get_completion_rate(self) -> float:
@@ -58,6 +81,9 @@ class TaskStatistics:
         Returns:
             分类统计字典 {分类名: 任务数}
         """
+        if isinstance(self.tasks, TaskTable):
+            return self.tasks.distribution(FIELD_CATEGORY)
+
         stats = {}
         for task in self.tasks:
             category = getattr(task, 'category', 'General')
@@ -71,26 +97,300 @@ class TaskStatistics:
         Returns:
             优先级统计字典 {优先级: 任务数}
         """
+        if isinstance(self.tasks, TaskTable):
+            return self.tasks.distribution(FIELD_PRIORITY)
+
         stats = {}
         for task in self.tasks:
             priority = getattr(task, 'priority', 'Medium')
             stats[priority] = stats.get(priority, 0) + 1
         return stats
 
+    def to_dict(self) -> Dict:
+        """
+        汇总全部统计
+
+        Returns:
+            {total, completed, pending, completion_rate, by_category, by_priority}
+        """
+        return {
+            'total': self.calculate_total(),
+            'completed': self.calculate_completed(),
+            'pending': self.calculate_pending(),
+            'completion_rate': self.get_completion_rate(),
+            'by_category': self.get_stats_by_category(),
+            'by_priority': self.get_priority_distribution()
+        }
+
+
+class RunningStatistics(TaskStatistics):
+    """增量统计 - 由任务管理器的变更事件维护计数器
+
+    接口与 TaskStatistics 相同，但每项统计都是O(1)读取计数器，
+    不再遍历任务列表。
+    """
+
+    def __init__(self, tasks=()):
+        """
+        初始化增量统计
+
+        Args:
+            tasks: 初始任务列表（只在此处遍历一次）
+        """
+        super().__init__([])
+        self.reset(tasks)
+
+    def reset(self, tasks):
+        """根据任务列表重新计数"""
+        self._total = 0
+        self._counters = {field: Counter() for field in TaskIndex.FIELDS}
+        for task in tasks:
+            self._apply(TaskIndex.keys_of(task), 1)
+
+    def on_event(self, event: str, task, previous: Optional[Dict[str, str]]):
+        """
+        处理任务变更事件
+
+        Args:
+            event: 事件类型
+            task: 变更的任务
+            previous: 变更前的 {status, category, priority}，新增时为None
+        """
+        if previous is not None:
+            self._apply(tuple(previous[field] for field in TaskIndex.FIELDS), -1)
+        if event not in (EVENT_DELETED, EVENT_CLEARED):
+            self._apply(TaskIndex.keys_of(task), 1)
+
+    def copy(self) -> 'RunningStatistics':
+        """当前计数的副本，不再随变更事件更新"""
+        frozen = RunningStatistics()
+        frozen._total = self._total
+        frozen._counters = {field: Counter(counter) for field, counter in self._counters.items()}
+        return frozen
+
+    def calculate_total(self) -> int:
+        """计算总任务数"""
+        return self._total
+
+    def calculate_completed(self) -> int:
+        """计算已完成任务数"""
+        return self._counters[FIELD_STATUS][STATUS_DONE]
+
+    def calculate_pending(self) -> int:
+        """计算待办任务数"""
+        return self._counters[FIELD_STATUS][STATUS_PENDING]
+
+    def get_stats_by_category(self) -> Dict[str, int]:
+        """按分类统计任务数量"""
+        return self._distribution(FIELD_CATEGORY)
+
+    def get_priority_distribution(self) -> Dict[str, int]:
+        """获取优先级分布"""
+        return self._distribution(FIELD_PRIORITY)
+
+    def _distribution(self, field: str) -> Dict[str, int]:
+        return {value: count for value, count in self._counters[field].items() if count > 0}
+
+    def _apply(self, keys, delta: int):
+        """按索引值增减计数"""
+        self._total += delta
+        for field, value in zip(TaskIndex.FIELDS, keys):
+            self._counters[field][value] += delta
+
+
+# ==================== 完成耗时分析 ====================
+
+class CompletionTimeAnalyzer:
+    """完成耗时分析 - 从创建到完成所用时间的分位数
+
+    总体、各分类、各优先级各维护一个流式分位数草图，任务完成时
+    增量更新，不保存每个任务的耗时。提供 persist 时改动过的草图
+    写入存储元数据（每个草图一个键），重启后由 from_meta 恢复，
+    已清除或删除的任务仍计入历史耗时；多个分片（如归档文件）的
+    分析器可以 merge 合并。
+    """
+
+    OVERALL = 'overall'
+    CATEGORY = 'category'
+    PRIORITY = 'priority'
+
+    def __init__(self, tasks=(), relative_accuracy: float = SKETCH_RELATIVE_ACCURACY,
+                 persist: Optional[Callable[[Dict], None]] = None):
+        """
+        初始化完成耗时分析
+
+        Args:
+            tasks: 初始任务列表，其中已完成的任务计入草图
+            relative_accuracy: 分位数的相对误差
+            persist: persist({元数据键: 草图字典})，草图变化时调用
+        """
+        self.relative_accuracy = relative_accuracy
+        self.persist = persist
+        self.overall = QuantileSketch(relative_accuracy)
+        self.by_category: Dict[str, QuantileSketch] = {}
+        self.by_priority: Dict[str, QuantileSketch] = {}
+        for task in tasks:
+            if task.status == STATUS_DONE:
+                self.record(task, save=False)
+
+    @classmethod
+    def from_meta(cls, meta: Dict, persist: Optional[Callable[[Dict], None]] = None,
+                  relative_accuracy: float = SKETCH_RELATIVE_ACCURACY
+                  ) -> 'CompletionTimeAnalyzer':
+        """从存储元数据中恢复"""
+        analyzer = cls(relative_accuracy=relative_accuracy, persist=persist)
+        analyzer.reload(meta)
+        return analyzer
+
+    def reload(self, meta: Dict):
+        """从存储元数据重新读取草图（其他进程可能已经更新了草图）"""
+        self.overall = QuantileSketch(self.relative_accuracy)
+        self.by_category = {}
+        self.by_priority = {}
+        for key, value in meta.items():
+            if not key.startswith(META_COMPLETION_PREFIX):
+                continue
+            sketch = QuantileSketch.from_dict(value)
+            dimension, _, group = key[len(META_COMPLETION_PREFIX):].partition(':')
+            if dimension == self.OVERALL:
+                self.overall = sketch
+            elif dimension == self.CATEGORY:
+                self.by_category[group] = sketch
+            elif dimension == self.PRIORITY:
+                self.by_priority[group] = sketch
+
+    def backfill(self, tasks: Iterable):
+        """由现有已完成任务补建草图（首次启用时使用，此前删除的任务无从统计）"""
+        for task in tasks:
+            if task.status == STATUS_DONE:
+                self.record(task, save=False)
+        if self.overall.count:
+            self._save(self._sketches())
+
+    def record(self, task, save: bool = True):
+        """记录一个已完成任务的耗时"""
+        hours = self.completion_hours(task)
+        if hours is None:
+            return
+
+        self.overall.add(hours)
+        touched = {self._meta_key(self.OVERALL): self.overall}
+        for dimension, sketches, key in (
+                (self.CATEGORY, self.by_category, getattr(task, 'category', 'General')),
+                (self.PRIORITY, self.by_priority, getattr(task, 'priority', 'Medium'))):
+            sketch = sketches.get(key)
+            if sketch is None:
+                sketch = sketches[key] = QuantileSketch(self.relative_accuracy)
+            sketch.add(hours)
+            touched[self._meta_key(dimension, key)] = sketch
+        if save:
+            self._save(touched)
+
+    def _sketches(self) -> Dict[str, QuantileSketch]:
+        """全部草图 {元数据键: 草图}"""
+        sketches = {self._meta_key(self.OVERALL): self.overall}
+        for dimension, group in ((self.CATEGORY, self.by_category),
+                                 (self.PRIORITY, self.by_priority)):
+            for key, sketch in group.items():
+                sketches[self._meta_key(dimension, key)] = sketch
+        return sketches
+
+    @staticmethod
+    def _meta_key(dimension: str, key: str = None) -> str:
+        name = dimension if key is None else f"{dimension}:{key}"
+        return META_COMPLETION_PREFIX + name
+
+    def _save(self, sketches: Dict[str, QuantileSketch]):
+        if self.persist is not None and sketches:
+            self.persist({key: sketch.to_dict() for key, sketch in sketches.items()})
+
+    def on_event(self, event: str, task, previous: Optional[Dict[str, str]]):
+        """任务管理器变更事件：任务完成时记录耗时"""
+        if event == EVENT_DONE:
+            self.record(task)
+
+    @staticmethod
+    def completion_hours(task) -> Optional[float]:
+        """任务从创建到完成的小时数，时间缺失时返回None"""
+        created = to_epoch_us(task.createdAt)
+        completed = to_epoch_us(task.completedAt)
+        if created is None or completed is None:
+            return None
+        return max(completed - created, 0) / 3.6e9
+
+    def merge(self, other: 'CompletionTimeAnalyzer'):
+        """合并另一个分片的分析结果"""
+        self.overall.merge(other.overall)
+        for mine, theirs in ((self.by_category, other.by_category),
+                             (self.by_priority, other.by_priority)):
+            for key, sketch in theirs.items():
+                if key in mine:
+                    mine[key].merge(sketch)
+                else:
+                    mine[key] = QuantileSketch.from_dict(sketch.to_dict())
+
+    def summarize(self) -> Dict:
+        """
+        汇总完成耗时分位数（单位：小时）
+
+        Returns:
+            {'overall': {count, p50, p90, p99},
+             'by_category': {分类: {...}}, 'by_priority': {优先级: {...}}}
+        """
+        return {
+            'overall': self._summarize_sketch(self.overall),
+            'by_category': {key: self._summarize_sketch(sketch)
+                            for key, sketch in sorted(self.by_category.items())},
+            'by_priority': {key: self._summarize_sketch(sketch)
+                            for key, sketch in sorted(self.by_priority.items())},
+        }
+
+    def to_dict(self) -> Dict:
+        """序列化全部草图"""
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'overall': self.overall.to_dict(),
+            'by_category': {key: sketch.to_dict() for key, sketch in self.by_category.items()},
+            'by_priority': {key: sketch.to_dict() for key, sketch in self.by_priority.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CompletionTimeAnalyzer':
+        """反序列化"""
+        analyzer = cls(relative_accuracy=data['relative_accuracy'])
+        analyzer.overall = QuantileSketch.from_dict(data['overall'])
+        analyzer.by_category = {key: QuantileSketch.from_dict(sketch)
+                                for key, sketch in data['by_category'].items()}
+        analyzer.by_priority = {key: QuantileSketch.from_dict(sketch)
+                                for key, sketch in data['by_priority'].items()}
+        return analyzer
+
+    @staticmethod
+    def _summarize_sketch(sketch: QuantileSketch) -> Dict:
+        result = {'count': sketch.count}
+        for q in COMPLETION_TIME_QUANTILES:
+            value = sketch.quantile(q)
+            result[f"p{int(q * 100)}"] = None if value is None else round(value, 2)
+        return result
+
 
 # ==================== 智能分析器 ====================
 
 class TaskAnalyzer:
     """智能分析器 - 基于统计的业务逻辑"""
 
-    def __init__(self, statistics: TaskStatistics):
+    def __init__(self, statistics: TaskStatistics, rollups: Optional[DailyRollups] = None):
         """
         初始化分析器
 
         Args:
             statistics: 统计计算器实例
+            rollups: 每日吞吐量汇总，提供时支持积压预测
         """
         self.statistics = statistics
+        self.rollups = rollups
+        # 预测结果缓存 {(日期, 阈值): 结果}，任务变更时清空
+        self._forecast_cache: Dict[tuple, Dict] = {}
 
     def check_task_overload(self, threshold: int = 5) -> bool:
         """
@@ -119,6 +419,89 @@ class TaskAnalyzer:
             return "注意：任务积压过多，请优先处理！"
         return None
 
+    def forecast_backlog(self, threshold: int = TASK_OVERLOAD_THRESHOLD) -> Optional[Dict]:
+        """
+        预测积压何时清空、何时超过阈值
+
+        对最近 FORECAST_WINDOW_DAYS 天的每日新增数和流出数（完成+删除的待办）
+        做指数加权平均得到速率，按净速率线性外推当前待办数。
+        结果缓存到下一次任务变更（或日期变化）。
+
+        Args:
+            threshold: 待办任务阈值
+
+        Returns:
+            {backlog, threshold, arrival_rate, completion_rate, net_rate,
+             days_to_clear, clear_date, days_to_threshold, threshold_date}，
+            无法外推的天数和日期为None；没有每日汇总时返回None
+        """
+        if self.rollups is None:
+            return None
+
+        today = date.today()
+        key = (today, threshold)
+        if key not in self._forecast_cache:
+            self._forecast_cache[key] = self._compute_forecast(today, threshold)
+        return self._forecast_cache[key]
+
+    def invalidate(self):
+        """清空预测缓存"""
+        self._forecast_cache.clear()
+
+    def on_event(self, event: str, task, previous: Optional[Dict[str, str]]):
+        """任务管理器变更事件：使预测缓存失效"""
+        self.invalidate()
+
+    def _compute_forecast(self, today: date, threshold: int) -> Dict:
+        start = today - timedelta(days=FORECAST_WINDOW_DAYS - 1)
+        series = self.rollups.series(start.isoformat(), today.isoformat())
+
+        # 越近的天权重越大：w_i = (1 - alpha) ^ (n - 1 - i)
+        decay = 1 - FORECAST_EWMA_ALPHA
+        weights = [decay ** (len(series) - 1 - i) for i in range(len(series))]
+        total_weight = sum(weights)
+        arrival = sum(w * point['created'] for w, point in zip(weights, series)) / total_weight
+        completion = sum(w * (point['completed'] + point['removed'])
+                         for w, point in zip(weights, series)) / total_weight
+        net = arrival - completion
+        backlog = self.statistics.calculate_pending()
+
+        if backlog == 0:
+            days_to_clear = 0.0
+        elif net < 0:
+            days_to_clear = backlog / -net
+        else:
+            days_to_clear = None
+
+        if backlog > threshold:
+            days_to_threshold = 0.0
+        elif net > 0:
+            days_to_threshold = (threshold - backlog) / net
+        else:
+            days_to_threshold = None
+
+        return {
+            'backlog': backlog,
+            'threshold': threshold,
+            'arrival_rate': round(arrival, 2),
+            'completion_rate': round(completion, 2),
+            'net_rate': round(net, 2),
+            'days_to_clear': self._round_days(days_to_clear),
+            'clear_date': self._project_date(today, days_to_clear),
+            'days_to_threshold': self._round_days(days_to_threshold),
+            'threshold_date': self._project_date(today, days_to_threshold),
+        }
+
+    @staticmethod
+    def _round_days(days: Optional[float]) -> Optional[float]:
+        return None if days is None else round(days, 1)
+
+    @staticmethod
+    def _project_date(today: date, days: Optional[float]) -> Optional[str]:
+        if days is None:
+            return None
+        return (today + timedelta(days=math.ceil(days))).isoformat()
+
     def get_priority_distribution(self) -> Dict[str, int]:
         """获取优先级分布统计"""
         return self.statistics.get_priority_distribution()
@@ -130,6 +513,10 @@ class TaskAnalyzer:
 
 # ==================== 报表生成器 ====================
 
+# 报表中的一个表格：key 为机器可读的名称，fields/headers 为列名和显示标题，
+# rows 为按行惰性生成的元组
+ReportSection = namedtuple('ReportSection', ['key', 'title', 'fields', 'headers', 'rows'])
+
 class ReportGenerator:
     """报表生成器 - 生成格式化的报表"""
 
@@ -209,21 +596,59 @@ class ReportGenerator:
 
         return "\n".join(lines)
 
-    def format_task_list(self) -> str:
+    def format_forecast(self) -> Optional[str]:
         """
-        格式化任务列表
+        格式化积压预测
 
         Returns:
-            格式化的任务列表字符串
+            格式化的预测字符串，分析器不支持预测时返回None
+        """
+        forecast = self.analyzer.forecast_backlog()
+        if forecast is None:
+            return None
+
+        lines = [f"{MSG_FORECAST_HEADER}:",
+                 MSG_FORECAST_RATES.format(arrival=forecast['arrival_rate'],
+                                           completion=forecast['completion_rate'])]
+        if forecast['backlog'] == 0:
+            lines.append(MSG_FORECAST_EMPTY)
+        elif forecast['clear_date'] is not None:
+            lines.append(MSG_FORECAST_CLEAR.format(date=forecast['clear_date'],
+                                                   days=forecast['days_to_clear']))
+        else:
+            lines.append(MSG_FORECAST_NO_CLEAR)
+
+        if forecast['days_to_threshold'] == 0:
+            lines.append(MSG_FORECAST_OVER_THRESHOLD.format(threshold=forecast['threshold']))
+        elif forecast['threshold_date'] is not None:
+            lines.append(MSG_FORECAST_THRESHOLD.format(threshold=forecast['threshold'],
+                                                       date=forecast['threshold_date'],
+                                                       days=forecast['days_to_threshold']))
+        return "\n".join(lines)
+
+    def iter_task_list(self) -> Iterator[str]:
+        """
+        逐行生成任务列表
+
+        Yields:
+            标题行和每个任务的格式化字符串
         """
         if not self.tasks:
-            return "无任务"
+            yield "无任务"
+            return
 
-        lines = ["任务列表:"]
+        yield "任务列表:"
         for task in self.tasks:
-            lines.append(self.format_task(task))
+            yield self.format_task(task)
 
-        return "\n".join(lines)
+    def format_task_list(self) -> str:
+        """
+        格式化任务列表
+
+        Returns:
+            格式化的任务列表字符串
+        """
+        return "\n".join(self.iter_task_list())
 
     def generate_summary(self) -> str:
         """
@@ -244,22 +669,39 @@ class ReportGenerator:
             separator
         ]
 
+        forecast = self.format_forecast()
+        if forecast is not None:
+            lines[-1:-1] = ["", forecast]
+
         return "\n".join(lines)
 
-    def generate_full_report(self) -> str:
+    def iter_full_report(self) -> Iterator[str]:
         """
-        生成完整报表
+        逐行生成完整报表
 
-        Returns:
-            格式化的完整报表字符串
+        统计部分只有几行，任务列表逐个任务生成，
+        内存占用与任务数无关。
+
+        Yields:
+            报表的每一行（不含换行符）
         """
-        separator = "=" * 50
+        yield from self.iter_report_header()
+        yield from self.iter_report_body()
 
-        lines = [
+    def iter_report_header(self) -> Iterator[str]:
+        """报表标题和生成时间（每次输出时生成，不随报表内容缓存）"""
+        separator = "=" * 50
+        yield from (
             separator,
             "任务管理器 - 任务报表",
             separator,
             f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        )
+
+    def iter_report_body(self) -> Iterator[str]:
+        """报表标题之后的统计和任务列表"""
+        separator = "=" * 50
+        yield from (
             "",
             separator,
             "统计信息",
@@ -272,14 +714,46 @@ class ReportGenerator:
             self.format_category_stats(),
             "",
             separator,
-            self.format_task_list(),
+        )
+        yield from self.iter_task_list()
+        yield from (
             "",
             separator,
             self.format_priority_stats(),
-            separator
-        ]
+            separator,
+        )
 
-        return "\n".join(lines)
+    def iter_sections(self) -> Iterator[ReportSection]:
+        """
+        按表格生成报表内容（供各格式导出器使用）
+
+        Yields:
+            统计信息、分类统计、优先级分布和任务列表四个 ReportSection，
+            任务列表的行在遍历时逐个生成
+        """
+        statistics = self.analyzer.statistics
+        yield ReportSection('statistics', "统计信息", ('metric', 'value'), ("指标", "数值"), [
+            ("总任务数", statistics.calculate_total()),
+            ("已完成", statistics.calculate_completed()),
+            ("待办", statistics.calculate_pending()),
+            ("完成率", f"{statistics.get_completion_rate():.2f}%"),
+        ])
+        yield ReportSection('categories', "分类统计", ('category', 'count'), ("分类", "数量"),
+                            sorted(statistics.get_stats_by_category().items()))
+        yield ReportSection('priorities', "优先级分布", ('priority', 'count'), ("优先级", "数量"),
+                            sorted(statistics.get_priority_distribution().items()))
+        yield ReportSection('tasks', "任务列表", REPORT_TASK_FIELDS, REPORT_TASK_HEADERS,
+                            (tuple(getattr(task, field, None) for field in REPORT_TASK_FIELDS)
+                             for task in self.tasks))
+
+    def generate_full_report(self) -> str:
+        """
+        生成完整报表
+
+        Returns:
+            格式化的完整报表字符串
+        """
+        return "\n".join(self.iter_full_report())
 
     def export_to_txt(self, filepath: str = "summary.txt") -> str:
         """
@@ -291,48 +765,148 @@ class ReportGenerator:
         Returns:
             导出成功消息
         """
-        content = self.generate_full_report()
-
         # 转换为绝对路径
         if not os.path.isabs(filepath):
             # 使用当前工作目录
             filepath = os.path.abspath(filepath)
 
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            return f"报表已导出: {filepath}"
+            # 逐行写入缓冲区，不在内存中拼接整份报表
+            with open(filepath, 'w', encoding='utf-8', buffering=REPORT_WRITE_BUFFER) as f:
+                f.writelines(line + "\n" for line in self.iter_full_report())
+            return MSG_EXPORT_SUCCESS.format(filepath=filepath)
         except Exception as e:
-            return f"导出失败: {e}"
+            return MSG_EXPORT_FAILED.format(error=e)
 
 
 # ==================== 分析服务 ====================
 
+# 缓存未命中的标记（缓存的结果本身可能是None）
+_MISSING = object()
+
+
 class TaskAnalyzerService:
-    """任务分析服务 - 整合所有分析功能的统一入口"""
+    """任务分析服务 - 整合所有分析功能的统一入口
+
+    可以在多个线程中共享：缓存命中时不等待任务管理器的写锁；
+    未命中时在写锁内读取由变更事件维护的计数器和汇总，
+    报表则基于快照和计数器副本在锁外流式生成。
+    """
 
-    def __init__(self, task_manager):
+    def __init__(self, task_manager, cache_size: int = ANALYSIS_CACHE_SIZE):
         """
         初始化分析服务
 
         Args:
             task_manager: 任务管理器实例
+            cache_size: 结果缓存的条目数上限
         """
         self.task_manager = task_manager
+        # 结果缓存 {(数据版本, 日期, 名称, 参数): 结果}，按最近使用排序
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_version: Optional[int] = None
+        self._cache_lock = threading.Lock()
         self._init_components()
 
     def _init_components(self):
-        """初始化所有组件"""
-        self.statistics = TaskStatistics(self.task_manager.tasks)
-        self.analyzer = TaskAnalyzer(self.statistics)
-        self.report_generator = ReportGenerator(
-            self.task_manager.tasks,
-            self.analyzer
-        )
+        """初始化所有组件（统计计数器只在此处遍历一次任务）"""
+        tasks = self.task_manager.tasks
+        self.statistics = RunningStatistics(tasks)
+        self.task_manager.add_listener(self.statistics.on_event)
+        self.completion_times = CompletionTimeAnalyzer.from_meta(
+            self.task_manager.meta, persist=self.task_manager.update_meta)
+        if not self.completion_times.overall.count:
+            self.completion_times.backfill(tasks)
+        self.rollups = DailyRollups.from_meta(self.task_manager.meta,
+                                              persist=self.task_manager.update_meta)
+        if not self.rollups.buckets:
+            self.rollups.backfill(tasks)
+        # 耗时草图和汇总随元数据持久化：其他进程的修改已计入，重新加载时直接读取
+        self.task_manager.add_listener(self.completion_times.on_event, replay=False)
+        self.task_manager.add_listener(self.rollups.on_event, replay=False)
+        self.analyzer = TaskAnalyzer(self.statistics, self.rollups)
+        self.task_manager.add_listener(self.analyzer.on_event)
+        self.task_manager.add_reload_listener(self._on_reload)
+
+    @property
+    def report_generator(self) -> 'ReportGenerator':
+        """基于当前快照的报表生成器（每次获取时创建，不持有过期的任务列表）"""
+        return ReportGenerator(self.task_manager.snapshot().tasks, self.analyzer)
+
+    def _on_reload(self, meta: Dict):
+        """共享存储重新加载后：重新读取耗时草图和每日汇总（统计已由差异事件更新）"""
+        self.completion_times.reload(meta)
+        if not self.completion_times.overall.count:
+            self.completion_times.backfill(self.task_manager.tasks)
+        self.rollups.reload(meta)
+        if not self.rollups.buckets:
+            self.rollups.backfill(self.task_manager.tasks)
+        self.analyzer.invalidate()
+
+    def _sync(self):
+        """让直接修改过字段、尚未保存的任务先产生变更事件"""
+        self.task_manager._refresh_index()
+
+    def _cached(self, name: str, params: tuple, compute: Callable[[], Any]) -> Any:
+        """
+        按（数据版本, 日期, 名称, 参数）缓存计算结果
 
-    def _refresh_components(self):
-        """刷新组件（当任务列表更新时调用）"""
-        self._init_components()
+        数据版本变化后旧结果全部作废；同一版本内最多保留 cache_size 条，
+        超出时淘汰最久未使用的。返回的结果是共享的，调用方不应修改。
+        """
+        key = self._cache_key(name, params)
+        cached = self._lookup(key)
+        if cached is not _MISSING:
+            return cached
+
+        with self.task_manager.lock:
+            value = compute()
+            # 计算期间数据已经变化时，结果不属于key的版本，不放入缓存
+            current = self.task_manager.version == key[0]
+        if current:
+            self._remember(key, value)
+        return value
+
+    def _cache_key(self, name: str, params: tuple) -> tuple:
+        version = self.task_manager.snapshot().version
+        with self._cache_lock:
+            if version != self._cache_version:
+                self._cache.clear()
+                self._cache_version = version
+        # 时间序列、预测等默认以今天为基准
+        return (version, date.today(), name, params)
+
+    def _lookup(self, key: tuple) -> Any:
+        """获取缓存结果，未命中时返回 _MISSING"""
+        with self._cache_lock:
+            value = self._cache.get(key, _MISSING)
+            if value is not _MISSING:
+                self._cache.move_to_end(key)
+            return value
+
+    def _remember(self, key: tuple, value: Any):
+        with self._cache_lock:
+            if key[0] != self._cache_version:
+                return
+            self._cache[key] = value
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def _iter_cached_report(self, key: tuple, chunks: Iterator[str]) -> Iterator[str]:
+        """边生成边收集报表分块，完整生成且不超过大小上限时放入缓存"""
+        collected: Optional[List[str]] = []
+        size = 0
+        for chunk in chunks:
+            if collected is not None:
+                size += len(chunk)
+                if size <= REPORT_CACHE_MAX_CHARS:
+                    collected.append(chunk)
+                else:
+                    collected = None
+            yield chunk
+        if collected is not None:
+            self._remember(key, collected)
 
     def get_today_report(self) -> str:
         """
@@ -341,21 +915,56 @@ class TaskAnalyzerService:
         Returns:
             今日简报字符串
         """
-        self._refresh_components()
-        return self.report_generator.generate_summary()
+        return self._cached('summary', (), self.report_generator.generate_summary)
 
-    def export_summary(self, filepath: str = "summary.txt") -> str:
+    def export_summary(self, filepath: str = None, fmt: str = REPORT_FORMAT_TXT) -> str:
         """
         导出报表
 
         Args:
-            filepath: 导出文件路径
+            filepath: 导出文件路径，默认为当前目录下的 summary.<格式扩展名>
+            fmt: 导出格式 txt/csv/jsonl/md/html
 
         Returns:
             导出结果消息
+
+        Raises:
+            ValueError: 不支持的格式
+        """
+        exporter = get_exporter(fmt)
+        if filepath is None:
+            filepath = f"{REPORT_FILE_STEM}.{exporter.extension}"
+        return exporter.write(self.iter_report(fmt), filepath)
+
+    def iter_report(self, fmt: str = REPORT_FORMAT_TXT) -> Iterator[str]:
         """
-        self._refresh_components()
-        return self.report_generator.export_to_txt(filepath)
+        按分块生成指定格式的报表（用于流式下载）
+
+        Args:
+            fmt: 导出格式 txt/csv/jsonl/md/html
+
+        Returns:
+            报表内容分块的迭代器
+
+        Raises:
+            ValueError: 不支持的格式
+        """
+        exporter = get_exporter(fmt)
+        key = self._cache_key('report', (exporter.extension,))
+        cached = self._lookup(key)
+        if cached is not _MISSING:
+            # 只缓存报表内容，生成时间等报表头每次重新生成
+            return chain(exporter.iter_chunks(self.report_generator, body=False), cached)
+
+        # 报表基于同一版本的快照和统计副本，由独立的生成器生成，流式输出期间不持有写锁
+        with self.task_manager.lock:
+            snapshot = self.task_manager.snapshot()
+            generator = ReportGenerator(snapshot.tasks, TaskAnalyzer(self.statistics.copy()))
+        header = exporter.iter_chunks(generator, body=False)
+        body = exporter.iter_chunks(generator, header=False)
+        if snapshot.version != key[0]:
+            return chain(header, body)
+        return chain(header, self._iter_cached_report(key, body))
 
     def get_statistics(self) -> Dict:
         """
@@ -364,15 +973,48 @@ class TaskAnalyzerService:
         Returns:
             包含所有统计信息的字典
         """
-        self._refresh_components()
-        return {
-            'total': self.statistics.calculate_total(),
-            'completed': self.statistics.calculate_completed(),
-            'pending': self.statistics.calculate_pending(),
-            'completion_rate': self.statistics.get_completion_rate(),
-            'by_category': self.statistics.get_stats_by_category(),
-            'by_priority': self.statistics.get_priority_distribution()
-        }
+        return self._cached('statistics', (), self.statistics.to_dict)
+
+    def get_completion_times(self) -> Dict:
+        """
+        获取完成耗时分位数
+
+        Returns:
+            总体、各分类、各优先级的 p50/p90/p99（小时）
+        """
+        return self._cached('completion_times', (), self.completion_times.summarize)
+
+    def get_timeseries(self, start: str = None, end: str = None,
+                       granularity: str = GRANULARITY_DAY) -> List[Dict]:
+        """
+        获取吞吐量时间序列（由每日汇总回答，不遍历任务）
+
+        Args:
+            start: 起始日期 YYYY-MM-DD（含），默认为 end 之前29天
+            end: 结束日期 YYYY-MM-DD（含），默认为今天
+            granularity: day 或 week
+
+        Returns:
+            [{date, created, completed, backlog}]
+
+        Raises:
+            ValueError: 日期或粒度无效
+        """
+        return self._cached('timeseries', (start, end, granularity),
+                            lambda: self.rollups.series(start, end, granularity))
+
+    def get_forecast(self, threshold: int = TASK_OVERLOAD_THRESHOLD) -> Dict:
+        """
+        获取积压预测
+
+        Args:
+            threshold: 待办任务阈值
+
+        Returns:
+            预测结果字典（见 TaskAnalyzer.forecast_backlog）
+        """
+        return self._cached('forecast', (threshold,),
+                            lambda: self.analyzer.forecast_backlog(threshold))
 
     def check_overload_warning(self, threshold: int = 5) -> Optional[str]:
         """
@@ -384,5 +1026,6 @@ class TaskAnalyzerService:
         Returns:
             警告信息，如果没有积压则返回None
         """
-        self._refresh_components()
-        return self.analyzer.get_overload_warning(threshold)
+        with self.task_manager.lock:
+            self._sync()
+            return self.analyzer.get_overload_warning(threshold)
@@ -3,23 +3,56 @@ Flask任务管理器Web服务端
 基于task.py逻辑，提供REST API和Web界面
 """
 
-from flask import Flask, render_template, request, jsonify
-from datetime import datetime
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+from datetime import date, timedelta
+from functools import wraps
+import base64
+import binascii
+import hashlib
+import json
+import os
 import socket
+import time
+import uuid
 
 from task import TaskManager
 from analytics import TaskAnalyzerService
+from storage import create_storage, WriteBehindStorage
+from exporters import get_exporter
+from events import EventFeed
+from sync import SyncService
+from batch import BatchService
+from timestamps import to_epoch_us
 from constants import (
     STATUS_PENDING, STATUS_DONE,
     PRIORITY_HIGH, PRIORITY_MEDIUM, PRIORITY_LOW,
-    CATEGORIES, PRIORITY_WEIGHTS,
-    DEFAULT_CATEGORY, DEFAULT_SUMMARY_FILE
+    CATEGORIES,
+    DEFAULT_CATEGORY, REPORT_FORMAT_TXT, REPORT_FILE_STEM,
+    WRITE_BEHIND_WINDOW, WRITE_BEHIND_MAX_OPS, MSG_ADDED, GRANULARITY_DAY,
+    SSE_KEEPALIVE_SECONDS, SSE_RETRY_MS, ENV_SHARED_STORAGE, SHARED_STORAGE_POLL_SECONDS,
+    ENV_STORAGE_BACKEND, STORAGE_WAL, ERR_SAVE_FAILED,
+    TASK_PAGE_MAX_LIMIT, TASK_API_FIELDS,
+    ERR_INVALID_LIMIT, ERR_INVALID_CURSOR, ERR_INVALID_FIELDS, ERR_INVALID_DATE
 )
 
 app = Flask(__name__)
 
-# 初始化任务管理器
-manager = TaskManager()
+# 多进程部署（如 gunicorn -w 4）时设置 TASKS_SHARED_STORAGE=1：各进程通过文件锁
+# 共享存储，写入直接落盘，读取前检查其他进程的修改
+SHARED_STORAGE = bool(os.environ.get(ENV_SHARED_STORAGE))
+
+# 默认使用追加日志存储：每次修改只追加变化的任务，不重写整个文件（TASKS_STORAGE 可改为 json）
+storage = create_storage(backend=os.environ.get(ENV_STORAGE_BACKEND, STORAGE_WAL))
+
+if SHARED_STORAGE:
+    manager = TaskManager(storage=storage, shared=True)
+else:
+    # 单进程：并发请求的写入在窗口期内合并为一次落盘
+    manager = TaskManager(storage=WriteBehindStorage(
+        storage,
+        window=WRITE_BEHIND_WINDOW,
+        max_ops=WRITE_BEHIND_MAX_OPS
+    ))
 
 
 def get_local_ip():
@@ -40,22 +73,151 @@ def task_to_dict(task):
         'id': task.id,
         'description': task.description,
         'status': task.status,
-        'priority': getattr(task, 'priority', 'Medium'),
-        'category': getattr(task, 'category', 'General'),
+        'priority': task.priority,
+        'category': task.category,
         'createdAt': task.createdAt,
         'completedAt': task.completedAt
     }
 
 
-def sort_tasks(tasks):
-    """按优先级和创建时间排序任务"""
-    def sort_key(task):
-        priority = getattr(task, 'priority', 'Medium')
-        weight = PRIORITY_WEIGHTS.get(priority, 2)
-        created_at = datetime.fromisoformat(task.createdAt.replace('Z', '+00:00'))
-        return (-weight, -created_at.timestamp())
+def encode_cursor(sort_key: tuple) -> str:
+    """把上一页最后一个任务的 sort_key 编码为不透明的 cursor"""
+    raw = json.dumps(list(sort_key), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
 
-    return sorted(tasks, key=sort_key)
+def decode_cursor(cursor: str) -> tuple:
+    """解析 cursor，无效时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_key = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(ERR_INVALID_CURSOR)
+    if not isinstance(sort_key, list) or len(sort_key) != 3 or \
+            not all(type(value) is int for value in sort_key):
+        raise ValueError(ERR_INVALID_CURSOR)
+    return tuple(sort_key)
+
+
+def parse_time_range(args, prefix: str) -> tuple:
+    """
+    解析 <prefix>_from / <prefix>_to 为 epoch微秒范围（含起不含止）
+
+    可以是日期 YYYY-MM-DD（包含整天），也可以是完整的时间戳。
+    """
+    bounds = []
+    for suffix, days in (('from', 0), ('to', 1)):
+        value = args.get(f'{prefix}_{suffix}')
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            value = (date.fromisoformat(value) + timedelta(days=days)).isoformat()
+        except ValueError:
+            pass
+        epoch_us = to_epoch_us(value)
+        if epoch_us is None:
+            raise ValueError(ERR_INVALID_DATE.format(value=value))
+        bounds.append(epoch_us)
+    return tuple(bounds)
+
+
+def parse_task_query(args) -> dict:
+    """把任务列表的查询参数转换为 TaskSnapshot.page() 的参数，无效时抛出 ValueError"""
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= TASK_PAGE_MAX_LIMIT:
+            raise ValueError(ERR_INVALID_LIMIT.format(max=TASK_PAGE_MAX_LIMIT))
+    cursor = args.get('cursor')
+    return {
+        'limit': limit,
+        'after': decode_cursor(cursor) if cursor else None,
+        'status': args.get('status'),
+        'category': args.get('category'),
+        'priority': args.get('priority'),
+        'created': parse_time_range(args, 'created'),
+        'completed': parse_time_range(args, 'completed'),
+    }
+
+
+def parse_fields(value: str):
+    """解析 fields=（逗号分隔），返回要输出的字段（id 总是在内），未指定时返回None"""
+    if not value:
+        return None
+    fields = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = sorted(fields.difference(TASK_API_FIELDS))
+    if unknown:
+        raise ValueError(ERR_INVALID_FIELDS.format(fields=','.join(unknown),
+                                                   choices='/'.join(TASK_API_FIELDS)))
+    return tuple(field for field in TASK_API_FIELDS if field == 'id' or field in fields)
+
+
+# 变更事件流：每次变更推送给所有SSE客户端
+feed = EventFeed(serialize=task_to_dict)
+manager.add_listener(feed.on_event)
+
+# 增量同步（小程序客户端）
+sync_service = SyncService(manager, serialize=task_to_dict)
+
+# 批量操作（一次请求、一次保存）
+batch_service = BatchService(manager, serialize=task_to_dict)
+
+# 每次启动生成的令牌：重启后数据版本重新计数，旧的ETag随之失效
+ETAG_TOKEN = uuid.uuid4().hex[:12]
+
+
+def make_etag() -> str:
+    """由进程令牌、数据版本、日期和请求路径及参数生成强ETag"""
+    query = hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:16]
+    return f"{ETAG_TOKEN}-{manager.snapshot().version}-{date.today().isoformat()}-{query}"
+
+
+def conditional_get(view):
+    """
+    条件GET：If-None-Match 与当前ETag相同时直接返回304，不执行视图
+
+    ETag在生成响应之前计算，期间数据即使变化，ETag也只会偏旧，
+    客户端下次请求时版本不同会重新获取。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = make_etag()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        # 允许缓存，但每次使用前必须向服务器确认
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
+
+
+def durable(view):
+    """
+    修改接口：响应前等待本次修改落盘
+
+    写合并存储在后台线程中落盘，等待在视图返回、释放任务管理器的锁之后进行，
+    同一窗口期内其他请求的修改仍然合并为一次写入。落盘失败时本次请求返回500，
+    失败的修改保留在队列中自动重试。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = view(*args, **kwargs)
+        if isinstance(manager.storage, WriteBehindStorage):
+            try:
+                manager.storage.wait()
+            except Exception as e:
+                return jsonify({'success': False,
+                                'message': ERR_SAVE_FAILED.format(error=e)}), 500
+        return response
+    return wrapper
 
 
 # ==================== 路由 ====================
@@ -88,18 +250,40 @@ def presentation():
 
 
 @app.route('/api/tasks', methods=['GET'])
+@conditional_get
 def get_tasks():
-    """获取所有任务"""
-    tasks = [task_to_dict(task) for task in manager.tasks]
-    # 按优先级和创建时间排序
-    tasks = sort_tasks(tasks)
+    """
+    获取任务（读取只读快照，不等待写入）
+
+    支持 status/category/priority 和创建、完成日期范围过滤，limit/cursor 分页，
+    fields= 只返回部分字段。
+    """
+    # 先取事件序号：客户端从该序号订阅，期间的变更会重复收到，按ID覆盖即可
+    seq = feed.seq
+    try:
+        query = parse_task_query(request.args)
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    # 按优先级和创建时间排序（快照发布时由有序索引给出）
+    page = manager.snapshot().page(**query)
+    if fields is None:
+        tasks = [task_to_dict(task) for task in page.tasks]
+    else:
+        tasks = [{field: getattr(task, field) for field in fields} for task in page.tasks]
     return jsonify({
         'success': True,
-        'tasks': tasks
+        'tasks': tasks,
+        'total': page.total,
+        'next_cursor': encode_cursor(page.next_key) if page.next_key else None,
+        'seq': seq,
+        'event_id': feed.event_id(seq)
     })
 
 
 @app.route('/api/tasks', methods=['POST'])
+@durable
 def add_task():
     """添加任务"""
     data = request.get_json()
@@ -111,28 +295,25 @@ def add_task():
     if not description:
         return jsonify({'success': False, 'message': '任务描述不能为空'}), 400
 
-    # 添加任务
-    result = manager.add(description)
-
-    # 获取新添加的任务
-    new_task = manager._find_task(
-        max([task.id for task in manager.tasks], default=0)
-    )
-
-    # 设置优先级和分类
-    if new_task:
-        new_task.priority = data.get('priority', 'Medium')
-        new_task.category = data.get('category', 'General')
-        manager._save_tasks()
+    # 添加任务（优先级和分类随任务一起保存）
+    try:
+        new_task = manager.create(
+            description,
+            priority=data.get('priority', PRIORITY_MEDIUM),
+            category=data.get('category', DEFAULT_CATEGORY)
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
 
     return jsonify({
         'success': True,
-        'message': result,
-        'task': task_to_dict(new_task) if new_task else None
+        'message': MSG_ADDED.format(description=new_task.description),
+        'task': task_to_dict(new_task)
     })
 
 
 @app.route('/api/tasks/<int:task_id>/done', methods=['PUT'])
+@durable
 def done_task(task_id):
     """标记任务完成"""
     result = manager.done(task_id)
@@ -146,6 +327,7 @@ def done_task(task_id):
 
 
 @app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
+@durable
 def delete_task(task_id):
     """删除任务"""
     result = manager.delete(task_id)
@@ -159,6 +341,7 @@ def delete_task(task_id):
 
 
 @app.route('/api/tasks/completed/clear', methods=['DELETE'])
+@durable
 def clear_completed():
     """清除已完成任务"""
     result = manager.clear()
@@ -168,21 +351,78 @@ def clear_completed():
     })
 
 
+@app.route('/api/batch', methods=['POST'])
+@durable
+def batch():
+    """
+    批量操作
+
+    请求体 {ops: [{op: add|done|delete|update, ...}]}，按顺序应用，
+    全部有效时一起应用并只保存一次，否则一个也不应用（返回400）。
+    返回 {success, applied, results}，results 与 ops 一一对应。
+    """
+    data = request.get_json(silent=True) or {}
+    ops = data.get('ops')
+    if not isinstance(ops, list) or not ops:
+        return jsonify({'success': False, 'message': 'ops 必须是非空数组'}), 400
+
+    response = batch_service.apply(ops)
+    response['success'] = response['applied']
+    return jsonify(response), 200 if response['applied'] else 400
+
+
 @app.route('/api/stats', methods=['GET'])
+@conditional_get
 def get_stats():
     """获取统计信息"""
     stats = manager.analyzer.get_statistics()
     return jsonify({
         'success': True,
-        'stats': stats
+        'stats': stats,
+        'forecast': manager.analyzer.get_forecast()
+    })
+
+
+@app.route('/api/stats/completion-times', methods=['GET'])
+@conditional_get
+def get_completion_times():
+    """获取完成耗时分位数（小时）"""
+    return jsonify({
+        'success': True,
+        'completion_times': manager.analyzer.get_completion_times()
+    })
+
+
+@app.route('/api/stats/timeseries', methods=['GET'])
+@conditional_get
+def get_timeseries():
+    """获取每日/每周的新建数、完成数和积压量（start/end/granularity）"""
+    try:
+        series = manager.analyzer.get_timeseries(
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            granularity=request.args.get('granularity', GRANULARITY_DAY)
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    return jsonify({
+        'success': True,
+        'series': series
     })
 
 
 @app.route('/api/report/export', methods=['GET'])
 def export_report():
-    """导出报表"""
-    filepath = DEFAULT_SUMMARY_FILE
-    result = manager.analyzer.export_summary(filepath)
+    """导出报表到服务器当前目录（?format=txt|csv|jsonl|md|html）"""
+    fmt = request.args.get('format', REPORT_FORMAT_TXT)
+    try:
+        exporter = get_exporter(fmt)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    filepath = f"{REPORT_FILE_STEM}.{exporter.extension}"
+    result = manager.analyzer.export_summary(filepath, fmt)
     return jsonify({
         'success': True,
         'message': result,
@@ -190,6 +430,103 @@ def export_report():
     })
 
 
+@app.route('/api/report/download', methods=['GET'])
+@conditional_get
+def download_report():
+    """以附件形式分块返回报表（?format=txt|csv|jsonl|md|html），不在服务器写文件"""
+    fmt = request.args.get('format', REPORT_FORMAT_TXT)
+    try:
+        exporter = get_exporter(fmt)
+        chunks = manager.analyzer.iter_report(fmt)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    filename = f"{REPORT_FILE_STEM}.{exporter.extension}"
+    return Response(
+        stream_with_context(chunks),
+        mimetype=exporter.mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@app.route('/api/events', methods=['GET'])
+def events():
+    """
+    SSE变更事件流
+
+    每个事件的 id 为 <epoch>-<序号>，event 为 added/updated/done/deleted/cleared，
+    data 为 {seq, event, task, stats}，stats 为统计增量。
+    断线重连时浏览器自动带上 Last-Event-ID（也可用 /api/tasks 返回的
+    ?since=<event_id>），从该序号之后继续推送；序号过旧，或 epoch 与本进程不同
+    （服务已重启，或多进程部署时连到了另一个进程）无法续传时发送 reset 事件，
+    客户端应重新拉取 /api/tasks。多进程部署时定期检查其他进程的修改。
+    """
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        epoch, last = feed.parse_event_id(since) if since is not None else (None, feed.seq)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'since 必须是事件ID'}), 400
+
+    def stream():
+        nonlocal epoch, last
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        timeout = SHARED_STORAGE_POLL_SECONDS if SHARED_STORAGE else SSE_KEEPALIVE_SECONDS
+        idle_since = time.monotonic()
+        while True:
+            if SHARED_STORAGE:
+                # 其他进程的修改在重新加载时作为变更事件进入本进程的事件流
+                manager.snapshot()
+            batch = feed.wait(last, timeout, epoch)
+            if batch is None:
+                epoch, last = feed.epoch, feed.seq
+                data = json.dumps({'seq': last, 'epoch': epoch})
+                yield f"id: {feed.event_id(last)}\nevent: reset\ndata: {data}\n\n"
+            elif not batch:
+                if time.monotonic() - idle_since < SSE_KEEPALIVE_SECONDS:
+                    continue
+                # 心跳，防止代理断开空闲连接
+                yield ": keepalive\n\n"
+            idle_since = time.monotonic()
+            for payload in batch or ():
+                last = payload['seq']
+                data = json.dumps(payload, ensure_ascii=False)
+                yield f"id: {feed.event_id(last)}\nevent: {payload['event']}\ndata: {data}\n\n"
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/sync', methods=['GET', 'POST'])
+@durable
+def sync():
+    """
+    增量同步
+
+    GET  /api/sync?since=<版本>&epoch=<epoch>  只取回变更
+    POST /api/sync  {since, epoch, ops: [...]}  先应用离线操作再取回变更
+
+    返回 {epoch, version, full, changes | tasks, results}。客户端保存
+    version 和 epoch 作为下次的 since/epoch；full 为 true 时用 tasks 整体替换本地数据。
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+    else:
+        data = request.args
+    since = data.get('since')
+    try:
+        since = int(since) if since not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'since 必须是整数'}), 400
+
+    ops = data.get('ops', []) if request.method == 'POST' else []
+    if not isinstance(ops, list):
+        return jsonify({'success': False, 'message': 'ops 必须是数组'}), 400
+
+    response = sync_service.sync(since, data.get('epoch'), ops)
+    response['success'] = True
+    return jsonify(response)
+
+
 # ==================== 错误处理 ====================
 
 @app.errorhandler(404)
@@ -0,0 +1,155 @@
+"""
+批量操作 - 一次请求应用多个修改，只保存一次
+"""
+
+from typing import Callable, Dict, List, Optional
+
+from constants import (
+    STATUS_DONE, MSG_ADDED,
+    SYNC_OP_ADD, SYNC_OP_DONE, SYNC_OP_DELETE, BATCH_OP_UPDATE, BATCH_MAX_OPS
+)
+from validators import TaskValidator
+
+
+class BatchService:
+    """批量操作服务
+
+    操作按顺序应用，全部成功或全部不应用：先在不修改数据的情况下
+    逐个检查（考虑前面操作的影响，如先删除再完成同一任务），
+    有任何一个无效时直接返回；否则在 TaskManager.batch() 中应用，
+    存储只写入一次。支持的操作：
+      - {op: add, description, priority?, category?}
+      - {op: done, id}
+      - {op: delete, id}
+      - {op: update, id, description?, priority?, category?}
+    """
+
+    OPERATIONS = (SYNC_OP_ADD, SYNC_OP_DONE, SYNC_OP_DELETE, BATCH_OP_UPDATE)
+
+    def __init__(self, manager, serialize: Callable = None):
+        """
+        初始化批量操作服务
+
+        Args:
+            manager: 任务管理器
+            serialize: 任务对象转字典的函数，默认为 task.to_dict
+        """
+        self.manager = manager
+        self.serialize = serialize or (lambda task: task.to_dict())
+
+    def apply(self, ops: List[Dict]) -> Dict:
+        """
+        检查并应用一批操作
+
+        Args:
+            ops: 操作列表
+
+        Returns:
+            {applied, results}：applied 为是否已应用；results 与 ops 一一对应，
+            为 {index, op, success, message, task?}。未应用时 success 表示
+            该操作本身是否有效，message 为无效原因
+        """
+        with self.manager.batch():
+            errors = self.validate(ops)
+            if any(errors):
+                return {
+                    'applied': False,
+                    'results': [self._result(index, op, error is None, error)
+                                for index, (op, error) in enumerate(zip(ops, errors))],
+                }
+            results = [self._apply_op(index, op) for index, op in enumerate(ops)]
+        return {'applied': True, 'results': results}
+
+    def validate(self, ops: List[Dict]) -> List[Optional[str]]:
+        """
+        按顺序检查操作，不修改数据
+
+        Returns:
+            与 ops 一一对应的错误消息，有效的操作为None
+        """
+        if len(ops) > BATCH_MAX_OPS:
+            return [f"一次最多 {BATCH_MAX_OPS} 个操作"] * len(ops)
+
+        # 本批操作之后任务的状态 {任务ID: 状态}，None 表示已删除
+        statuses: Dict[int, Optional[str]] = {}
+        errors = []
+        for op in ops:
+            errors.append(self._check(op, statuses))
+        return errors
+
+    def _check(self, op, statuses: Dict[int, Optional[str]]) -> Optional[str]:
+        if not isinstance(op, dict) or op.get('op') not in self.OPERATIONS:
+            return f"操作必须是 {'/'.join(self.OPERATIONS)} 之一"
+
+        kind = op['op']
+        if kind == SYNC_OP_ADD:
+            if not isinstance(op.get('description'), str) or not op['description'].strip():
+                return '任务描述不能为空'
+            return self._check_fields(op)
+
+        task_id = op.get('id')
+        if not isinstance(task_id, int) or isinstance(task_id, bool):
+            return 'id 必须是整数'
+        if task_id in statuses:
+            status = statuses[task_id]
+        else:
+            task = self.manager.get(task_id)
+            status = task.status if task is not None else None
+        if status is None:
+            return f"任务 {task_id} 不存在"
+
+        if kind == SYNC_OP_DONE:
+            if status == STATUS_DONE:
+                return f"任务 {task_id} 已经完成"
+            statuses[task_id] = STATUS_DONE
+        elif kind == SYNC_OP_DELETE:
+            statuses[task_id] = None
+        else:
+            if op.get('description') is None and op.get('priority') is None \
+                    and op.get('category') is None:
+                return '至少需要修改 description/priority/category 之一'
+            description = op.get('description')
+            if description is not None and (not isinstance(description, str)
+                                            or not description.strip()):
+                return '任务描述不能为空'
+            return self._check_fields(op)
+        return None
+
+    @staticmethod
+    def _check_fields(op: Dict) -> Optional[str]:
+        try:
+            TaskValidator.validate_priority_category(op.get('priority'), op.get('category'))
+        except ValueError as e:
+            return str(e)
+        return None
+
+    def _apply_op(self, index: int, op: Dict) -> Dict:
+        kind = op['op']
+        if kind == SYNC_OP_ADD:
+            task = self.manager.create(op['description'], priority=op.get('priority'),
+                                       category=op.get('category'))
+            message = MSG_ADDED.format(description=task.description)
+            return self._result(index, op, True, message, task)
+
+        task_id = op['id']
+        if kind == SYNC_OP_DONE:
+            message = self.manager.done(task_id)
+        elif kind == SYNC_OP_DELETE:
+            message = self.manager.delete(task_id)
+        else:
+            message = self.manager.update(task_id, description=op.get('description'),
+                                          priority=op.get('priority'),
+                                          category=op.get('category'))
+        return self._result(index, op, True, message, self.manager.get(task_id))
+
+    def _result(self, index: int, op, success: bool, message: Optional[str],
+                task=None) -> Dict:
+        result = {
+            'index': index,
+            'op': op.get('op') if isinstance(op, dict) else None,
+            'success': success,
+            'message': message,
+        }
+        if task is not None:
+            result['task'] = self.serialize(task)
+        return result
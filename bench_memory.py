@@ -0,0 +1,110 @@
+"""
+任务内存占用基准测试
+
+比较三种表示加载N个任务时的内存占用：
+  1. 旧版带 __dict__ 的任务对象（优先级/分类作为动态属性）
+  2. 使用 __slots__ 的 Task
+  3. 列式 TaskTable
+
+用法: python bench_memory.py [任务数，默认200000]
+"""
+
+import sys
+import tracemalloc
+
+from constants import STATUS_PENDING, STATUS_DONE, CATEGORIES, PRIORITIES
+from task import Task
+from task_table import TaskTable
+
+
+class LegacyTask:
+    """重构前的任务结构（每个实例带 __dict__）"""
+
+    def __init__(self, id, description):
+        self.id = id
+        self.description = description
+        self.status = STATUS_PENDING
+        self.createdAt = None
+        self.completedAt = None
+
+
+def make_records(count):
+    """生成测试用任务字典"""
+    records = []
+    for i in range(1, count + 1):
+        done = i % 3 == 0
+        records.append({
+            "id": i,
+            "description": f"任务描述 {i}",
+            "status": STATUS_DONE if done else STATUS_PENDING,
+            "createdAt": f"2024-01-{i % 28 + 1:02d}T08:{i % 60:02d}:00.{i % 1000000:06d}Z",
+            "completedAt": f"2024-02-{i % 28 + 1:02d}T09:00:00Z" if done else None,
+            "priority": PRIORITIES[i % len(PRIORITIES)],
+            "category": CATEGORIES[i % len(CATEGORIES)],
+        })
+    return records
+
+
+def build_legacy(records):
+    tasks = []
+    for record in records:
+        task = LegacyTask(record["id"], record["description"])
+        task.status = record["status"]
+        task.createdAt = record["createdAt"]
+        task.completedAt = record["completedAt"]
+        task.priority = record["priority"]
+        task.category = record["category"]
+        tasks.append(task)
+    return tasks
+
+
+def build_slots(records):
+    tasks = []
+    for record in records:
+        task = Task(record["id"], record["description"])
+        task.status = record["status"]
+        task.createdAt = record["createdAt"]
+        task.completedAt = record["completedAt"]
+        task.priority = record["priority"]
+        task.category = record["category"]
+        tasks.append(task)
+    return tasks
+
+
+def build_table(records):
+    return TaskTable.from_dicts(records)
+
+
+def measure(builder, records):
+    """返回构建结果占用的字节数"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = builder(records)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del result
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    records = make_records(count)
+
+    print("=" * 60)
+    print(f"任务内存占用基准测试（{count} 个任务）")
+    print("=" * 60)
+
+    baseline = None
+    for name, builder in (("__dict__ 任务对象", build_legacy),
+                          ("__slots__ Task", build_slots),
+                          ("列式 TaskTable", build_table)):
+        size = measure(builder, records)
+        if baseline is None:
+            baseline = size
+        print(f"{name:<20} {size / 1024 / 1024:8.1f} MB  "
+              f"{size / count:7.1f} B/任务  {size / baseline * 100:6.1f}%")
+
+
+if __name__ == "__main__":
+    main()
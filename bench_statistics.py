@@ -0,0 +1,60 @@
+"""
+统计引擎基准测试
+
+比较纯Python的 TaskStatistics（逐项遍历任务对象）与
+向量化的 VectorizedTaskStatistics 计算相同统计结果的耗时。
+
+用法: python bench_statistics.py [任务数...]（默认 10000 1000000）
+"""
+
+import sys
+import time
+
+from analytics import TaskStatistics
+from bench_memory import make_records, build_slots
+from task_table import TaskTable
+from vector_stats import VectorizedTaskStatistics
+
+
+def timed(func, repeat=3):
+    """返回最快一次的耗时（秒）和结果"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(count):
+    records = make_records(count)
+    tasks = build_slots(records)
+    table = TaskTable.from_dicts(records)
+    vectorized = VectorizedTaskStatistics(table)
+
+    python_time, python_result = timed(lambda: TaskStatistics(tasks).to_dict())
+    numpy_time, numpy_result = timed(vectorized.get_statistics)
+    cross_time, _ = timed(vectorized.get_cross_tabs)
+
+    if python_result != numpy_result:
+        raise AssertionError("向量化统计结果与纯Python结果不一致")
+
+    print(f"{count:>10}  {python_time * 1000:10.1f} ms  {numpy_time * 1000:10.1f} ms  "
+          f"{python_time / numpy_time:7.1f}x  {cross_time * 1000:10.1f} ms")
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 1000000]
+
+    print("=" * 70)
+    print("统计引擎基准测试")
+    print("=" * 70)
+    print(f"{'任务数':>8}  {'纯Python':>11}  {'向量化':>11}  {'加速':>6}  {'交叉表':>9}")
+    for count in counts:
+        run(count)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,24 @@ FIELD_DESCRIPTION = "description"
 FIELD_STATUS = "status"
 FIELD_CREATED_AT = "createdAt"
 FIELD_COMPLETED_AT = "completedAt"
+FIELD_PRIORITY = "priority"
+FIELD_CATEGORY = "category"
+FIELD_SCHEMA_VERSION = "schemaVersion"
+
+# ==================== 存储格式版本 ====================
+
+# 1: id/description/status/createdAt/completedAt（无版本字段）
+# 2: 增加 priority/category
+SCHEMA_VERSION = 2
+LEGACY_SCHEMA_VERSION = 1
+
+# ==================== 变更事件 ====================
+
+EVENT_ADDED = "added"
+EVENT_UPDATED = "updated"
+EVENT_DONE = "done"
+EVENT_DELETED = "deleted"
+EVENT_CLEARED = "cleared"
 
 # ==================== 时间戳格式 ====================
 
@@ -27,6 +45,7 @@ MSG_TASK_NOT_FOUND = "Error: Task {task_id} not found"
 MSG_TASK_ALREADY_DONE = "Task {task_id} is already done"
 MSG_TASK_MARKED_DONE = "Task {task_id} marked as done"
 MSG_TASK_DELETED = "Task {task_id} deleted"
+MSG_TASK_UPDATED = "Task {task_id} updated"
 MSG_CLEARED_ALL = "Cleared all completed tasks"
 MSG_EMPTY_DESCRIPTION = "Error: Task description cannot be empty"
 MSG_NO_TASKS = "No tasks found"
@@ -45,6 +64,79 @@ MSG_DESC_USAGE = "Usage: task-cli add <description>"
 
 DEFAULT_FILENAME = ".tasks.json"
 BACKUP_SUFFIX = ".backup"
+DEFAULT_BACKUP_COUNT = 1
+TEMP_SUFFIX = ".tmp"
+# 跨进程锁文件（多进程共享同一存储时使用）
+LOCK_SUFFIX = ".lock"
+META_SUFFIX = ".meta.json"
+META_NEXT_ID = "next_id"
+# 每日吞吐量汇总的元数据键前缀（后接日期）
+META_ROLLUP_PREFIX = "rollup:"
+# 完成耗时草图的元数据键前缀（后接 overall、category:<分类> 或 priority:<优先级>）
+META_COMPLETION_PREFIX = "completion:"
+
+# 追加日志（WAL）存储
+WAL_SUFFIX = ".wal"
+WAL_OLD_SUFFIX = ".wal.old"
+WAL_OP_PUT = "put"
+WAL_OP_DELETE = "del"
+WAL_OP_META = "meta"
+WAL_COMPACT_THRESHOLD = 1000
+
+# 存储类型：环境变量 TASKS_STORAGE 选择 json/wal/sqlite（Web服务默认 wal）
+ENV_STORAGE_BACKEND = "TASKS_STORAGE"
+STORAGE_JSON = "json"
+STORAGE_WAL = "wal"
+STORAGE_SQLITE = "sqlite"
+STORAGE_BACKENDS = (STORAGE_JSON, STORAGE_WAL, STORAGE_SQLITE)
+ERR_UNKNOWN_STORAGE = "不支持的存储类型: {backend}（可选 {choices}）"
+
+# SQLite存储
+DEFAULT_DB_FILENAME = ".tasks.db"
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+# 多进程部署：设置该环境变量后各进程通过文件锁共享存储；SSE连接检查其他进程修改的间隔（秒）
+ENV_SHARED_STORAGE = "TASKS_SHARED_STORAGE"
+SHARED_STORAGE_POLL_SECONDS = 1.0
+
+# 写合并（write-behind）：窗口期（秒）内或累计N次变更后统一落盘
+WRITE_BEHIND_WINDOW = 0.02
+WRITE_BEHIND_MAX_OPS = 100
+# 落盘失败后重试的间隔（秒），失败的变更保留在队列中
+WRITE_BEHIND_RETRY_SECONDS = 1.0
+ERR_SAVE_FAILED = "保存失败，修改将自动重试: {error}"
+
+# 变更事件流（SSE）：缓冲区保留的事件数、心跳间隔（秒）、客户端重连间隔（毫秒）
+EVENT_FEED_SIZE = 1000
+SSE_KEEPALIVE_SECONDS = 15
+SSE_RETRY_MS = 3000
+
+# 增量同步：变更日志最多保留的变更数、记住的已应用操作数
+SYNC_LOG_SIZE = 10000
+SYNC_APPLIED_OPS_SIZE = 1000
+SYNC_OP_ADD = "add"
+SYNC_OP_DONE = "done"
+SYNC_OP_DELETE = "delete"
+SYNC_APPLIED = "applied"
+SYNC_CONFLICT = "conflict"
+SYNC_REJECTED = "rejected"
+# 已应用操作的结果随元数据持久化：按应用顺序轮流写入 SYNC_APPLIED_OPS_SIZE 个槽位
+# （键为前缀加槽位号，值为 [op_id, 结果]），下一个写入位置保存在 META_SYNC_OP_NEXT
+META_SYNC_OP_PREFIX = "sync_op:"
+META_SYNC_OP_NEXT = "sync_op_next"
+
+# 批量操作：一次请求最多包含的操作数
+BATCH_MAX_OPS = 1000
+BATCH_OP_UPDATE = "update"
+
+# 任务列表分页：每页最多的任务数；fields= 可选的字段（id 总是返回）
+TASK_PAGE_MAX_LIMIT = 500
+TASK_API_FIELDS = ('id', 'description', 'status', 'priority', 'category',
+                   'createdAt', 'completedAt')
+ERR_INVALID_LIMIT = "limit 必须是 1 到 {max} 之间的整数"
+ERR_INVALID_CURSOR = "无效的 cursor"
+ERR_INVALID_FIELDS = "不支持的字段: {fields}（可选 {choices}）"
+ERR_INVALID_DATE = "无效的日期: {value}"
 
 # ==================== 错误消息 ====================
 
@@ -54,7 +146,13 @@ ERR_MISSING_FIELD = "Missing required field: {field}"
 ERR_INVALID_ID_TYPE = "Task ID must be an integer"
 ERR_INVALID_DESC_TYPE = "Task description must be a string"
 ERR_INVALID_STATUS = "Task status must be 'pending' or 'done'"
+ERR_INVALID_PRIORITY_TYPE = "Task priority must be a string"
+ERR_INVALID_CATEGORY_TYPE = "Task category must be a string"
+ERR_INVALID_PRIORITY = "Task priority must be one of: {choices}"
+ERR_INVALID_CATEGORY = "Task category must be a non-empty string"
+ERR_UNSUPPORTED_SCHEMA = "Unsupported task schema version: {version}"
 ERR_SKIP_INVALID_TASK = "Skipping invalid task: {error}"
+ERR_KEEP_UNSUPPORTED_TASK = "Keeping task {task_id} unchanged: {error}"
 
 ERR_PERMISSION_DENIED = "Error: Permission denied. Unable to write task file."
 ERR_WRITE_FILE = "Error: Unable to write task file: {error}"
@@ -77,6 +175,55 @@ MSG_TASK_OVERLOAD_WARNING = "注意：任务积压过多，请优先处理！"
 # 导出相关
 MSG_EXPORT_SUCCESS = "报表已导出: {filepath}"
 MSG_EXPORT_FAILED = "导出失败: {error}"
+# 流式导出的写缓冲区大小（字节），也是下载时每个分块的大小
+REPORT_WRITE_BUFFER = 64 * 1024
+
+# 报表导出格式
+REPORT_FORMAT_TXT = "txt"
+REPORT_FORMAT_CSV = "csv"
+REPORT_FORMAT_JSONL = "jsonl"
+REPORT_FORMAT_MARKDOWN = "md"
+REPORT_FORMAT_HTML = "html"
+REPORT_FORMATS = [REPORT_FORMAT_TXT, REPORT_FORMAT_CSV, REPORT_FORMAT_JSONL,
+                  REPORT_FORMAT_MARKDOWN, REPORT_FORMAT_HTML]
+REPORT_TITLE = "任务管理器 - 任务报表"
+REPORT_FILE_STEM = "summary"
+REPORT_TASK_FIELDS = ('id', 'description', 'status', 'priority', 'category',
+                      'createdAt', 'completedAt')
+REPORT_TASK_HEADERS = ("ID", "描述", "状态", "优先级", "分类", "创建时间", "完成时间")
+ERR_UNSUPPORTED_REPORT_FORMAT = "不支持的报表格式: {format}（可选 {formats}）"
+MSG_REPORT_FORMAT_USAGE = "Usage: task-cli report [--format txt|csv|jsonl|md|html] [filepath]"
+
+# 完成耗时分位数
+SKETCH_RELATIVE_ACCURACY = 0.01
+COMPLETION_TIME_QUANTILES = (0.5, 0.9, 0.99)
+
+# 吞吐量时间序列
+GRANULARITY_DAY = "day"
+GRANULARITY_WEEK = "week"
+ERR_INVALID_GRANULARITY = "不支持的时间粒度: {granularity}（可选 day/week）"
+# 一次查询最多覆盖的天数（约5年），逐天生成序列，范围过大时拒绝
+TIMESERIES_MAX_DAYS = 5 * 366
+ERR_TIMESERIES_RANGE = "时间范围最多 {max} 天"
+
+# 积压预测：对最近N天的每日新增/完成数做指数加权平均
+FORECAST_WINDOW_DAYS = 28
+FORECAST_EWMA_ALPHA = 0.3
+MSG_FORECAST_HEADER = "积压预测"
+MSG_FORECAST_RATES = "- 每日新增: {arrival:.2f} / 每日完成: {completion:.2f}"
+MSG_FORECAST_CLEAR = "- 预计清空: {date}（约 {days:.1f} 天）"
+MSG_FORECAST_NO_CLEAR = "- 按当前速度积压不会清空"
+MSG_FORECAST_EMPTY = "- 当前没有积压"
+MSG_FORECAST_THRESHOLD = "- 预计超过阈值 {threshold}: {date}（约 {days:.1f} 天）"
+MSG_FORECAST_OVER_THRESHOLD = "- 已超过阈值 {threshold}"
+
+# 分析结果缓存：按（数据版本, 参数）缓存的条目数上限，
+# 以及缓存渲染后报表的大小上限（字符数，更大的报表只流式生成不缓存）
+ANALYSIS_CACHE_SIZE = 64
+REPORT_CACHE_MAX_CHARS = 1024 * 1024
+
+# 可选依赖
+ERR_NUMPY_REQUIRED = "向量化统计需要安装 numpy: pip install -r requirements_analytics.txt"
 
 # 配置常量
 TASK_OVERLOAD_THRESHOLD = 5
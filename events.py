@@ -0,0 +1,164 @@
+"""
+任务变更事件流 - 供Web端通过SSE实时推送
+"""
+
+import threading
+import uuid
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from constants import (
+    STATUS_DONE, STATUS_PENDING,
+    FIELD_STATUS, FIELD_CATEGORY, FIELD_PRIORITY,
+    EVENT_DELETED, EVENT_CLEARED,
+    EVENT_FEED_SIZE
+)
+from indexes import TaskIndex
+
+
+def stat_delta(event: str, task, previous: Optional[Dict[str, str]]) -> Dict:
+    """
+    计算一次变更对统计数据的影响
+
+    Returns:
+        {total, completed, pending, by_category, by_priority} 中变化的部分，
+        值为增量（如 {'pending': -1, 'completed': 1}）
+    """
+    removed = event in (EVENT_DELETED, EVENT_CLEARED)
+    current = None if removed else dict(zip(TaskIndex.FIELDS, TaskIndex.keys_of(task)))
+
+    delta: Dict = {}
+    if previous is None and current is not None:
+        delta['total'] = 1
+    elif previous is not None and current is None:
+        delta['total'] = -1
+
+    for keys, sign in ((previous, -1), (current, 1)):
+        if keys is None:
+            continue
+        status_key = {STATUS_DONE: 'completed', STATUS_PENDING: 'pending'}.get(keys[FIELD_STATUS])
+        if status_key:
+            delta[status_key] = delta.get(status_key, 0) + sign
+        for field, name in ((FIELD_CATEGORY, 'by_category'), (FIELD_PRIORITY, 'by_priority')):
+            counts = delta.setdefault(name, {})
+            counts[keys[field]] = counts.get(keys[field], 0) + sign
+
+    # 去掉抵消为0的项
+    for name in ('by_category', 'by_priority'):
+        counts = {key: value for key, value in delta.get(name, {}).items() if value}
+        if counts:
+            delta[name] = counts
+        else:
+            delta.pop(name, None)
+    return {key: value for key, value in delta.items() if value}
+
+
+class EventFeed:
+    """带序号的变更事件环形缓冲区
+
+    注册为 TaskManager 的监听器，每个变更事件分配递增的序号，
+    只保留最近 size 条。客户端记住收到的最后一个事件ID（epoch-序号），
+    断线后从该序号之后继续；序号已被挤出缓冲区，或 epoch 不同（服务端已重启，
+    或多进程部署时连到了另一个进程）时需要重新拉取全量数据。
+    """
+
+    def __init__(self, serialize: Callable = None, size: int = EVENT_FEED_SIZE):
+        """
+        初始化事件流
+
+        Args:
+            serialize: 任务对象转字典的函数，默认为 task.to_dict
+            size: 缓冲区保留的事件数
+        """
+        self.serialize = serialize or (lambda task: task.to_dict())
+        self._events: deque = deque(maxlen=size)
+        self._seq = 0
+        self._cond = threading.Condition()
+        # 每个事件流实例唯一：序号只在同一实例内连续
+        self.epoch = uuid.uuid4().hex[:12]
+
+    @property
+    def seq(self) -> int:
+        """最新事件的序号（还没有事件时为0）"""
+        with self._cond:
+            return self._seq
+
+    def event_id(self, seq: int) -> str:
+        """序号对应的事件ID（epoch-序号）"""
+        return f"{self.epoch}-{seq}"
+
+    @staticmethod
+    def parse_event_id(value: str) -> Tuple[Optional[str], int]:
+        """
+        解析事件ID
+
+        Returns:
+            (epoch, 序号)；只有序号时 epoch 为 None
+
+        Raises:
+            ValueError: 格式无效
+        """
+        epoch, _, seq = value.rpartition('-')
+        return epoch or None, int(seq)
+
+    def on_event(self, event: str, task, previous: Optional[Dict[str, str]]):
+        """任务管理器变更事件"""
+        payload = {
+            'event': event,
+            'task': self.serialize(task),
+            'stats': stat_delta(event, task, previous),
+        }
+        self.publish(payload)
+
+    def publish(self, payload: Dict) -> int:
+        """追加事件并唤醒等待的客户端，返回分配的序号"""
+        with self._cond:
+            self._seq += 1
+            payload['seq'] = self._seq
+            self._events.append((self._seq, payload))
+            self._cond.notify_all()
+            return self._seq
+
+    def since(self, seq: int, epoch: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        获取序号seq之后的事件
+
+        Args:
+            seq: 客户端已收到的最后一个序号
+            epoch: 该序号所属的 epoch，为 None 时视为本实例的序号
+
+        Returns:
+            事件列表；seq之后的事件已有部分被挤出缓冲区，或seq来自
+            其他实例（epoch不同，或大于当前序号）时返回None
+        """
+        with self._cond:
+            return self._since(seq, epoch)
+
+    def wait(self, seq: int, timeout: float, epoch: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        等待序号seq之后的事件
+
+        Args:
+            seq: 客户端已收到的最后一个序号
+            timeout: 最长等待秒数，超时返回空列表
+            epoch: 同 since
+
+        Returns:
+            同 since
+        """
+        with self._cond:
+            if epoch is None or epoch == self.epoch:
+                self._cond.wait_for(lambda: self._seq != seq, timeout)
+            return self._since(seq, epoch)
+
+    def _since(self, seq: int, epoch: Optional[str] = None) -> Optional[List[Dict]]:
+        if epoch is not None and epoch != self.epoch:
+            return None
+        if seq == self._seq:
+            return []
+        if seq > self._seq:
+            return None
+        oldest = self._events[0][0] if self._events else self._seq + 1
+        if seq + 1 < oldest:
+            return None
+        return [payload for event_seq, payload in self._events if event_seq > seq]
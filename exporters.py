@@ -0,0 +1,252 @@
+"""
+报表导出器 - 将报表按不同格式流式输出
+"""
+
+import csv
+import html
+import io
+import json
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, Iterator, Type
+
+from constants import (
+    REPORT_FORMAT_TXT, REPORT_FORMAT_CSV, REPORT_FORMAT_JSONL,
+    REPORT_FORMAT_MARKDOWN, REPORT_FORMAT_HTML, REPORT_FORMATS,
+    REPORT_TITLE, REPORT_WRITE_BUFFER,
+    MSG_EXPORT_SUCCESS, MSG_EXPORT_FAILED, ERR_UNSUPPORTED_REPORT_FORMAT
+)
+
+
+class ReportExporter(ABC):
+    """报表导出器抽象基类
+
+    子类实现 iter_lines，从 ReportGenerator 的 iter_sections / iter_report_body
+    逐行生成输出；含生成时间的报表头由 iter_header 单独生成，报表内容可以缓存复用，
+    报表头每次输出时重新生成。基类把行合并为固定大小的分块，用于写文件或作为下载响应体。
+    内存占用只与分块大小有关，与任务数无关。
+    """
+
+    extension = ""
+    mimetype = "text/plain"
+
+    @abstractmethod
+    def iter_lines(self, generator) -> Iterator[str]:
+        """逐行生成报表头之后的导出内容（每行包含换行符）"""
+        pass
+
+    def iter_header(self, generator) -> Iterator[str]:
+        """逐行生成报表头（标题、生成时间等），默认没有报表头"""
+        return iter(())
+
+    def iter_chunks(self, generator, chunk_size: int = REPORT_WRITE_BUFFER,
+                    header: bool = True, body: bool = True) -> Iterator[str]:
+        """
+        按分块生成导出内容
+
+        Args:
+            generator: ReportGenerator 实例
+            chunk_size: 每个分块的大约字符数
+            header: 是否包含报表头
+            body: 是否包含报表头之后的内容
+
+        Yields:
+            导出内容的分块
+        """
+        buffer = []
+        size = 0
+        lines = chain(self.iter_header(generator) if header else (),
+                      self.iter_lines(generator) if body else ())
+        for line in lines:
+            buffer.append(line)
+            size += len(line)
+            if size >= chunk_size:
+                yield "".join(buffer)
+                buffer = []
+                size = 0
+        if buffer:
+            yield "".join(buffer)
+
+    def export(self, generator, filepath: str) -> str:
+        """
+        导出到文件
+
+        Args:
+            generator: ReportGenerator 实例
+            filepath: 导出文件路径（支持相对路径和绝对路径）
+
+        Returns:
+            导出结果消息
+        """
+        return self.write(self.iter_chunks(generator), filepath)
+
+    @staticmethod
+    def write(chunks: Iterable[str], filepath: str) -> str:
+        """
+        把已生成的内容分块写入文件
+
+        Args:
+            chunks: 内容分块
+            filepath: 导出文件路径（支持相对路径和绝对路径）
+
+        Returns:
+            导出结果消息
+        """
+        if not os.path.isabs(filepath):
+            filepath = os.path.abspath(filepath)
+
+        try:
+            with open(filepath, 'w', encoding='utf-8', newline='',
+                      buffering=REPORT_WRITE_BUFFER) as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            return MSG_EXPORT_SUCCESS.format(filepath=filepath)
+        except Exception as e:
+            return MSG_EXPORT_FAILED.format(error=e)
+
+    @staticmethod
+    def _cell(value) -> str:
+        return "" if value is None else str(value)
+
+
+class TextExporter(ReportExporter):
+    """纯文本报表（与 export_to_txt 相同）"""
+
+    extension = REPORT_FORMAT_TXT
+    mimetype = "text/plain"
+
+    def iter_header(self, generator) -> Iterator[str]:
+        for line in generator.iter_report_header():
+            yield line + "\n"
+
+    def iter_lines(self, generator) -> Iterator[str]:
+        for line in generator.iter_report_body():
+            yield line + "\n"
+
+
+class CSVExporter(ReportExporter):
+    """CSV：只导出任务列表，每个任务一行，首行为字段名"""
+
+    extension = REPORT_FORMAT_CSV
+    mimetype = "text/csv"
+
+    def iter_lines(self, generator) -> Iterator[str]:
+        for section in generator.iter_sections():
+            if section.key == 'tasks':
+                yield from self._iter_csv_rows([section.fields])
+                yield from self._iter_csv_rows(section.rows)
+
+    @staticmethod
+    def _iter_csv_rows(rows: Iterable[tuple]) -> Iterator[str]:
+        """每行单独经过csv.writer转义，缓冲区只保存当前一行"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+
+class JSONLinesExporter(ReportExporter):
+    """JSON Lines：每个表格行一个JSON对象，section 字段标明所属表格"""
+
+    extension = REPORT_FORMAT_JSONL
+    mimetype = "application/x-ndjson"
+
+    def iter_lines(self, generator) -> Iterator[str]:
+        for section in generator.iter_sections():
+            for row in section.rows:
+                record = {'section': section.key}
+                record.update(zip(section.fields, row))
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class MarkdownExporter(ReportExporter):
+    """Markdown：每个表格一个二级标题和表格"""
+
+    extension = REPORT_FORMAT_MARKDOWN
+    mimetype = "text/markdown"
+
+    def iter_header(self, generator) -> Iterator[str]:
+        yield f"# {REPORT_TITLE}\n\n"
+        yield f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+
+    def iter_lines(self, generator) -> Iterator[str]:
+        for section in generator.iter_sections():
+            yield f"\n## {section.title}\n\n"
+            yield self._row(section.headers)
+            yield "|" + "---|" * len(section.headers) + "\n"
+            for row in section.rows:
+                yield self._row(row)
+
+    def _row(self, cells: Iterable) -> str:
+        escaped = (self._cell(cell).replace("|", "\\|").replace("\n", " ") for cell in cells)
+        return "| " + " | ".join(escaped) + " |\n"
+
+
+class HTMLExporter(ReportExporter):
+    """HTML：单个自包含页面（内联样式，无外部资源）"""
+
+    extension = REPORT_FORMAT_HTML
+    mimetype = "text/html"
+
+    STYLE = (
+        "body{font-family:sans-serif;margin:2em;color:#222}"
+        "table{border-collapse:collapse;margin-bottom:1.5em}"
+        "th,td{border:1px solid #ccc;padding:4px 8px;text-align:left}"
+        "th{background:#f4f4f4}"
+    )
+
+    def iter_header(self, generator) -> Iterator[str]:
+        title = html.escape(REPORT_TITLE)
+        yield "<!DOCTYPE html>\n"
+        yield f'<html lang="zh-CN"><head><meta charset="utf-8"><title>{title}</title>\n'
+        yield f"<style>{self.STYLE}</style></head><body>\n"
+        yield f"<h1>{title}</h1>\n"
+        yield f"<p>生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>\n"
+
+    def iter_lines(self, generator) -> Iterator[str]:
+        for section in generator.iter_sections():
+            yield f"<h2>{html.escape(section.title)}</h2>\n<table>\n"
+            yield self._row("th", section.headers)
+            for row in section.rows:
+                yield self._row("td", row)
+            yield "</table>\n"
+        yield "</body></html>\n"
+
+    def _row(self, tag: str, cells: Iterable) -> str:
+        return "<tr>" + "".join(
+            f"<{tag}>{html.escape(self._cell(cell))}</{tag}>" for cell in cells
+        ) + "</tr>\n"
+
+
+EXPORTERS: Dict[str, Type[ReportExporter]] = {
+    REPORT_FORMAT_TXT: TextExporter,
+    REPORT_FORMAT_CSV: CSVExporter,
+    REPORT_FORMAT_JSONL: JSONLinesExporter,
+    REPORT_FORMAT_MARKDOWN: MarkdownExporter,
+    REPORT_FORMAT_HTML: HTMLExporter,
+}
+
+
+def get_exporter(fmt: str) -> ReportExporter:
+    """
+    根据格式名获取导出器
+
+    Args:
+        fmt: txt/csv/jsonl/md/html
+
+    Returns:
+        导出器实例
+
+    Raises:
+        ValueError: 不支持的格式
+    """
+    exporter_class = EXPORTERS.get((fmt or "").lower())
+    if exporter_class is None:
+        raise ValueError(ERR_UNSUPPORTED_REPORT_FORMAT.format(
+            format=fmt, formats="/".join(REPORT_FORMATS)))
+    return exporter_class()
@@ -0,0 +1,162 @@
+"""
+任务管理CLI工具 - 任务二级索引
+"""
+
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from constants import (
+    FIELD_STATUS, FIELD_CATEGORY, FIELD_PRIORITY,
+    DEFAULT_CATEGORY, PRIORITY_MEDIUM
+)
+
+
+class TaskIndex:
+    """任务二级索引：字段值 → 任务ID集合
+
+    由 TaskManager 在每次变更时增量维护，按状态、分类、优先级
+    查询时直接取索引集合，无需遍历全部任务。同时按任务的
+    sort_key 维护有序列表，变更时二分插入/删除。
+    """
+
+    FIELDS = (FIELD_STATUS, FIELD_CATEGORY, FIELD_PRIORITY)
+
+    def __init__(self):
+        self._index: Dict[str, Dict[str, Set[int]]] = {field: {} for field in self.FIELDS}
+        # 每个任务当前登记的索引键，更新时据此移除旧值
+        self._keys: Dict[int, Tuple[str, ...]] = {}
+        # 有序索引：按sort_key排序的列表，以及每个任务当前的sort_key
+        self._order: List[tuple] = []
+        self._sort_keys: Dict[int, tuple] = {}
+
+    @staticmethod
+    def keys_of(task) -> Tuple[str, ...]:
+        """获取任务在各索引字段上的值"""
+        return (
+            task.status,
+            getattr(task, 'category', DEFAULT_CATEGORY),
+            getattr(task, 'priority', PRIORITY_MEDIUM),
+        )
+
+    def add(self, task):
+        """登记任务（已登记时等同于update）"""
+        self.update(task)
+
+    def update(self, task):
+        """任务字段变化后更新索引"""
+        self._update_order(task)
+
+        keys = self.keys_of(task)
+        old_keys = self._keys.get(task.id)
+        if old_keys == keys:
+            return
+
+        if old_keys is not None:
+            self._discard(task.id, old_keys)
+        for field, value in zip(self.FIELDS, keys):
+            self._index[field].setdefault(value, set()).add(task.id)
+        self._keys[task.id] = keys
+
+    def remove(self, task_id: int):
+        """移除任务"""
+        old_keys = self._keys.pop(task_id, None)
+        if old_keys is not None:
+            self._discard(task_id, old_keys)
+
+        sort_key = self._sort_keys.pop(task_id, None)
+        if sort_key is not None:
+            del self._order[bisect_left(self._order, sort_key)]
+
+    def clear(self):
+        """清空索引"""
+        for values in self._index.values():
+            values.clear()
+        self._keys.clear()
+        self._order.clear()
+        self._sort_keys.clear()
+
+    def rebuild(self, tasks: Iterable):
+        """根据任务列表重建索引（有序索引一次排序）"""
+        self.clear()
+        for task in tasks:
+            keys = self.keys_of(task)
+            for field, value in zip(self.FIELDS, keys):
+                self._index[field].setdefault(value, set()).add(task.id)
+            self._keys[task.id] = keys
+            self._sort_keys[task.id] = task.sort_key
+        self._order = sorted(self._sort_keys.values())
+
+    def ordered_ids(self) -> Iterator[int]:
+        """按sort_key顺序遍历任务ID"""
+        return (sort_key[-1] for sort_key in self._order)
+
+    def ordered_keys(self) -> List[tuple]:
+        """按顺序排列的sort_key列表（只读，供二分查找）"""
+        return self._order
+
+    def sort_key(self, task_id: int) -> tuple:
+        """任务当前登记的sort_key"""
+        return self._sort_keys[task_id]
+
+    def previous_keys(self, task_id: int) -> Optional[Dict[str, str]]:
+        """获取任务当前登记的索引值"""
+        keys = self._keys.get(task_id)
+        if keys is None:
+            return None
+        return dict(zip(self.FIELDS, keys))
+
+    def ids(self, field: str, value: str) -> Set[int]:
+        """获取字段等于value的任务ID集合（只读，调用方不应修改）"""
+        return self._index[field].get(value, set())
+
+    def count(self, field: str, value: str) -> int:
+        """统计字段等于value的任务数"""
+        return len(self._index[field].get(value, ()))
+
+    def distribution(self, field: str) -> Dict[str, int]:
+        """获取字段各取值的任务数"""
+        return {value: len(ids) for value, ids in self._index[field].items() if ids}
+
+    def query(self, **criteria) -> Set[int]:
+        """
+        按多个字段查询任务ID
+
+        Args:
+            criteria: 字段名=值，值为None的条件忽略
+
+        Returns:
+            满足全部条件的任务ID集合；没有条件时返回全部ID
+        """
+        sets = [self.ids(field, value) for field, value in criteria.items()
+                if value is not None]
+        if not sets:
+            return set(self._keys)
+
+        # 从最小的集合开始求交集
+        sets.sort(key=len)
+        result = set(sets[0])
+        for ids in sets[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+    def _update_order(self, task):
+        """sort_key变化时在有序列表中移动任务"""
+        sort_key = task.sort_key
+        old_key = self._sort_keys.get(task.id)
+        if old_key == sort_key:
+            return
+
+        if old_key is not None:
+            del self._order[bisect_left(self._order, old_key)]
+        insort(self._order, sort_key)
+        self._sort_keys[task.id] = sort_key
+
+    def _discard(self, task_id: int, keys: Tuple[str, ...]):
+        """从各索引中移除任务ID"""
+        for field, value in zip(self.FIELDS, keys):
+            ids = self._index[field].get(value)
+            if ids is not None:
+                ids.discard(task_id)
+                if not ids:
+                    del self._index[field][value]
@@ -1,12 +1,26 @@
 // app.js
 App({
   globalData: {
-    tasks: []
+    tasks: [],
+    // Flask服务地址（如 http://192.168.1.10:5000），留空则只使用本地存储
+    serverUrl: ''
   },
 
+  // 同步状态：上次同步得到的版本和epoch，以及尚未提交的离线操作
+  syncState: { version: null, epoch: null },
+  pendingOps: [],
+  syncing: false,
+  // 页面注册的回调，同步改变了任务数据时调用
+  onTasksChanged: null,
+
   onLaunch() {
     // 从本地存储加载数据
     this.loadTasks()
+    this.sync()
+  },
+
+  onShow() {
+    this.sync()
   },
 
   loadTasks() {
@@ -15,6 +29,8 @@ App({
       if (tasks) {
         this.globalData.tasks = tasks
       }
+      this.syncState = wx.getStorageSync('syncState') || this.syncState
+      this.pendingOps = wx.getStorageSync('pendingOps') || []
     } catch (e) {
       console.error('加载任务失败:', e)
     }
@@ -23,6 +39,8 @@ App({
   saveTasks() {
     try {
       wx.setStorageSync('tasks', this.globalData.tasks)
+      wx.setStorageSync('syncState', this.syncState)
+      wx.setStorageSync('pendingOps', this.pendingOps)
     } catch (e) {
       console.error('保存任务失败:', e)
       wx.showToast({
@@ -32,18 +50,28 @@ App({
     }
   },
 
-  addTask(description) {
+  addTask(description, priority = 'Medium', category = 'General') {
     const tasks = this.globalData.tasks
-    const newId = tasks.length > 0 ? Math.max(...tasks.map(t => t.id)) + 1 : 1
+    let newId
+    if (this.globalData.serverUrl) {
+      // 未同步的任务使用负数临时ID，同步后替换为服务端分配的ID
+      newId = Math.min(0, ...tasks.map(t => t.id)) - 1
+    } else {
+      newId = tasks.length > 0 ? Math.max(...tasks.map(t => t.id)) + 1 : 1
+    }
     const newTask = {
       id: newId,
       description: description,
       status: 'pending',
+      priority: priority,
+      category: category,
       createdAt: new Date().toISOString(),
       completedAt: null
     }
     tasks.push(newTask)
+    this.queueOp({ op: 'add', ref: newId, description, priority, category, createdAt: newTask.createdAt })
     this.saveTasks()
+    this.sync()
     return newTask
   },
 
@@ -52,7 +80,9 @@ App({
     if (task && task.status !== 'done') {
       task.status = 'done'
       task.completedAt = new Date().toISOString()
+      this.queueOp({ op: 'done', id, completedAt: task.completedAt })
       this.saveTasks()
+      this.sync()
       return true
     }
     return false
@@ -62,7 +92,9 @@ App({
     const index = this.globalData.tasks.findIndex(t => t.id === id)
     if (index !== -1) {
       this.globalData.tasks.splice(index, 1)
+      this.queueOp({ op: 'delete', id })
       this.saveTasks()
+      this.sync()
       return true
     }
     return false
@@ -70,11 +102,106 @@ App({
 
   clearCompleted() {
     const beforeCount = this.globalData.tasks.length
+    // 只删除本地看到的已完成任务，不影响其他设备新完成的任务
+    this.globalData.tasks.filter(t => t.status === 'done').forEach(t => {
+      this.queueOp({ op: 'delete', id: t.id })
+    })
     this.globalData.tasks = this.globalData.tasks.filter(t => t.status !== 'done')
     this.saveTasks()
+    this.sync()
     return this.globalData.tasks.length < beforeCount
   },
 
+  // ==================== 增量同步 ====================
+
+  queueOp(op) {
+    if (!this.globalData.serverUrl) return
+    op.op_id = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`
+    this.pendingOps.push(op)
+  },
+
+  // 配置服务地址之前在本地创建的任务：首次同步前改用临时ID并作为新增操作提交，
+  // 否则首次全量同步会用服务端数据整体替换本地列表，这些任务随之丢失
+  adoptLocalTasks() {
+    const local = this.globalData.tasks.filter(t => t.id > 0)
+    if (local.length === 0) return
+    let ref = Math.min(0, ...this.globalData.tasks.map(t => t.id))
+    local.forEach(task => {
+      ref -= 1
+      task.id = ref
+      const { description, priority, category, createdAt } = task
+      this.queueOp({ op: 'add', ref, description, priority, category, createdAt })
+      if (task.status === 'done') {
+        this.queueOp({ op: 'done', id: ref, completedAt: task.completedAt })
+      }
+    })
+    this.saveTasks()
+  },
+
+  // 提交离线操作并取回服务端自上次同步以来的变更
+  sync() {
+    if (!this.globalData.serverUrl || this.syncing) return
+    // 从未同步过：本地已有的任务都还不在服务端
+    if (this.syncState.version === null) this.adoptLocalTasks()
+    this.syncing = true
+    const ops = this.pendingOps.slice()
+
+    wx.request({
+      url: `${this.globalData.serverUrl}/api/sync`,
+      method: 'POST',
+      data: {
+        since: this.syncState.version,
+        epoch: this.syncState.epoch,
+        ops
+      },
+      success: (res) => {
+        if (res.statusCode === 200 && res.data.success) {
+          // 请求期间新增的操作留到下次提交
+          this.pendingOps = this.pendingOps.slice(ops.length)
+          this.applySync(res.data)
+        }
+      },
+      fail: (e) => {
+        // 网络不可用时保留操作，下次再提交
+        console.error('同步失败:', e)
+      },
+      complete: () => {
+        this.syncing = false
+      }
+    })
+  },
+
+  applySync(response) {
+    // 已提交的临时ID -> 服务端ID
+    const idMap = {}
+    response.results.forEach(r => {
+      if (r.ref !== null && r.ref !== undefined && r.id !== undefined) idMap[r.ref] = r.id
+    })
+    // 请求期间新增的操作里引用的临时ID也换成服务端ID
+    this.pendingOps.forEach(op => {
+      if (op.op !== 'add' && op.id in idMap) op.id = idMap[op.id]
+    })
+    // 仍在等待提交的本地新增任务
+    const unsynced = this.globalData.tasks.filter(t => t.id < 0 && !(t.id in idMap))
+
+    let tasks
+    if (response.full) {
+      tasks = response.tasks
+    } else {
+      const byId = new Map(this.globalData.tasks.filter(t => t.id > 0).map(t => [t.id, t]))
+      response.changes.forEach(change => {
+        if (change.op === 'delete') byId.delete(change.id)
+        else byId.set(change.task.id, change.task)
+      })
+      tasks = Array.from(byId.values())
+    }
+
+    this.globalData.tasks = tasks.concat(unsynced)
+    this.syncState = { version: response.version, epoch: response.epoch }
+    this.saveTasks()
+    if (this.onTasksChanged) this.onTasksChanged()
+  },
+
   getStats() {
     const tasks = this.globalData.tasks
     const total = tasks.length
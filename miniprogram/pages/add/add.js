@@ -51,11 +51,7 @@ Page({
       return
     }
 
-    const task = app.addTask(description)
-    task.priority = this.data.selectedPriority
-    task.category = this.data.selectedCategory
-
-    app.saveTasks()
+    app.addTask(description, this.data.selectedPriority, this.data.selectedCategory)
 
     wx.showToast({
       title: '添加成功',
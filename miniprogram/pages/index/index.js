@@ -19,6 +19,7 @@ Page({
   },
 
   onShow() {
+    app.onTasksChanged = () => this.loadData()
     this.loadData()
   },
 
@@ -20,6 +20,7 @@ Page({
   },
 
   onShow() {
+    app.onTasksChanged = () => this.loadData()
     this.loadData()
   },
 
@@ -0,0 +1,161 @@
+"""
+按天预聚合的任务吞吐量
+"""
+
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from constants import (
+    STATUS_PENDING, STATUS_DONE,
+    EVENT_ADDED, EVENT_DELETED, FIELD_STATUS,
+    META_ROLLUP_PREFIX, GRANULARITY_DAY, GRANULARITY_WEEK, ERR_INVALID_GRANULARITY,
+    ERR_INVALID_DATE, TIMESERIES_MAX_DAYS, ERR_TIMESERIES_RANGE
+)
+from timestamps import now_iso
+
+# 每天的计数：[新建数, 完成数, 删除的待办数]
+CREATED, COMPLETED, REMOVED = 0, 1, 2
+
+
+def day_of(timestamp: Optional[str]) -> Optional[str]:
+    """任务时间戳所在的日期（YYYY-MM-DD），无法识别时返回None"""
+    if not timestamp or len(timestamp) < 10:
+        return None
+    try:
+        return date.fromisoformat(timestamp[:10]).isoformat()
+    except ValueError:
+        return None
+
+
+class DailyRollups:
+    """按天汇总的新建/完成/删除计数
+
+    由任务变更事件增量更新，每次只改动当天（或任务完成日）的一个桶；
+    改动过的桶通过 persist 回调写入存储元数据（每天一个键）。
+    时间序列查询只读取桶，不遍历任务。积压量为截至当天
+    新建数减去完成数和删除的待办数的累计值。
+    """
+
+    def __init__(self, buckets: Dict[str, List[int]] = None,
+                 persist: Optional[Callable[[Dict], None]] = None):
+        """
+        初始化汇总
+
+        Args:
+            buckets: {日期: [新建数, 完成数, 删除的待办数]}
+            persist: persist({元数据键: 桶})，桶变化时调用
+        """
+        self.buckets: Dict[str, List[int]] = buckets or {}
+        self.persist = persist
+
+    @classmethod
+    def from_meta(cls, meta: Dict, persist: Optional[Callable[[Dict], None]] = None
+                  ) -> 'DailyRollups':
+        """从存储元数据中恢复"""
+        return cls(cls._buckets_from_meta(meta), persist)
+
+    def reload(self, meta: Dict):
+        """从存储元数据重新读取（其他进程可能已经更新了汇总）"""
+        self.buckets = self._buckets_from_meta(meta)
+
+    @staticmethod
+    def _buckets_from_meta(meta: Dict) -> Dict[str, List[int]]:
+        return {key[len(META_ROLLUP_PREFIX):]: list(value)
+                for key, value in meta.items() if key.startswith(META_ROLLUP_PREFIX)}
+
+    def backfill(self, tasks: Iterable):
+        """由现有任务补建汇总（首次启用时使用，此前删除的任务无从统计）"""
+        for task in tasks:
+            self._bump(day_of(task.createdAt), CREATED, save=False)
+            if task.status == STATUS_DONE:
+                self._bump(day_of(task.completedAt), COMPLETED, save=False)
+        self._save(self.buckets)
+
+    def on_event(self, event: str, task, previous: Optional[Dict[str, str]]):
+        """任务管理器变更事件"""
+        if event == EVENT_ADDED:
+            self._bump(day_of(task.createdAt), CREATED)
+            if task.status == STATUS_DONE:
+                self._bump(day_of(task.completedAt), COMPLETED)
+        elif event == EVENT_DELETED:
+            # 删除已完成任务不影响积压
+            if previous[FIELD_STATUS] == STATUS_PENDING:
+                self._bump(day_of(now_iso()), REMOVED)
+        elif previous is not None and previous[FIELD_STATUS] != task.status:
+            if task.status == STATUS_DONE:
+                self._bump(day_of(task.completedAt) or day_of(now_iso()), COMPLETED)
+
+    def series(self, start: str = None, end: str = None,
+               granularity: str = GRANULARITY_DAY) -> List[Dict]:
+        """
+        时间序列
+
+        Args:
+            start: 起始日期（含），默认为 end 之前29天
+            end: 结束日期（含），默认为今天
+            granularity: day 或 week（周一开始的自然周）
+
+        Returns:
+            [{date, created, completed, removed, backlog}]，date 为该天或该周的
+            第一天，removed 为删除的待办数，backlog 为周期结束时的积压量
+
+        Raises:
+            ValueError: 日期或粒度无效，或范围超过 TIMESERIES_MAX_DAYS 天
+        """
+        if granularity not in (GRANULARITY_DAY, GRANULARITY_WEEK):
+            raise ValueError(ERR_INVALID_GRANULARITY.format(granularity=granularity))
+
+        end_day = self._parse_day(end) if end else date.fromisoformat(day_of(now_iso()))
+        start_day = self._parse_day(start) if start else \
+            end_day - timedelta(days=min(29, (end_day - date.min).days))
+        if (end_day - start_day).days >= TIMESERIES_MAX_DAYS:
+            raise ValueError(ERR_TIMESERIES_RANGE.format(max=TIMESERIES_MAX_DAYS))
+        if granularity == GRANULARITY_WEEK:
+            start_day -= timedelta(days=start_day.weekday())
+
+        # 起始日之前的积压量
+        start_key = start_day.isoformat()
+        backlog = sum(self._backlog_delta(counts)
+                      for day, counts in self.buckets.items() if day < start_key)
+
+        result: List[Dict] = []
+        day = start_day
+        while day <= end_day:
+            counts = self.buckets.get(day.isoformat(), (0, 0, 0))
+            backlog += self._backlog_delta(counts)
+            if granularity == GRANULARITY_DAY or day.weekday() == 0 or not result:
+                result.append({'date': day.isoformat(), 'created': 0,
+                               'completed': 0, 'removed': 0, 'backlog': 0})
+            point = result[-1]
+            point['created'] += counts[CREATED]
+            point['completed'] += counts[COMPLETED]
+            point['removed'] += counts[REMOVED]
+            point['backlog'] = backlog
+            day += timedelta(days=1)
+        return result
+
+    @staticmethod
+    def _parse_day(value: str) -> date:
+        """解析 YYYY-MM-DD 日期"""
+        try:
+            return date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError(ERR_INVALID_DATE.format(value=value)) from None
+
+    @staticmethod
+    def _backlog_delta(counts) -> int:
+        return counts[CREATED] - counts[COMPLETED] - counts[REMOVED]
+
+    def _bump(self, day: Optional[str], field: int, save: bool = True):
+        """给某天的计数加一"""
+        if day is None:
+            return
+        bucket = self.buckets.setdefault(day, [0, 0, 0])
+        bucket[field] += 1
+        if save:
+            self._save({day: bucket})
+
+    def _save(self, buckets: Dict[str, List[int]]):
+        if self.persist is not None and buckets:
+            self.persist({META_ROLLUP_PREFIX + day: list(counts)
+                          for day, counts in buckets.items()})
@@ -0,0 +1,62 @@
+"""
+任务管理CLI工具 - 存储格式版本与迁移
+"""
+
+from typing import Callable, Dict
+from constants import (
+    FIELD_SCHEMA_VERSION, FIELD_PRIORITY, FIELD_CATEGORY,
+    SCHEMA_VERSION, LEGACY_SCHEMA_VERSION,
+    PRIORITY_MEDIUM, DEFAULT_CATEGORY, ERR_UNSUPPORTED_SCHEMA
+)
+
+
+def _migrate_v1_to_v2(data: Dict) -> Dict:
+    """v1 → v2：补充优先级和分类"""
+    data.setdefault(FIELD_PRIORITY, PRIORITY_MEDIUM)
+    data.setdefault(FIELD_CATEGORY, DEFAULT_CATEGORY)
+    return data
+
+
+class UnsupportedSchemaError(ValueError):
+    """记录的格式版本无法识别（通常由更新版本的程序写入）"""
+
+
+# 旧版本号 → 升级到下一版本的迁移函数
+MIGRATIONS: Dict[int, Callable[[Dict], Dict]] = {
+    1: _migrate_v1_to_v2,
+}
+
+
+def record_version(data: Dict) -> int:
+    """获取任务记录的格式版本（无版本字段视为v1）"""
+    return data.get(FIELD_SCHEMA_VERSION, LEGACY_SCHEMA_VERSION)
+
+
+def migrate_record(data: Dict) -> Dict:
+    """
+    将单条任务记录升级到当前格式版本
+
+    只在读取时逐条迁移，不会改写存储；迁移后的记录在任务
+    下次保存时以新格式写回。
+
+    Args:
+        data: 存储中读取的任务字典
+
+    Returns:
+        当前版本的任务字典（旧版本记录返回副本，不修改原字典）
+
+    Raises:
+        UnsupportedSchemaError: 记录版本高于当前支持的版本或无法识别
+    """
+    version = record_version(data)
+    if version == SCHEMA_VERSION:
+        return data
+    if not isinstance(version, int) or version > SCHEMA_VERSION or version not in MIGRATIONS:
+        raise UnsupportedSchemaError(ERR_UNSUPPORTED_SCHEMA.format(version=version))
+
+    data = dict(data)
+    while version < SCHEMA_VERSION:
+        data = MIGRATIONS[version](data)
+        version += 1
+    data[FIELD_SCHEMA_VERSION] = version
+    return data
@@ -0,0 +1,110 @@
+"""
+流式分位数草图
+"""
+
+import math
+from typing import Dict, Iterable, Optional
+
+from constants import SKETCH_RELATIVE_ACCURACY
+
+
+class QuantileSketch:
+    """可合并的流式分位数草图（DDSketch 算法）
+
+    正数按对数分桶计数，任意分位数的相对误差不超过 relative_accuracy。
+    内存只与取值的数量级跨度有关，与样本数无关；两个草图的桶
+    计数直接相加即可合并，适合增量更新和跨归档分片汇总。
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = {}
+        # 小于等于0的值单独计数
+        self._zero_count = 0
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float, count: int = 1):
+        """加入样本"""
+        if value <= 0:
+            self._zero_count += count
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self._buckets[key] = self._buckets.get(key, 0) + count
+
+        self.count += count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def extend(self, values: Iterable[float]):
+        """批量加入样本"""
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: 'QuantileSketch'):
+        """合并另一个草图（两者精度必须相同）"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+
+        for key, count in other._buckets.items():
+            self._buckets[key] = self._buckets.get(key, 0) + count
+        self._zero_count += other._zero_count
+        self.count += other.count
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        估算分位数
+
+        Args:
+            q: 0到1之间的分位点
+
+        Returns:
+            分位数估计值，没有样本时返回None
+        """
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        seen = self._zero_count
+        if rank < seen:
+            return 0.0
+
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if rank < seen:
+                value = 2 * self._gamma ** key / (self._gamma + 1)
+                # 估计值不超出实际样本范围
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        """序列化（用于持久化或在分片间传输）"""
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'buckets': {str(key): count for key, count in self._buckets.items()},
+            'zero_count': self._zero_count,
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuantileSketch':
+        """反序列化"""
+        sketch = cls(data['relative_accuracy'])
+        sketch._buckets = {int(key): count for key, count in data['buckets'].items()}
+        sketch._zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        return sketch
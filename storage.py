@@ -2,16 +2,166 @@
 任务管理CLI工具 - 存储接口和实现
 """
 
+import atexit
 import json
 import os
+import sqlite3
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import List, Dict
-from constants import DEFAULT_FILENAME, BACKUP_SUFFIX
+from contextlib import contextmanager
+from typing import List, Dict, Iterable, Optional
+from constants import (
+    DEFAULT_FILENAME, BACKUP_SUFFIX, TEMP_SUFFIX, DEFAULT_BACKUP_COUNT, META_SUFFIX,
+    LOCK_SUFFIX,
+    WAL_SUFFIX, WAL_OLD_SUFFIX, WAL_OP_PUT, WAL_OP_DELETE, WAL_OP_META,
+    WAL_COMPACT_THRESHOLD, DEFAULT_DB_FILENAME, SQLITE_EXTENSIONS,
+    ENV_STORAGE_BACKEND, STORAGE_JSON, STORAGE_WAL, STORAGE_SQLITE, STORAGE_BACKENDS,
+    ERR_UNKNOWN_STORAGE,
+    WRITE_BEHIND_WINDOW, WRITE_BEHIND_MAX_OPS, WRITE_BEHIND_RETRY_SECONDS,
+    FIELD_ID, FIELD_DESCRIPTION, FIELD_STATUS,
+    FIELD_CREATED_AT, FIELD_COMPLETED_AT, FIELD_PRIORITY, FIELD_CATEGORY,
+    DEFAULT_CATEGORY, PRIORITY_MEDIUM
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _write_json_temp(filepath: str, data) -> str:
+    """将数据写入同目录的临时文件并fsync，返回临时文件路径"""
+    tmp_path = filepath + TEMP_SUFFIX
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path
+
+
+def _fsync_dir(filepath: str) -> None:
+    """fsync所在目录使重命名持久化（不支持的平台忽略）"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(filepath)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_json_atomic(filepath: str, data) -> None:
+    """写入临时文件并fsync后原子替换目标文件"""
+    tmp_path = _write_json_temp(filepath, data)
+    os.replace(tmp_path, filepath)
+    _fsync_dir(filepath)
+
+
+def _load_meta_file(filepath: str) -> Dict:
+    """读取元数据文件，不存在或损坏时返回空字典"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+
+def _stat_token(*paths: str) -> tuple:
+    """文件的 (修改时间, 大小, inode)，不存在的文件为None"""
+    token = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            token.append(None)
+        else:
+            token.append((st.st_mtime_ns, st.st_size, st.st_ino))
+    return tuple(token)
+
+
+class FileLock:
+    """基于锁文件的跨进程互斥锁
+
+    POSIX 使用 fcntl.flock，Windows 使用 msvcrt.locking。同一对象在
+    同一线程内可重入；进程内的其他线程由线程锁排除在外。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._fd: Optional[int] = None
+        self._depth = 0
+
+    def acquire(self) -> None:
+        """获取锁，其他进程持有时等待"""
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    self._lock_fd(fd)
+                except BaseException:
+                    os.close(fd)
+                    raise
+            except BaseException:
+                self._thread_lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+
+    def release(self) -> None:
+        """释放锁"""
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                self._unlock_fd(fd)
+            finally:
+                os.close(fd)
+        self._thread_lock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+    @staticmethod
+    def _lock_fd(fd: int) -> None:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            return
+        # msvcrt 锁定第一个字节；LK_LOCK 重试约10秒后仍失败时抛出OSError，继续等待
+        while True:
+            os.lseek(fd, 0, os.SEEK_SET)
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    @staticmethod
+    def _unlock_fd(fd: int) -> None:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
 
 
 class TaskStorage(ABC):
     """任务存储接口"""
 
+    # 是否支持按行增量写入（apply_changes）
+    supports_delta = False
+
     @abstractmethod
     def load(self) -> List[Dict]:
         """加载任务数据"""
@@ -32,12 +182,46 @@ class TaskStorage(ABC):
         """文件不存在时创建"""
         pass
 
+    def apply_changes(self, upserts: Iterable[Dict],
+                      deleted_ids: Iterable[int]) -> None:
+        """增量写入：插入/更新upserts中的任务，删除deleted_ids中的任务"""
+        raise NotImplementedError
+
+    def load_meta(self) -> Dict:
+        """加载元数据（如ID计数器），不支持的存储返回空字典"""
+        return {}
+
+    def save_meta(self, meta: Dict) -> None:
+        """保存元数据（与已保存的元数据按键合并），不支持的存储忽略"""
+        pass
+
+    def change_token(self) -> Optional[tuple]:
+        """
+        已持久化数据的变更标记（如文件的修改时间、大小和inode）
+
+        任何写入之后标记都会变化，用于多进程共享存储时判断是否需要
+        重新加载。不支持的存储返回None。
+        """
+        return None
+
+    @contextmanager
+    def lock(self):
+        """跨进程互斥锁，多进程共享存储时包住每一次“加载-修改-写入”（默认不加锁）"""
+        yield
+
 
 class JSONTaskStorage(TaskStorage):
-    """JSON文件存储实现"""
+    """JSON文件存储实现
 
-    def __init__(self, filepath: str = None):
+    保存时先写临时文件并fsync，再原子重命名覆盖，崩溃不会留下
+    截断的文件。旧版本通过硬链接（不支持时重命名）保留为备份，
+    共轮转 backup_count 代：.backup、.backup.2、.backup.3……
+    """
+
+    def __init__(self, filepath: str = None, backup_count: int = DEFAULT_BACKUP_COUNT):
         self.filepath = filepath or os.path.expanduser("~/" + DEFAULT_FILENAME)
+        self.backup_count = backup_count
+        self._file_lock = FileLock(self.filepath + LOCK_SUFFIX)
 
     def load(self) -> List[Dict]:
         """从JSON文件加载任务"""
@@ -59,12 +243,12 @@ class JSONTaskStorage(TaskStorage):
 
     def save(self, tasks: List[Dict]) -> None:
         """保存任务到JSON文件"""
-        # 创建备份
-        self._create_backup()
+        tmp_path = _write_json_temp(self.filepath, tasks)
 
-        # 保存数据
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            json.dump(tasks, f, indent=2, ensure_ascii=False)
+        # 保留当前版本为备份，再原子替换
+        self._rotate_backups()
+        os.replace(tmp_path, self.filepath)
+        _fsync_dir(self.filepath)
 
     def exists(self) -> bool:
         """检查文件是否存在"""
@@ -81,29 +265,732 @@ class JSONTaskStorage(TaskStorage):
             os.makedirs(file_dir, exist_ok=True)
 
         # 创建空JSON数组
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            json.dump([], f, indent=2, ensure_ascii=False)
+        _write_json_atomic(self.filepath, [])
 
-    def _create_backup(self):
-        """创建备份文件"""
-        if not self.exists():
+    def load_meta(self) -> Dict:
+        """从元数据文件加载"""
+        return _load_meta_file(self.filepath + META_SUFFIX)
+
+    def save_meta(self, meta: Dict) -> None:
+        """合并后原子写入元数据文件"""
+        path = self.filepath + META_SUFFIX
+        _write_json_atomic(path, {**_load_meta_file(path), **meta})
+
+    def change_token(self) -> tuple:
+        """任务文件和元数据文件的状态（每次保存都原子替换，inode随之变化）"""
+        return _stat_token(self.filepath, self.filepath + META_SUFFIX)
+
+    @contextmanager
+    def lock(self):
+        """跨进程互斥锁（锁文件 <文件名>.lock）"""
+        with self._file_lock:
+            yield
+
+    def get_backup_path(self, generation: int = 1) -> str:
+        """获取第generation代备份文件路径（1为最新）"""
+        if generation == 1:
+            return self.filepath + BACKUP_SUFFIX
+        return f"{self.filepath}{BACKUP_SUFFIX}.{generation}"
+
+    def _rotate_backups(self):
+        """轮转备份：较旧的代依次后移，当前文件成为最新备份"""
+        if self.backup_count <= 0 or not self.exists():
             return
 
-        backup_path = self.filepath + BACKUP_SUFFIX
         try:
-            with open(self.filepath, 'r', encoding='utf-8') as src:
-                with open(backup_path, 'w', encoding='utf-8') as dst:
-                    dst.write(src.read())
-        except Exception:
+            oldest = self.get_backup_path(self.backup_count)
+            if os.path.exists(oldest):
+                os.remove(oldest)
+
+            for generation in range(self.backup_count - 1, 0, -1):
+                path = self.get_backup_path(generation)
+                if os.path.exists(path):
+                    os.replace(path, self.get_backup_path(generation + 1))
+
+            latest = self.get_backup_path(1)
+            try:
+                os.link(self.filepath, latest)
+            except OSError:
+                # 文件系统不支持硬链接时直接重命名，随后由临时文件补位
+                os.replace(self.filepath, latest)
+        except OSError:
             # 备份失败不影响主流程
             pass
 
 
+class WALTaskStorage(TaskStorage):
+    """追加日志存储实现
+
+    每次变更只向日志追加一条记录，加载时在快照上重放日志，
+    日志过长时在后台线程中压缩为新的快照。快照格式与
+    JSONTaskStorage 相同，可以直接互换使用。
+    """
+
+    supports_delta = True
+
+    def __init__(self, filepath: str = None,
+                 compact_threshold: int = WAL_COMPACT_THRESHOLD,
+                 background: bool = True):
+        self.filepath = filepath or os.path.expanduser("~/" + DEFAULT_FILENAME)
+        self.log_path = self.filepath + WAL_SUFFIX
+        self.old_log_path = self.filepath + WAL_OLD_SUFFIX
+        self.compact_threshold = compact_threshold
+        self.background = background
+
+        # 当前已持久化状态的内存镜像 {id: 任务字典}
+        self._records: Dict[int, Dict] = {}
+        self._meta: Dict = {}
+        self._log_entries = 0
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compact_thread: Optional[threading.Thread] = None
+        self._file_lock = FileLock(self.filepath + LOCK_SUFFIX)
+
+    def load(self) -> List[Dict]:
+        """加载快照并重放日志"""
+        with self._lock:
+            records: Dict[int, Dict] = {}
+
+            if os.path.exists(self.filepath):
+                try:
+                    with open(self.filepath, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Invalid JSON format: {e}")
+
+                if not isinstance(data, list):
+                    raise ValueError("Invalid task file format. Expected array.")
+
+                for item in data:
+                    if isinstance(item, dict) and FIELD_ID in item:
+                        records[item[FIELD_ID]] = item
+
+            meta = _load_meta_file(self.filepath + META_SUFFIX)
+
+            # 先重放压缩中断时遗留的旧日志，再重放当前日志
+            entries = self._replay(self.old_log_path, records, meta)
+            entries += self._replay(self.log_path, records, meta)
+
+            self._records = records
+            self._meta = meta
+            self._log_entries = entries
+            return [dict(record) for record in records.values()]
+
+    def save(self, tasks: List[Dict]) -> None:
+        """与镜像比较，只为发生变化的任务追加日志"""
+        with self._lock:
+            incoming = {task[FIELD_ID]: task for task in tasks}
+            upserts = [task for task_id, task in incoming.items()
+                       if self._records.get(task_id) != task]
+            deleted_ids = [task_id for task_id in self._records
+                           if task_id not in incoming]
+            self._append(upserts, deleted_ids)
+
+    def apply_changes(self, upserts: Iterable[Dict],
+                      deleted_ids: Iterable[int]) -> None:
+        """直接追加增量变更"""
+        with self._lock:
+            self._append(list(upserts), list(deleted_ids))
+
+    def load_meta(self) -> Dict:
+        """返回加载时重放得到的元数据"""
+        with self._lock:
+            return dict(self._meta)
+
+    def save_meta(self, meta: Dict) -> None:
+        """以日志记录的形式追加元数据"""
+        with self._lock:
+            self._write_lines([json.dumps({"op": WAL_OP_META, "meta": meta},
+                                          ensure_ascii=False)])
+            self._meta.update(meta)
+            self._maybe_compact()
+
+    def change_token(self) -> tuple:
+        """快照、元数据和日志文件的状态（追加日志时大小变化）"""
+        return _stat_token(self.filepath, self.filepath + META_SUFFIX,
+                           self.log_path, self.old_log_path)
+
+    @contextmanager
+    def lock(self):
+        """跨进程互斥锁（锁文件 <文件名>.lock），压缩时也会获取"""
+        with self._file_lock:
+            yield
+
+    def exists(self) -> bool:
+        """检查快照或日志是否存在"""
+        return os.path.exists(self.filepath) or os.path.exists(self.log_path)
+
+    def create_if_not_exists(self) -> None:
+        """文件不存在时创建空快照"""
+        if self.exists():
+            return
+
+        file_dir = os.path.dirname(self.filepath)
+        if file_dir and not os.path.exists(file_dir):
+            os.makedirs(file_dir, exist_ok=True)
+
+        _write_json_atomic(self.filepath, [])
+
+    def compact(self) -> None:
+        """
+        将当前状态写为新快照并丢弃已合并的日志
+
+        持有跨进程锁：其他进程可能也在追加同一日志，快照由磁盘上的
+        快照和日志重放得到，而不是只用本进程的镜像。
+        """
+        with self._compact_lock, self._file_lock:
+            with self._lock:
+                self.load()
+                # 轮换日志：之后的追加写入新日志，旧日志在快照落盘后删除
+                if os.path.exists(self.log_path) and not os.path.exists(self.old_log_path):
+                    os.replace(self.log_path, self.old_log_path)
+                records = [dict(record) for record in self._records.values()]
+                meta = dict(self._meta)
+                self._log_entries = 0
+
+            # 快照写入期间不持有线程锁，本进程的追加操作不受影响
+            _write_json_atomic(self.filepath + META_SUFFIX, meta)
+            _write_json_atomic(self.filepath, records)
+
+            with self._lock:
+                if os.path.exists(self.old_log_path):
+                    os.remove(self.old_log_path)
+
+    def close(self) -> None:
+        """等待后台压缩结束"""
+        thread = self._compact_thread
+        if thread is not None:
+            thread.join()
+
+    def _replay(self, path: str, records: Dict[int, Dict], meta: Dict) -> int:
+        """在记录上重放日志文件，返回重放的条目数"""
+        if not os.path.exists(path):
+            return 0
+
+        count = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时写了一半的尾部记录，忽略
+                    break
+
+                if entry.get("op") == WAL_OP_PUT:
+                    task = entry["task"]
+                    records[task[FIELD_ID]] = task
+                elif entry.get("op") == WAL_OP_DELETE:
+                    records.pop(entry["id"], None)
+                elif entry.get("op") == WAL_OP_META:
+                    meta.update(entry["meta"])
+                count += 1
+
+        return count
+
+    def _append(self, upserts: List[Dict], deleted_ids: List[int]) -> None:
+        """追加日志记录并同步镜像（调用方持有锁）"""
+        if not upserts and not deleted_ids:
+            return
+
+        lines = []
+        for task in upserts:
+            lines.append(json.dumps({"op": WAL_OP_PUT, "task": task},
+                                    ensure_ascii=False))
+        for task_id in deleted_ids:
+            lines.append(json.dumps({"op": WAL_OP_DELETE, "id": task_id}))
+
+        self._write_lines(lines)
+
+        for task in upserts:
+            self._records[task[FIELD_ID]] = dict(task)
+        for task_id in deleted_ids:
+            self._records.pop(task_id, None)
+
+        self._maybe_compact()
+
+    def _write_lines(self, lines: List[str]) -> None:
+        """追加并fsync日志行（调用方持有锁）"""
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._log_entries += len(lines)
+
+    def _maybe_compact(self) -> None:
+        """镜像更新后检查是否达到压缩阈值（调用方持有锁）"""
+        if self._log_entries >= self.compact_threshold:
+            self._schedule_compaction()
+
+    def _schedule_compaction(self) -> None:
+        """触发压缩（调用方持有锁）"""
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return
+
+        if not self.background:
+            self.compact()
+            return
+
+        self._compact_thread = threading.Thread(target=self.compact, daemon=True)
+        self._compact_thread.start()
+
+
+class SQLiteTaskStorage(TaskStorage):
+    """SQLite存储实现
+
+    每个任务一行，按行插入/更新/删除，并在状态、创建时间、
+    分类和优先级上建立索引，供 query() 直接查询。
+    """
+
+    supports_delta = True
+
+    COLUMNS = [
+        FIELD_ID, FIELD_DESCRIPTION, FIELD_STATUS,
+        FIELD_CREATED_AT, FIELD_COMPLETED_AT, FIELD_PRIORITY, FIELD_CATEGORY
+    ]
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            status TEXT NOT NULL,
+            createdAt TEXT,
+            completedAt TEXT,
+            priority TEXT,
+            category TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(createdAt)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks(category)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority)",
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+    ]
+
+    def __init__(self, filepath: str = None):
+        self.filepath = filepath or os.path.expanduser("~/" + DEFAULT_DB_FILENAME)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(self.filepath + LOCK_SUFFIX)
+
+    def load(self) -> List[Dict]:
+        """按ID顺序加载全部任务"""
+        return self.query()
+
+    def save(self, tasks: List[Dict]) -> None:
+        """整体保存：在一个事务中写入全部任务并删除多余的行"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_ids (id INTEGER PRIMARY KEY)")
+                conn.execute("DELETE FROM keep_ids")
+                conn.executemany("INSERT INTO keep_ids (id) VALUES (?)",
+                                 [(task[FIELD_ID],) for task in tasks])
+                conn.execute("DELETE FROM tasks WHERE id NOT IN (SELECT id FROM keep_ids)")
+                self._upsert(conn, tasks)
+
+    def apply_changes(self, upserts: Iterable[Dict],
+                      deleted_ids: Iterable[int]) -> None:
+        """按行增量写入"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                self._upsert(conn, list(upserts))
+                conn.executemany("DELETE FROM tasks WHERE id = ?",
+                                 [(task_id,) for task_id in deleted_ids])
+
+    def query(self, status: str = None, category: str = None,
+              priority: str = None, created_from: str = None,
+              created_to: str = None, limit: int = None) -> List[Dict]:
+        """
+        通过索引查询任务
+
+        Args:
+            status: 任务状态
+            category: 分类
+            priority: 优先级
+            created_from: 创建时间下限（ISO格式，包含）
+            created_to: 创建时间上限（ISO格式，不包含）
+            limit: 最多返回的任务数
+
+        Returns:
+            按ID排序的任务字典列表
+        """
+        conditions = []
+        params = []
+        for column, value in ((FIELD_STATUS, status),
+                              (FIELD_CATEGORY, category),
+                              (FIELD_PRIORITY, priority)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if created_from is not None:
+            conditions.append(f"{FIELD_CREATED_AT} >= ?")
+            params.append(created_from)
+        if created_to is not None:
+            conditions.append(f"{FIELD_CREATED_AT} < ?")
+            params.append(created_to)
+
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM tasks"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def count(self, status: str = None, category: str = None,
+              priority: str = None) -> int:
+        """通过索引统计任务数"""
+        conditions = []
+        params = []
+        for column, value in ((FIELD_STATUS, status),
+                              (FIELD_CATEGORY, category),
+                              (FIELD_PRIORITY, priority)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+
+        sql = "SELECT COUNT(*) FROM tasks"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+
+        with self._lock:
+            return self._connect().execute(sql, params).fetchone()[0]
+
+    def load_meta(self) -> Dict:
+        """从meta表加载元数据"""
+        with self._lock:
+            rows = self._connect().execute("SELECT key, value FROM meta").fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def save_meta(self, meta: Dict) -> None:
+        """写入meta表"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [(key, json.dumps(value)) for key, value in meta.items()]
+                )
+
+    def change_token(self) -> tuple:
+        """PRAGMA data_version：其他连接（进程）提交事务后变化，本连接的写入不改变它"""
+        with self._lock:
+            return (self._connect().execute("PRAGMA data_version").fetchone()[0],)
+
+    @contextmanager
+    def lock(self):
+        """
+        跨进程互斥锁（锁文件 <文件名>.lock）
+
+        SQLite 自身保证单个事务的原子性，这把锁用于串行化
+        TaskManager 的“加载-修改-写入”，避免分配重复的ID或覆盖其他进程的修改。
+        """
+        with self._file_lock:
+            yield
+
+    def exists(self) -> bool:
+        """检查数据库文件是否存在"""
+        return os.path.exists(self.filepath)
+
+    def create_if_not_exists(self) -> None:
+        """创建数据库文件和表结构"""
+        file_dir = os.path.dirname(self.filepath)
+        if file_dir and not os.path.exists(file_dir):
+            os.makedirs(file_dir, exist_ok=True)
+
+        with self._lock:
+            self._connect()
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取连接，首次连接时建表（调用方持有锁）"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.filepath, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                for statement in self.SCHEMA:
+                    conn.execute(statement)
+            self._conn = conn
+        return self._conn
+
+    def _upsert(self, conn: sqlite3.Connection, tasks: List[Dict]) -> None:
+        """插入或替换任务行"""
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        conn.executemany(
+            f"INSERT OR REPLACE INTO tasks ({', '.join(self.COLUMNS)}) "
+            f"VALUES ({placeholders})",
+            [self._to_row(task) for task in tasks]
+        )
+
+    @staticmethod
+    def _to_row(task: Dict) -> tuple:
+        """任务字典转换为行"""
+        return (
+            task[FIELD_ID],
+            task[FIELD_DESCRIPTION],
+            task[FIELD_STATUS],
+            task.get(FIELD_CREATED_AT),
+            task.get(FIELD_COMPLETED_AT),
+            task.get(FIELD_PRIORITY, PRIORITY_MEDIUM),
+            task.get(FIELD_CATEGORY, DEFAULT_CATEGORY),
+        )
+
+
+class WriteBehindStorage(TaskStorage):
+    """写合并存储包装器
+
+    save/apply_changes 只记录待写入的数据并立即返回，后台线程在
+    window 秒内（或累计 max_ops 次变更后）把期间的所有变更合并为
+    一次写入。wait=True 时调用方会等待包含本次变更的那次落盘
+    （组提交）；也可以在释放自己的锁之后调用 wait() 等待此前的变更
+    落盘，或调用 flush() 立即落盘。
+
+    写入失败时这批变更放回队列，retry 秒后与之后的变更一起重试；
+    失败只报告给等待这批变更的调用方，不影响之后无关的写入。
+    """
+
+    def __init__(self, inner: TaskStorage, window: float = WRITE_BEHIND_WINDOW,
+                 max_ops: int = WRITE_BEHIND_MAX_OPS, wait: bool = False,
+                 retry: float = WRITE_BEHIND_RETRY_SECONDS):
+        self.inner = inner
+        self.window = window
+        self.max_ops = max_ops
+        self.wait_for_flush = wait
+        self.retry = retry
+        self.supports_delta = inner.supports_delta
+
+        self._cond = threading.Condition()
+        # 待写入的整体快照，以及其后的增量变更
+        self._snapshot: Optional[List[Dict]] = None
+        self._upserts: Dict[int, Dict] = {}
+        self._deleted_ids = set()
+        self._meta: Optional[Dict] = None
+        self._pending_ops = 0
+        # 已登记、已尝试写入、已落盘的变更序号
+        self._queued_gen = 0
+        self._attempted_gen = 0
+        self._flushed_gen = 0
+        self._flush_now = False
+        # 最近一次写入失败的异常，以及重试前不早于的时间
+        self._error: Optional[Exception] = None
+        self._retry_at = 0.0
+        self._closed = False
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def load(self) -> List[Dict]:
+        """先落盘待写入的变更再加载"""
+        self.flush()
+        return self.inner.load()
+
+    def save(self, tasks: List[Dict]) -> None:
+        """记录整体快照，覆盖此前尚未落盘的变更"""
+        with self._cond:
+            self._snapshot = list(tasks)
+            self._upserts.clear()
+            self._deleted_ids.clear()
+            ticket = self._enqueue()
+        if self.wait_for_flush:
+            self._wait_for(ticket)
+
+    def apply_changes(self, upserts: Iterable[Dict],
+                      deleted_ids: Iterable[int]) -> None:
+        """合并增量变更，同一任务只保留最后一次修改"""
+        with self._cond:
+            for task in upserts:
+                self._deleted_ids.discard(task[FIELD_ID])
+                self._upserts[task[FIELD_ID]] = task
+            for task_id in deleted_ids:
+                self._upserts.pop(task_id, None)
+                self._deleted_ids.add(task_id)
+            ticket = self._enqueue()
+        if self.wait_for_flush:
+            self._wait_for(ticket)
+
+    def load_meta(self) -> Dict:
+        """先落盘待写入的变更再加载元数据"""
+        self.flush()
+        return self.inner.load_meta()
+
+    def save_meta(self, meta: Dict) -> None:
+        """记录待写入的元数据，与任务变更一起落盘"""
+        with self._cond:
+            if self._meta is None:
+                self._meta = {}
+            self._meta.update(meta)
+            ticket = self._enqueue()
+        if self.wait_for_flush:
+            self._wait_for(ticket)
+
+    def change_token(self) -> Optional[tuple]:
+        """先落盘待写入的变更，再返回底层存储的变更标记"""
+        self.flush()
+        return self.inner.change_token()
+
+    @contextmanager
+    def lock(self):
+        """持有底层存储的跨进程锁，释放前把期间的变更落盘（退化为直写）"""
+        with self.inner.lock():
+            try:
+                yield
+            finally:
+                self.flush()
+
+    def exists(self) -> bool:
+        """检查底层存储是否存在"""
+        return self.inner.exists()
+
+    def create_if_not_exists(self) -> None:
+        """底层存储不存在时创建"""
+        self.inner.create_if_not_exists()
+
+    def flush(self) -> None:
+        """立即落盘全部待写入的变更并等待完成，失败时抛出异常"""
+        with self._cond:
+            if self._queued_gen == self._flushed_gen:
+                return
+            self._flush_now = True
+            self._cond.notify_all()
+            ticket = self._queued_gen
+        self._wait_for(ticket)
+
+    def wait(self) -> None:
+        """
+        等待此前登记的全部变更落盘，失败时抛出异常
+
+        与 flush() 不同，不提前结束窗口期：期间其他调用方的变更
+        仍然合并到同一次写入。
+        """
+        with self._cond:
+            ticket = self._queued_gen
+        self._wait_for(ticket)
+
+    def close(self) -> None:
+        """落盘剩余变更并停止后台线程（最后一次写入失败时抛出异常）"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            if self._flushed_gen < self._queued_gen and self._error is not None:
+                raise self._error
+
+    def _enqueue(self) -> int:
+        """登记一次变更，返回其序号（调用方持有锁）"""
+        self._pending_ops += 1
+        self._queued_gen += 1
+        if self._pending_ops >= self.max_ops:
+            self._flush_now = True
+        self._cond.notify_all()
+        return self._queued_gen
+
+    def _wait_for(self, ticket: int) -> None:
+        """等待包含序号为ticket的变更的那次写入，写入失败时抛出其异常"""
+        with self._cond:
+            while self._attempted_gen < ticket and not self._stopped:
+                self._cond.wait()
+            if self._flushed_gen < ticket and self._error is not None:
+                raise self._error
+
+    def _requeue(self, snapshot: Optional[List[Dict]], upserts: List[Dict],
+                 deleted_ids: List[int], meta: Optional[Dict]) -> None:
+        """把写入失败的一批变更放回队列，此后登记的变更优先（调用方持有锁）"""
+        if self._snapshot is None:
+            # 此后没有新的整体快照：失败的一批在前，此后的增量在后
+            self._snapshot = snapshot
+            merged = {task[FIELD_ID]: task for task in upserts
+                      if task[FIELD_ID] not in self._deleted_ids}
+            merged.update(self._upserts)
+            self._upserts = merged
+            self._deleted_ids = set(deleted_ids).difference(merged) | self._deleted_ids
+        if meta is not None:
+            self._meta = {**meta, **(self._meta or {})}
+        self._pending_ops += 1
+
+    def _run(self) -> None:
+        """后台落盘线程"""
+        while True:
+            with self._cond:
+                while self._pending_ops == 0 and not self._closed:
+                    self._cond.wait()
+                if self._pending_ops == 0:
+                    self._stop()
+                    return
+
+                # 等待窗口期结束，期间到达的变更合并到同一次写入；失败后至少等到重试时间
+                deadline = max(time.monotonic() + self.window, self._retry_at)
+                while not self._flush_now and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                snapshot, self._snapshot = self._snapshot, None
+                upserts, self._upserts = list(self._upserts.values()), {}
+                deleted_ids, self._deleted_ids = list(self._deleted_ids), set()
+                meta, self._meta = self._meta, None
+                self._pending_ops = 0
+                self._flush_now = False
+                generation = self._queued_gen
+
+            error = None
+            try:
+                if snapshot is not None:
+                    self.inner.save(snapshot)
+                if upserts or deleted_ids:
+                    self.inner.apply_changes(upserts, deleted_ids)
+                if meta is not None:
+                    self.inner.save_meta(meta)
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                self._attempted_gen = generation
+                if error is None:
+                    self._flushed_gen = generation
+                    self._error = None
+                else:
+                    self._error = error
+                    self._requeue(snapshot, upserts, deleted_ids, meta)
+                    self._retry_at = time.monotonic() + self.retry
+                self._cond.notify_all()
+                if error is not None and self._closed:
+                    # 关闭时不再重试，close() 抛出最后的异常
+                    self._stop()
+                    return
+
+    def _stop(self) -> None:
+        """标记后台线程已退出并唤醒等待者（调用方持有锁）"""
+        self._stopped = True
+        self._cond.notify_all()
+
+
 class MockTaskStorage(TaskStorage):
     """Mock存储用于测试"""
 
     def __init__(self, data: List[Dict] = None):
         self.data = data if data is not None else []
+        self.meta: Dict = {}
 
     def load(self) -> List[Dict]:
         """从内存加载任务"""
@@ -113,6 +1000,14 @@ class MockTaskStorage(TaskStorage):
         """保存任务到内存"""
         self.data = tasks.copy()
 
+    def load_meta(self) -> Dict:
+        """从内存加载元数据"""
+        return dict(self.meta)
+
+    def save_meta(self, meta: Dict) -> None:
+        """合并元数据到内存"""
+        self.meta.update(meta)
+
     def exists(self) -> bool:
         """Mock总是返回True"""
         return True
@@ -120,3 +1015,31 @@ class MockTaskStorage(TaskStorage):
     def create_if_not_exists(self) -> None:
         """Mock无需创建"""
         pass
+
+
+def create_storage(filepath: str = None, backend: str = None) -> TaskStorage:
+    """
+    选择存储实现
+
+    .db/.sqlite 文件使用SQLite；其余按 backend（json/wal/sqlite，未指定时取
+    环境变量 TASKS_STORAGE）选择，sqlite 未指定文件时使用 ~/.tasks.db。
+    JSON文件旁存在尚未压缩的追加日志时总是使用WAL，否则日志中的修改
+    会被忽略并在下次整体保存时丢失。
+
+    Raises:
+        ValueError: 存储类型无效
+    """
+    if filepath and filepath.lower().endswith(SQLITE_EXTENSIONS):
+        return SQLiteTaskStorage(filepath)
+
+    backend = backend or os.environ.get(ENV_STORAGE_BACKEND) or STORAGE_JSON
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(ERR_UNKNOWN_STORAGE.format(backend=backend,
+                                                    choices='/'.join(STORAGE_BACKENDS)))
+    if backend == STORAGE_SQLITE:
+        return SQLiteTaskStorage(filepath)
+    path = filepath or os.path.expanduser("~/" + DEFAULT_FILENAME)
+    if backend == STORAGE_WAL or os.path.exists(path + WAL_SUFFIX) \
+            or os.path.exists(path + WAL_OLD_SUFFIX):
+        return WALTaskStorage(filepath)
+    return JSONTaskStorage(filepath)
@@ -0,0 +1,266 @@
+"""
+增量同步 - 供小程序等离线客户端与服务端对账
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from constants import (
+    STATUS_DONE, EVENT_DELETED, EVENT_CLEARED,
+    SYNC_LOG_SIZE, SYNC_APPLIED_OPS_SIZE, META_SYNC_OP_PREFIX, META_SYNC_OP_NEXT,
+    SYNC_OP_ADD, SYNC_OP_DONE, SYNC_OP_DELETE,
+    SYNC_APPLIED, SYNC_CONFLICT, SYNC_REJECTED
+)
+from timestamps import to_epoch_us
+from validators import TaskValidator
+
+
+class ChangeLog:
+    """按数据版本排序的任务变更日志
+
+    注册为 TaskManager 的监听器，每个任务只保留最后一次变更
+    （当前内容或删除标记），因此日志大小不超过被修改过的任务数。
+    查询某版本之后的变更时从最新一端倒序扫描，只访问这些变更。
+    超出 size 时丢弃最早的变更并推进 horizon，版本早于 horizon 的
+    客户端需要重新获取全量数据。
+    """
+
+    def __init__(self, manager, serialize: Callable = None, size: int = SYNC_LOG_SIZE):
+        """
+        初始化变更日志
+
+        Args:
+            manager: 任务管理器
+            serialize: 任务对象转字典的函数，默认为 task.to_dict
+            size: 最多保留的变更数
+        """
+        self.manager = manager
+        self.serialize = serialize or (lambda task: task.to_dict())
+        # 每次启动生成：重启后版本重新计数，客户端据此判断需要全量同步
+        self.epoch = uuid.uuid4().hex[:12]
+        # 不晚于该版本的变更可能已不在日志中
+        self.horizon = manager.version
+        self._entries: OrderedDict = OrderedDict()
+        self._size = size
+        self._lock = threading.Lock()
+        manager.add_listener(self.on_event)
+
+    def on_event(self, event: str, task, previous: Optional[Dict[str, str]]):
+        """任务管理器变更事件"""
+        version = self.manager.version
+        removed = event in (EVENT_DELETED, EVENT_CLEARED)
+        entry = (version, None if removed else self.serialize(task))
+        with self._lock:
+            self._entries.pop(task.id, None)
+            self._entries[task.id] = entry
+            if len(self._entries) > self._size:
+                _, (oldest_version, _) = self._entries.popitem(last=False)
+                self.horizon = oldest_version
+
+    def changes_since(self, since: int) -> Optional[List[Dict]]:
+        """
+        获取版本since之后的变更
+
+        Returns:
+            按版本排序的 {'op': 'put', 'task': {...}} / {'op': 'delete', 'id': ID}；
+            日志已不能覆盖该版本时返回None
+        """
+        with self._lock:
+            if since < self.horizon:
+                return None
+
+            changes = []
+            for task_id, (version, task) in reversed(self._entries.items()):
+                if version <= since:
+                    break
+                changes.append({'op': 'put', 'task': task} if task is not None
+                               else {'op': 'delete', 'id': task_id})
+        changes.reverse()
+        return changes
+
+
+class SyncService:
+    """增量同步服务
+
+    客户端提交离线期间的操作并取回自己版本之后的变更。操作按提交顺序
+    逐个应用，冲突按固定规则解决，同一批操作在任何时候重放结果都相同：
+      - add：总是新建任务，返回服务端分配的ID（用 ref 对应客户端临时ID）
+      - done：任务已被删除时删除优先，返回冲突；已完成时保留服务端的完成时间
+      - delete：删除优先于其他修改；任务已不存在视为成功
+    同一批中 done/delete 的 id 可以是前面 add 的 ref（客户端临时ID）。
+    带 op_id 的操作只应用一次，网络重试时直接返回第一次的结果。最近
+    SYNC_APPLIED_OPS_SIZE 个操作的结果与操作本身在同一次保存中写入存储元数据，
+    服务重启或重试落到另一个进程时同样不会重复应用。
+    """
+
+    def __init__(self, manager, serialize: Callable = None, size: int = SYNC_LOG_SIZE):
+        """
+        初始化同步服务
+
+        Args:
+            manager: 任务管理器
+            serialize: 任务对象转字典的函数，默认为 task.to_dict
+            size: 变更日志最多保留的变更数
+        """
+        self.manager = manager
+        self.log = ChangeLog(manager, serialize, size)
+        # 已应用操作的结果 {op_id: 结果}，按应用顺序淘汰；_applied_next 为下一个写入的槽位序号
+        self._applied, self._applied_next = self._load_applied(manager.meta)
+        self._lock = threading.Lock()
+        manager.add_reload_listener(self._on_reload)
+
+    def _on_reload(self, meta: Dict):
+        """共享存储重新加载后：读取其他进程应用过的操作"""
+        self._applied, self._applied_next = self._load_applied(meta)
+
+    @staticmethod
+    def _load_applied(meta: Dict):
+        """从存储元数据读取已应用操作的结果，返回 (按应用顺序的 {op_id: 结果}, 下一个槽位序号)"""
+        applied = OrderedDict()
+        next_seq = meta.get(META_SYNC_OP_NEXT, 0)
+        for seq in range(max(0, next_seq - SYNC_APPLIED_OPS_SIZE), next_seq):
+            entry = meta.get(META_SYNC_OP_PREFIX + str(seq % SYNC_APPLIED_OPS_SIZE))
+            if isinstance(entry, list) and len(entry) == 2:
+                applied[entry[0]] = entry[1]
+        return applied, next_seq
+
+    def pull(self, since: Optional[int] = None, epoch: Optional[str] = None) -> Dict:
+        """
+        获取客户端版本之后的变更
+
+        Args:
+            since: 客户端上次同步得到的版本，首次同步为None
+            epoch: 客户端上次同步得到的epoch
+
+        Returns:
+            {epoch, version, full: False, changes: [...]}，无法增量同步时为
+            {epoch, version, full: True, tasks: [...全部任务]}
+        """
+        # 先取快照：之后发生的变更下次会重复返回，客户端按ID覆盖即可
+        snapshot = self.manager.snapshot()
+        version = snapshot.version
+        changes = None
+        if since is not None and epoch == self.log.epoch:
+            changes = self.log.changes_since(since)
+
+        if changes is None:
+            return {
+                'epoch': self.log.epoch,
+                'version': version,
+                'full': True,
+                'tasks': [self.log.serialize(task) for task in snapshot.sorted_tasks()],
+            }
+        return {
+            'epoch': self.log.epoch,
+            'version': version,
+            'full': False,
+            'changes': changes,
+        }
+
+    def push(self, ops: List[Dict]) -> List[Dict]:
+        """
+        按顺序应用客户端操作
+
+        Args:
+            ops: [{op: add/done/delete, op_id?, ref?, id?, description?, ...}]
+
+        Returns:
+            与 ops 一一对应的 {op_id, ref, status: applied/conflict/rejected, id?, reason?}
+        """
+        # 整批操作只保存一次，其他线程的快照在全部应用后才看到变化
+        with self._lock, self.manager.batch():
+            results = []
+            # 本批中新增任务的 {ref: 服务端ID}
+            refs = {}
+            for op in ops:
+                if isinstance(op, dict) and self._is_key(op.get('id')) and op.get('id') in refs:
+                    op = dict(op, id=refs[op['id']])
+                result = self._apply(op)
+                if result.get('ref') is not None and 'id' in result:
+                    refs[result['ref']] = result['id']
+                results.append(result)
+            return results
+
+    def sync(self, since: Optional[int], epoch: Optional[str], ops: List[Dict]) -> Dict:
+        """提交操作后取回变更（包含这些操作本身产生的变更）"""
+        results = self.push(ops)
+        response = self.pull(since, epoch)
+        response['results'] = results
+        return response
+
+    def _apply(self, op: Dict) -> Dict:
+        if not isinstance(op, dict) or not all(
+                self._is_key(op.get(field)) for field in ('op_id', 'ref', 'id')):
+            return {'status': SYNC_REJECTED, 'reason': 'invalid operation'}
+
+        op_id = op.get('op_id')
+        if op_id is not None and op_id in self._applied:
+            return self._applied[op_id]
+
+        result = {'op_id': op_id, 'ref': op.get('ref')}
+        result.update(self._apply_op(op))
+
+        if op_id is not None and result['status'] != SYNC_REJECTED:
+            self._remember(op_id, result)
+        return result
+
+    def _remember(self, op_id, result: Dict):
+        """记录已应用的操作，结果随本批操作一起保存（覆盖最早的槽位）"""
+        self._applied[op_id] = result
+        if len(self._applied) > SYNC_APPLIED_OPS_SIZE:
+            self._applied.popitem(last=False)
+        slot = self._applied_next % SYNC_APPLIED_OPS_SIZE
+        self._applied_next += 1
+        self.manager.update_meta({
+            META_SYNC_OP_PREFIX + str(slot): [op_id, result],
+            META_SYNC_OP_NEXT: self._applied_next,
+        })
+
+    def _apply_op(self, op: Dict) -> Dict:
+        kind = op.get('op')
+        if kind == SYNC_OP_ADD:
+            description = op.get('description')
+            if not isinstance(description, str) or not description.strip():
+                return {'status': SYNC_REJECTED, 'reason': 'description required'}
+            # 与批量操作使用同一校验，无效的优先级或分类整个操作被拒绝
+            try:
+                TaskValidator.validate_priority_category(op.get('priority'), op.get('category'))
+            except ValueError as e:
+                return {'status': SYNC_REJECTED, 'reason': str(e)}
+            task = self.manager.create(
+                description,
+                priority=op.get('priority'),
+                category=op.get('category'),
+                created_at=self._timestamp(op.get('createdAt')),
+            )
+            return {'status': SYNC_APPLIED, 'id': task.id}
+
+        task_id = op.get('id')
+        if kind not in (SYNC_OP_DONE, SYNC_OP_DELETE) or not isinstance(task_id, int):
+            return {'status': SYNC_REJECTED, 'reason': 'invalid operation'}
+
+        task = self.manager.get(task_id)
+        if kind == SYNC_OP_DELETE:
+            if task is not None:
+                self.manager.delete(task_id)
+            return {'status': SYNC_APPLIED, 'id': task_id}
+
+        if task is None:
+            return {'status': SYNC_CONFLICT, 'id': task_id, 'reason': 'deleted'}
+        if task.status != STATUS_DONE:
+            self.manager.done(task_id, completed_at=self._timestamp(op.get('completedAt')))
+        return {'status': SYNC_APPLIED, 'id': task_id}
+
+    @staticmethod
+    def _is_key(value) -> bool:
+        """op_id/ref/id 只能是整数或字符串（可省略），其他类型不能作为字典键"""
+        return value is None or (isinstance(value, (int, str)) and not isinstance(value, bool))
+
+    @staticmethod
+    def _timestamp(value) -> Optional[str]:
+        """只接受能解析的时间戳"""
+        if isinstance(value, str) and to_epoch_us(value) is not None:
+            return value
+        return None
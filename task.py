@@ -3,52 +3,140 @@
 """
 
 import sys
-from datetime import datetime
-from typing import List, Optional
+import threading
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 from analytics import TaskAnalyzerService
 from constants import (
     STATUS_PENDING, STATUS_DONE,
     FIELD_ID, FIELD_DESCRIPTION, FIELD_STATUS,
-    FIELD_CREATED_AT, FIELD_COMPLETED_AT,
+    FIELD_CREATED_AT, FIELD_COMPLETED_AT, FIELD_PRIORITY, FIELD_CATEGORY,
     MSG_ADDED, MSG_TASK_NOT_FOUND, MSG_TASK_ALREADY_DONE,
-    MSG_TASK_MARKED_DONE, MSG_TASK_DELETED, MSG_CLEARED_ALL,
+    MSG_TASK_MARKED_DONE, MSG_TASK_DELETED, MSG_TASK_UPDATED, MSG_CLEARED_ALL,
     MSG_EMPTY_DESCRIPTION, MSG_NO_TASKS,
     MSG_NO_COMMAND, MSG_HELP_HINT, MSG_UNKNOWN_COMMAND,
     MSG_TASK_ID_REQUIRED, MSG_TASK_ID_USAGE, MSG_TASK_ID_INVALID,
     MSG_DESC_REQUIRED, MSG_DESC_USAGE,
-    ERR_INVALID_JSON, ERR_INVALID_FORMAT, ERR_SKIP_INVALID_TASK,
+    ERR_INVALID_JSON, ERR_INVALID_FORMAT, ERR_SKIP_INVALID_TASK, ERR_KEEP_UNSUPPORTED_TASK,
     ERR_PERMISSION_DENIED, ERR_WRITE_FILE, ERR_READ_FILE,
-    MSG_EXPORT_SUCCESS, DEFAULT_SUMMARY_FILE
+    MSG_EXPORT_SUCCESS, META_NEXT_ID,
+    REPORT_FORMAT_TXT, MSG_REPORT_FORMAT_USAGE,
+    PRIORITY_MEDIUM, DEFAULT_CATEGORY, FIELD_SCHEMA_VERSION, SCHEMA_VERSION,
+    PRIORITY_WEIGHTS,
+    EVENT_ADDED, EVENT_UPDATED, EVENT_DONE, EVENT_DELETED, EVENT_CLEARED
 )
 from validators import TaskValidator
-from storage import JSONTaskStorage
+from schema import migrate_record, UnsupportedSchemaError
+from storage import create_storage
+from indexes import TaskIndex
+from timestamps import now_iso, to_epoch_us
+from task_table import TaskTable
 
 
 class Task:
-    """任务数据结构"""
+    """任务数据结构
+
+    使用 __slots__ 存储字段，不为每个任务分配 __dict__。
+    修改持久化字段时自动标记为脏，并登记到所属管理器的脏任务集合，
+    保存时只需写入这些任务。
+    """
+
+    __slots__ = (
+        'id', 'description', 'status', 'createdAt', 'completedAt',
+        'priority', 'category', '_tracker', '_dirty'
+    )
+
+    # 修改后需要持久化的字段
+    TRACKED_FIELDS = frozenset({
+        FIELD_ID, FIELD_DESCRIPTION, FIELD_STATUS,
+        FIELD_CREATED_AT, FIELD_COMPLETED_AT,
+        FIELD_PRIORITY, FIELD_CATEGORY
+    })
 
     def __init__(self, id: int, description: str):
+        object.__setattr__(self, '_tracker', None)
+        object.__setattr__(self, '_dirty', True)
         self.id = id
         self.description = description
         self.status = STATUS_PENDING
-        self.createdAt = datetime.now().isoformat() + "Z"
+        self.createdAt = now_iso()
         self.completedAt = None
+        self.priority = PRIORITY_MEDIUM
+        self.category = DEFAULT_CATEGORY
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in Task.TRACKED_FIELDS:
+            object.__setattr__(self, '_dirty', True)
+            if self._tracker is not None:
+                self._tracker.add(self)
+
+    @property
+    def created_us(self) -> Optional[int]:
+        """创建时间（epoch微秒），按需解析"""
+        return to_epoch_us(self.createdAt)
+
+    @property
+    def completed_us(self) -> Optional[int]:
+        """完成时间（epoch微秒），按需解析"""
+        return to_epoch_us(self.completedAt)
+
+    @property
+    def priority_weight(self) -> int:
+        """优先级权重"""
+        return PRIORITY_WEIGHTS.get(self.priority, PRIORITY_WEIGHTS[PRIORITY_MEDIUM])
+
+    @property
+    def sort_key(self) -> tuple:
+        """
+        列表排序键：优先级高、创建时间新的在前，其次按ID
+
+        每次访问都重新计算；TaskIndex 为每个任务保存一份，排序和分页使用索引中的键。
+        """
+        return (-self.priority_weight, -(self.created_us or 0), self.id)
+
+    @property
+    def dirty(self) -> bool:
+        """自上次保存以来是否被修改"""
+        return self._dirty
+
+    def mark_clean(self):
+        """标记为已保存"""
+        object.__setattr__(self, '_dirty', False)
+
+    def attach_tracker(self, tracker):
+        """登记到变更集合（具有add方法，None表示解除），已修改的任务立即登记"""
+        object.__setattr__(self, '_tracker', tracker)
+        if tracker is not None and self._dirty:
+            tracker.add(self)
+
+    def freeze(self) -> 'TaskRecord':
+        """当前字段的只读副本"""
+        return TaskRecord(self.id, self.description, self.status, self.createdAt,
+                          self.completedAt, self.priority, self.category)
 
     def to_dict(self) -> dict:
-        """转换为字典"""
+        """转换为字典（当前存储格式版本）"""
         return {
             FIELD_ID: self.id,
             FIELD_DESCRIPTION: self.description,
             FIELD_STATUS: self.status,
             FIELD_CREATED_AT: self.createdAt,
-            FIELD_COMPLETED_AT: self.completedAt
+            FIELD_COMPLETED_AT: self.completedAt,
+            FIELD_PRIORITY: self.priority,
+            FIELD_CATEGORY: self.category,
+            FIELD_SCHEMA_VERSION: SCHEMA_VERSION
         }
 
     @staticmethod
     def from_dict(data: dict) -> 'Task':
-        """从字典创建任务（带验证）"""
-        # 验证字段
+        """从字典创建任务（带验证，旧格式记录在此升级）"""
+        # 升级旧格式并验证字段
+        data = migrate_record(data)
         TaskValidator.validate_task_fields(data)
 
         # 创建任务对象
@@ -56,58 +144,643 @@ class Task:
         task.status = data[FIELD_STATUS]
         task.createdAt = data.get(FIELD_CREATED_AT)
         task.completedAt = data.get(FIELD_COMPLETED_AT)
+        task.priority = data[FIELD_PRIORITY]
+        task.category = data[FIELD_CATEGORY]
+        # 迁移不标记为脏：旧记录在下次修改时才以新格式写回
+        task.mark_clean()
 
         return task
 
 
+class TaskRecord(namedtuple('TaskRecord', (
+        'id', 'description', 'status', 'createdAt', 'completedAt',
+        'priority', 'category'))):
+    """任务的只读副本，字段和派生属性与 Task 相同，供快照使用"""
+
+    __slots__ = ()
+
+    created_us = Task.created_us
+    completed_us = Task.completed_us
+    priority_weight = Task.priority_weight
+    sort_key = Task.sort_key
+    to_dict = Task.to_dict
+
+
+TaskPage = namedtuple('TaskPage', ('tasks', 'next_key', 'total'))
+TaskPage.__doc__ = """一页任务：tasks 为本页任务，next_key 为下一页的起点（最后一个任务的
+sort_key，没有更多时为None），total 为满足条件的任务总数"""
+
+
+class TaskSnapshot:
+    """某一数据版本的只读任务快照
+
+    由 TaskManager 在每次写入完成后发布，发布后不再修改，
+    可以在任意线程中不加锁地遍历。分页查询用到的字段索引和
+    时间索引在第一次查询时建立，同一版本的后续查询直接复用。
+    """
+
+    __slots__ = ('version', '_by_id', '_order', '_sort_keys', '_field_index', '_time_index')
+
+    # 候选任务不超过全部任务的 1/N 时排序候选集，否则沿有序索引扫描
+    SORT_CANDIDATES_RATIO = 4
+
+    def __init__(self, version: int, by_id: Dict[int, TaskRecord], order: Tuple[tuple, ...]):
+        """
+        Args:
+            version: 数据版本
+            by_id: {任务ID: 任务副本}（按添加顺序，发布后不再修改）
+            order: 按顺序排列的任务 sort_key（最后一项为任务ID）
+        """
+        self.version = version
+        self._by_id = by_id
+        self._order = order
+        self._sort_keys: Optional[Dict[int, tuple]] = None
+        self._field_index: Optional[Dict[str, Dict[str, Set[int]]]] = None
+        self._time_index: Dict[str, List[Tuple[int, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    @property
+    def tasks(self) -> Tuple[TaskRecord, ...]:
+        """全部任务（按添加顺序）"""
+        return tuple(self._by_id.values())
+
+    def get(self, task_id: int) -> Optional[TaskRecord]:
+        """按ID查找任务"""
+        return self._by_id.get(task_id)
+
+    def sorted_tasks(self, status: str = None, category: str = None,
+                     priority: str = None) -> List[TaskRecord]:
+        """按优先级和创建时间排序的任务，可按状态、分类、优先级过滤"""
+        tasks = (self._by_id[sort_key[-1]] for sort_key in self._order)
+        return [task for task in tasks
+                if (status is None or task.status == status)
+                and (category is None or task.category == category)
+                and (priority is None or task.priority == priority)]
+
+    def page(self, limit: int = None, after: tuple = None, status: str = None,
+             category: str = None, priority: str = None,
+             created: Tuple[Optional[int], Optional[int]] = (None, None),
+             completed: Tuple[Optional[int], Optional[int]] = (None, None)) -> TaskPage:
+        """
+        按优先级和创建时间顺序分页查询（keyset分页）
+
+        起点是上一页最后一个任务的 sort_key 而不是偏移量，翻页期间
+        有任务增删时不会跳过或重复其余任务。过滤条件由字段索引和
+        时间索引求交集得到，不遍历全部任务。
+
+        Args:
+            limit: 每页任务数，None 表示不分页
+            after: 从该 sort_key 之后开始（不含）
+            status: 任务状态
+            category: 分类
+            priority: 优先级
+            created: 创建时间范围 (起, 止)，epoch微秒，含起不含止，None 表示不限
+            completed: 完成时间范围，同上；设置时只返回已完成的任务
+
+        Returns:
+            TaskPage
+        """
+        candidates = self._candidates(
+            {FIELD_STATUS: status, FIELD_CATEGORY: category, FIELD_PRIORITY: priority},
+            {FIELD_CREATED_AT: created, FIELD_COMPLETED_AT: completed})
+        stop = None if limit is None else limit + 1
+
+        if candidates is None:
+            total = len(self._order)
+            start = 0 if after is None else bisect_right(self._order, after)
+            keys = self._order[start:None if stop is None else start + stop]
+        elif len(candidates) * self.SORT_CANDIDATES_RATIO <= len(self._order):
+            total = len(candidates)
+            sort_keys = self._keys()
+            ordered = sorted(sort_keys[task_id] for task_id in candidates)
+            start = 0 if after is None else bisect_right(ordered, after)
+            keys = ordered[start:None if stop is None else start + stop]
+        else:
+            total = len(candidates)
+            start = 0 if after is None else bisect_right(self._order, after)
+            keys = []
+            for sort_key in self._order[start:]:
+                if sort_key[-1] in candidates:
+                    keys.append(sort_key)
+                    if len(keys) == stop:
+                        break
+
+        next_key = None
+        if stop is not None and len(keys) == stop:
+            keys = keys[:limit]
+            next_key = keys[-1] if keys else None
+        return TaskPage([self._by_id[sort_key[-1]] for sort_key in keys], next_key, total)
+
+    def _candidates(self, criteria: Dict[str, Optional[str]],
+                    ranges: Dict[str, Tuple[Optional[int], Optional[int]]]) -> Optional[Set[int]]:
+        """满足全部条件的任务ID集合，没有条件时返回None"""
+        sets = []
+        criteria = {field: value for field, value in criteria.items() if value is not None}
+        if criteria:
+            index = self._fields()
+            sets.extend(index[field].get(value, set()) for field, value in criteria.items())
+        for field, (low, high) in ranges.items():
+            if low is None and high is None:
+                continue
+            entries = self._times(field)
+            start = 0 if low is None else bisect_left(entries, (low,))
+            end = len(entries) if high is None else bisect_left(entries, (high,))
+            sets.append({task_id for _, task_id in entries[start:end]})
+        if not sets:
+            return None
+
+        # 从最小的集合开始求交集
+        sets.sort(key=len)
+        result = set(sets[0])
+        for ids in sets[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+    def _keys(self) -> Dict[int, tuple]:
+        """任务ID → sort_key（取自有序索引，不重新解析时间）"""
+        if self._sort_keys is None:
+            self._sort_keys = {sort_key[-1]: sort_key for sort_key in self._order}
+        return self._sort_keys
+
+    def _fields(self) -> Dict[str, Dict[str, Set[int]]]:
+        """状态、分类、优先级索引：字段 → 值 → 任务ID集合"""
+        if self._field_index is None:
+            index = {field: {} for field in TaskIndex.FIELDS}
+            for task in self._by_id.values():
+                for field, value in zip(TaskIndex.FIELDS, TaskIndex.keys_of(task)):
+                    index[field].setdefault(value, set()).add(task.id)
+            self._field_index = index
+        return self._field_index
+
+    def _times(self, field: str) -> List[Tuple[int, int]]:
+        """时间索引：按时间排序的 (epoch微秒, 任务ID)，没有该时间的任务不在其中"""
+        entries = self._time_index.get(field)
+        if entries is None:
+            if field == FIELD_CREATED_AT:
+                times = ((task.created_us, task.id) for task in self._by_id.values())
+            else:
+                times = ((task.completed_us, task.id) for task in self._by_id.values())
+            entries = sorted(entry for entry in times if entry[0] is not None)
+            self._time_index[field] = entries
+        return entries
+
+
+def synchronized(method):
+    """在 TaskManager 的写锁内执行方法"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def up_to_date(method):
+    """实时查询：在写锁内执行，共享存储被其他进程修改过时先重新加载"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            if self.shared and not self._txn_depth:
+                self._reload_if_changed()
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def transactional(method):
+    """修改操作：在写锁内执行，共享存储时还持有跨进程锁并先载入其他进程的修改"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock, self._transaction():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class ChangeSet:
+    """任务变更登记
+
+    dirty 为自上次保存以来修改过的任务；unindexed 为自上次同步索引
+    以来修改过的任务。两者分开清空，查询时同步索引不影响保存。
+    """
+
+    __slots__ = ('dirty', 'unindexed')
+
+    def __init__(self):
+        self.dirty: Set[Task] = set()
+        self.unindexed: Set[Task] = set()
+
+    def add(self, task: Task):
+        """登记被修改的任务"""
+        self.dirty.add(task)
+        self.unindexed.add(task)
+
+    def discard(self, task: Task):
+        """移除任务的登记"""
+        self.dirty.discard(task)
+        self.unindexed.discard(task)
+
+
 class TaskManager:
-    """任务管理器"""
+    """任务管理器
+
+    可以在多个线程中共享：修改和实时查询通过可重入的写锁串行执行；
+    每次写入完成后发布一个只读快照（copy-on-write），snapshot()
+    不等待写锁，读多写少的请求不会被写入或保存阻塞。
 
-    def __init__(self, filepath: str = None, storage=None):
+    shared=True 时可以在多个进程中共享同一存储：每次修改持有存储的
+    跨进程锁，先比较存储的变更标记（文件修改时间、大小和inode，或
+    SQLite 的 data_version），其他进程写入过才重新加载，再修改并保存。
+    查询和快照同样只在标记变化时重新加载。重新加载时与内存数据的差异
+    作为普通变更事件通知监听器，统计、事件流等随之增量更新。
+    """
+
+    def __init__(self, filepath: str = None, storage=None, shared: bool = False):
         if storage:
             self.storage = storage
         else:
-            self.storage = JSONTaskStorage(filepath)
+            self.storage = create_storage(filepath)
+        self.shared = shared
 
-        self.tasks: List[Task] = []
-        self._load_tasks()
+        # 按ID索引的任务（保持插入顺序）
+        self._tasks_by_id: Dict[int, Task] = {}
+        # 格式版本无法识别的原始记录（由更新版本的程序写入）：不加载，整体保存时原样写回
+        self._unsupported: Dict[int, Dict] = {}
+        # 按状态、分类、优先级的二级索引
+        self._index = TaskIndex()
+        # 下一个分配的任务ID，单调递增，删除的ID不会被重用
+        self._next_id = 1
+        # 修改过的任务和自上次保存以来删除的任务ID
+        self._changes = ChangeSet()
+        self._deleted_ids: Set[int] = set()
+        self._meta_dirty = False
+        # 存储元数据，以及尚未保存的元数据修改
+        self._meta: Dict = {}
+        self._meta_updates: Dict = {}
+        # 变更监听器：listener(event, task, previous)；其中不接收重新加载差异事件的，
+        # 以及重新加载后调用的 listener(meta)
+        self._listeners: List[Callable] = []
+        self._local_listeners: List[Callable] = []
+        self._reload_listeners: List[Callable] = []
+        self._replaying = False
+        # 显式指定的下一次变更事件类型 {任务ID: 事件}
+        self._event_types: Dict[int, str] = {}
+        # 数据版本：每次变更事件或重新加载时加一，只增不减
+        self._version = 0
+        # 嵌套的 batch() 层数，大于0时推迟保存
+        self._batch_depth = 0
+        # 写锁；任务的只读副本和最近发布的快照
+        self._lock = threading.RLock()
+        self._records: Dict[int, TaskRecord] = {}
+        self._snapshot = TaskSnapshot(0, {}, ())
+        # 共享存储：最近一次加载或写入后的变更标记，以及嵌套的修改操作层数
+        self._storage_token: Optional[tuple] = None
+        self._txn_depth = 0
+        with self._lock, self._transaction():
+            self._load_tasks()
 
         # 初始化分析器服务
         self.analyzer = TaskAnalyzerService(self)
 
+    @property
+    @up_to_date
+    def tasks(self) -> List[Task]:
+        """全部任务（按添加顺序）"""
+        return list(self._tasks_by_id.values())
+
+    @property
+    def lock(self) -> threading.RLock:
+        """写锁（可重入），需要一致地读取多个由变更事件维护的状态时使用"""
+        return self._lock
+
     # ==================== 文件操作 ====================
 
+    @synchronized
     def _load_tasks(self):
         """从存储加载任务"""
         self.storage.create_if_not_exists()
+        self._changes = ChangeSet()
+        self._deleted_ids = set()
+        self._meta_dirty = False
+        self._meta_updates = {}
+        self._event_types = {}
 
         try:
             data = self.storage.load()
 
             # 验证并加载每个任务
-            self.tasks = []
+            self._tasks_by_id = {}
+            self._unsupported = {}
             for item in data:
                 if TaskValidator.validate_task_dict(item):
                     try:
-                        self.tasks.append(Task.from_dict(item))
+                        task = Task.from_dict(item)
+                        task.attach_tracker(self._changes)
+                        self._tasks_by_id[task.id] = task
+                    except UnsupportedSchemaError as e:
+                        # 保留原始记录，避免整体保存时丢失，其ID也不会被重新分配
+                        print(ERR_KEEP_UNSUPPORTED_TASK.format(task_id=item[FIELD_ID], error=e))
+                        self._unsupported[item[FIELD_ID]] = item
                     except ValueError as e:
                         # 跳过无效任务，继续加载其他任务
                         print(ERR_SKIP_INVALID_TASK.format(error=e))
 
+            meta = self.storage.load_meta()
+
         except ValueError as e:
             # 格式错误，重置为空数组
             print(str(e))
-            self.tasks = []
+            self._tasks_by_id = {}
+            self._unsupported = {}
+            meta = {}
         except Exception as e:
             # 其他错误
             print(ERR_READ_FILE.format(error=e))
             sys.exit(1)
 
+        self._meta = meta
+        used_ids = [task_id for task_id in self._unsupported if isinstance(task_id, int)]
+        self._next_id = max(meta.get(META_NEXT_ID, 1),
+                            max(self._tasks_by_id, default=0) + 1,
+                            max(used_ids, default=0) + 1)
+        self._index.rebuild(self._tasks_by_id.values())
+        self._records = {task_id: task.freeze() for task_id, task in self._tasks_by_id.items()}
+        self._version += 1
+        self._publish()
+
+    @synchronized
     def _save_tasks(self):
-        """保存任务到存储"""
+        """
+        保存变更到存储
+
+        存储支持按行写入时只写入脏任务和删除的ID，
+        否则回退为整体保存。在 batch() 中只同步索引，退出时统一保存。
+        快照在写入存储之前发布，读取方不需要等待保存完成。
+        """
+        self._refresh_index()
+        if self._batch_depth:
+            return
+        self._publish()
+        if self._meta_dirty:
+            self.update_meta({META_NEXT_ID: self._next_id})
+            self._meta_dirty = False
+        if not self._changes.dirty and not self._deleted_ids and not self._meta_updates:
+            return
+
+        dirty = list(self._changes.dirty)
+        deleted_ids = list(self._deleted_ids)
+
+        if not dirty and not deleted_ids:
+            # 只有元数据变化
+            pass
+        elif self.storage.supports_delta:
+            self._write_storage(
+                lambda: self.storage.apply_changes(
+                    [task.to_dict() for task in dirty], deleted_ids
+                )
+            )
+        else:
+            self._write_storage(
+                lambda: self.storage.save(
+                    [task.to_dict() for task in self._tasks_by_id.values()]
+                    + list(self._unsupported.values())
+                )
+            )
+
+        # 只写入修改过的元数据键（删除过任务后的ID计数器、吞吐量汇总等）
+        if self._meta_updates:
+            updates, self._meta_updates = self._meta_updates, {}
+            self._write_storage(lambda: self.storage.save_meta(updates))
+
+        for task in dirty:
+            task.mark_clean()
+        self._changes.dirty.clear()
+        self._deleted_ids.clear()
+
+    @contextmanager
+    def batch(self):
+        """
+        批量修改：块内的修改照常生效并发出变更事件，保存推迟到退出时一次完成
+
+        可以嵌套，最外层退出时保存。块内抛出异常时已经做出的修改同样会被保存，
+        内存与存储保持一致。块内一直持有写锁，其他线程的快照在退出后
+        才看到这些修改。
+
+        Example:
+            with manager.batch():
+                manager.done(1)
+                manager.delete(2)
+        """
+        with self._lock, self._transaction():
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._save_tasks()
+
+    @contextmanager
+    def _transaction(self):
+        """
+        一次修改操作（调用方持有写锁）
+
+        共享存储时最外层持有存储的跨进程锁：先载入其他进程的修改，
+        结束时记录写入后的变更标记，自己的写入不会触发重新加载。
+        """
+        if not self.shared or self._txn_depth:
+            self._txn_depth += 1
+            try:
+                yield
+            finally:
+                self._txn_depth -= 1
+            return
+
+        with self.storage.lock():
+            self._txn_depth += 1
+            try:
+                if self._storage_token is not None:
+                    self._reload_if_changed()
+                yield
+            finally:
+                self._txn_depth -= 1
+                self._storage_token = self.storage.change_token()
+
+    def _reload_if_changed(self):
+        """共享存储的变更标记与上次不同时重新加载（调用方持有写锁）"""
+        if self.storage.change_token() == self._storage_token:
+            return
+        with self.storage.lock():
+            token = self.storage.change_token()
+            if token != self._storage_token:
+                # 先记录标记，监听器在重新加载期间查询时不会再次触发
+                self._storage_token = token
+                self._reload()
+                self._storage_token = self.storage.change_token()
+
+    def _reload(self):
+        """重新加载存储，把与内存数据的差异作为变更事件通知监听器"""
+        self._refresh_index()
+        old_records = self._records
+        old_keys = {task_id: self._index.previous_keys(task_id) for task_id in old_records}
+        self._load_tasks()
+
+        self._replaying = True
+        try:
+            for task_id, record in old_records.items():
+                if task_id not in self._records:
+                    self._notify(EVENT_DELETED, record, old_keys[task_id])
+            for task_id, record in self._records.items():
+                old = old_records.get(task_id)
+                if old is None:
+                    self._notify(EVENT_ADDED, self._tasks_by_id[task_id], None)
+                elif old != record:
+                    completed = record.status == STATUS_DONE and old.status != STATUS_DONE
+                    self._notify(EVENT_DONE if completed else EVENT_UPDATED,
+                                 self._tasks_by_id[task_id], old_keys[task_id])
+        finally:
+            self._replaying = False
+
+        for listener in self._reload_listeners:
+            listener(self.meta)
+        self._publish()
+
+    @synchronized
+    def flush(self):
+        """等待写合并存储中尚未落盘的变更写入完成"""
+        flush = getattr(self.storage, 'flush', None)
+        if flush is not None:
+            self._write_storage(flush)
+
+    @property
+    def meta(self) -> Dict:
+        """存储元数据（副本）"""
+        return dict(self._meta)
+
+    @synchronized
+    def update_meta(self, values: Dict):
+        """
+        修改存储元数据，随下一次保存写入
+
+        Args:
+            values: 要修改的键值，未列出的键保持不变
+        """
+        self._meta.update(values)
+        self._meta_updates.update(values)
+
+    # ==================== 变更通知 ====================
+
+    def add_listener(self, listener: Callable, replay: bool = True):
+        """
+        注册变更监听器
+
+        Args:
+            listener: listener(event, task, previous)，event 为
+                added/updated/done/deleted/cleared，previous 为变更前
+                索引中的 {status, category, priority}（新增时为None）
+            replay: 是否接收共享存储重新加载时其他进程的修改产生的事件。
+                状态本身随任务一起持久化的监听器（如每日汇总）应为False，
+                并通过 add_reload_listener 重新读取
+        """
+        self._listeners.append(listener)
+        if not replay:
+            self._local_listeners.append(listener)
+
+    def remove_listener(self, listener: Callable):
+        """移除变更监听器"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+        if listener in self._local_listeners:
+            self._local_listeners.remove(listener)
+
+    def add_reload_listener(self, listener: Callable):
+        """
+        注册重新加载监听器
+
+        Args:
+            listener: listener(meta)，共享存储重新加载之后调用，meta 为新的存储元数据
+        """
+        self._reload_listeners.append(listener)
+
+    @property
+    @up_to_date
+    def version(self) -> int:
+        """数据版本，任务数据变化时单调递增（可作为缓存键）"""
+        self._refresh_index()
+        return self._version
+
+    def snapshot(self) -> TaskSnapshot:
+        """
+        获取最近发布的只读快照，不等待写锁
+
+        有直接修改过字段、尚未同步的任务，或共享存储被其他进程修改过时，
+        写锁空闲则先同步并发布；其他线程正在写入时返回上一个快照，
+        写入完成后会发布新快照。
+        """
+        snapshot = self._snapshot
+        stale = self.shared and self.storage.change_token() != self._storage_token
+        if not stale and snapshot.version == self._version and not self._changes.unindexed:
+            return snapshot
+        if not self._lock.acquire(blocking=False):
+            return snapshot
         try:
-            data = [task.to_dict() for task in self.tasks]
-            self.storage.save(data)
+            if not self._batch_depth and not self._txn_depth:
+                if stale:
+                    self._reload_if_changed()
+                self._refresh_index()
+                self._publish()
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def _publish(self):
+        """发布当前数据的快照（只复制字典和ID顺序，任务副本在变更时已生成）"""
+        if self._snapshot.version != self._version:
+            self._snapshot = TaskSnapshot(self._version, dict(self._records),
+                                          tuple(self._index.ordered_keys()))
+
+    def _notify(self, event: str, task: Task, previous: Optional[Dict[str, str]]):
+        """更新数据版本并通知所有监听器"""
+        self._version += 1
+        for listener in self._listeners:
+            if self._replaying and listener in self._local_listeners:
+                continue
+            listener(event, task, previous)
+
+    @synchronized
+    def _refresh_index(self):
+        """把被修改的任务同步到二级索引并发出变更事件"""
+        if not self._changes.unindexed:
+            return
+
+        changed = list(self._changes.unindexed)
+        self._changes.unindexed.clear()
+        for task in changed:
+            previous = self._index.previous_keys(task.id)
+            self._index.update(task)
+            self._records[task.id] = task.freeze()
+            default_event = EVENT_ADDED if previous is None else EVENT_UPDATED
+            self._notify(self._event_types.pop(task.id, default_event), task, previous)
+
+    def _forget_task(self, task: Task, event: str = EVENT_DELETED):
+        """任务被移除后登记删除"""
+        previous = self._index.previous_keys(task.id)
+        self._index.remove(task.id)
+        self._records.pop(task.id, None)
+        task.attach_tracker(None)
+        self._changes.discard(task)
+        self._event_types.pop(task.id, None)
+        self._deleted_ids.add(task.id)
+        # 删除过任务后ID计数器无法由最大ID推出，需要单独保存
+        self._meta_dirty = True
+        if previous is not None:
+            self._notify(event, task, previous)
+
+    def _write_storage(self, write):
+        """执行存储写入并统一处理错误"""
+        try:
+            write()
 
         except PermissionError:
             print(ERR_PERMISSION_DENIED)
@@ -126,16 +799,50 @@ class TaskManager:
         if not description.strip():
             return MSG_EMPTY_DESCRIPTION
 
-        new_id = max([task.id for task in self.tasks], default=0) + 1
-        task = Task(new_id, description.strip())
-        self.tasks.append(task)
+        task = self.create(description)
+        return MSG_ADDED.format(description=task.description)
+
+    @transactional
+    def create(self, description: str, priority: str = None,
+               category: str = None, created_at: str = None) -> Optional[Task]:
+        """
+        创建任务并返回任务对象
+
+        Args:
+            description: 任务描述
+            priority: 优先级（可选）
+            category: 分类（可选）
+            created_at: 创建时间（可选，如客户端离线时创建的任务），默认为当前时间
+
+        Returns:
+            新建的任务，描述为空时返回None
+
+        Raises:
+            ValueError: 优先级或分类无效（不做任何修改）
+        """
+        if not description.strip():
+            return None
+        TaskValidator.validate_priority_category(priority, category)
+
+        task = Task(self._next_id, description.strip())
+        self._next_id += 1
+        if priority is not None:
+            task.priority = priority
+        if category is not None:
+            task.category = category
+        if created_at is not None:
+            task.createdAt = created_at
+
+        task.attach_tracker(self._changes)
+        self._tasks_by_id[task.id] = task
         self._save_tasks()
 
-        return MSG_ADDED.format(description=task.description)
+        return task
 
+    @up_to_date
     def list(self) -> List[str]:
         """列出所有任务，包含积压警告"""
-        if not self.tasks:
+        if not self._tasks_by_id:
             return [MSG_NO_TASKS]
 
         result = []
@@ -146,14 +853,15 @@ class TaskManager:
             result.append(warning)
 
         # 添加任务列表
-        for task in self.tasks:
+        for task in self._tasks_by_id.values():
             status = STATUS_DONE if task.status == STATUS_DONE else STATUS_PENDING
             result.append(f"[{task.id}] {task.description} ({status})")
 
         return result
 
-    def done(self, task_id: int) -> str:
-        """标记任务完成"""
+    @transactional
+    def done(self, task_id: int, completed_at: str = None) -> str:
+        """标记任务完成（completed_at 默认为当前时间）"""
         task = self._find_task(task_id)
         if not task:
             return MSG_TASK_NOT_FOUND.format(task_id=task_id)
@@ -162,34 +870,139 @@ class TaskManager:
             return MSG_TASK_ALREADY_DONE.format(task_id=task_id)
 
         task.status = STATUS_DONE
-        task.completedAt = datetime.now().isoformat() + "Z"
+        task.completedAt = completed_at or now_iso()
+        self._event_types[task.id] = EVENT_DONE
         self._save_tasks()
 
         return MSG_TASK_MARKED_DONE.format(task_id=task_id)
 
+    @transactional
+    def update(self, task_id: int, description: str = None,
+               priority: str = None, category: str = None) -> str:
+        """
+        修改任务的描述、优先级或分类
+
+        Args:
+            task_id: 任务ID
+            description: 新描述（可选）
+            priority: 新优先级（可选）
+            category: 新分类（可选）
+
+        Returns:
+            结果消息
+
+        Raises:
+            ValueError: 优先级或分类无效（不做任何修改）
+        """
+        task = self._find_task(task_id)
+        if not task:
+            return MSG_TASK_NOT_FOUND.format(task_id=task_id)
+        TaskValidator.validate_priority_category(priority, category)
+
+        if description is not None:
+            if not description.strip():
+                return MSG_EMPTY_DESCRIPTION
+            task.description = description.strip()
+        if priority is not None:
+            task.priority = priority
+        if category is not None:
+            task.category = category
+        self._save_tasks()
+
+        return MSG_TASK_UPDATED.format(task_id=task_id)
+
+    @transactional
     def delete(self, task_id: int) -> str:
         """删除任务"""
         task = self._find_task(task_id)
         if not task:
             return MSG_TASK_NOT_FOUND.format(task_id=task_id)
 
-        self.tasks.remove(task)
+        del self._tasks_by_id[task_id]
+        self._forget_task(task)
         self._save_tasks()
 
         return MSG_TASK_DELETED.format(task_id=task_id)
 
+    @transactional
     def clear(self) -> str:
         """清除已完成的任务"""
-        self.tasks = [t for t in self.tasks if t.status == STATUS_PENDING]
+        self._refresh_index()
+        for task_id in list(self._index.ids(FIELD_STATUS, STATUS_DONE)):
+            self._forget_task(self._tasks_by_id.pop(task_id), EVENT_CLEARED)
         self._save_tasks()
 
         return MSG_CLEARED_ALL
 
+    # ==================== 查询 ====================
+
+    @up_to_date
+    def get(self, task_id: int) -> Optional[Task]:
+        """按ID获取任务，不存在时返回None"""
+        return self._tasks_by_id.get(task_id)
+
+    @up_to_date
+    def query(self, status: str = None, category: str = None,
+              priority: str = None) -> List[Task]:
+        """
+        通过二级索引查询任务
+
+        全部任务和二级索引都在内存中，查询不访问存储（SQLite 存储同样如此）。
+
+        Args:
+            status: 任务状态
+            category: 分类
+            priority: 优先级
+
+        Returns:
+            满足全部条件的任务（按ID排序）
+        """
+        self._refresh_index()
+        ids = self._index.query(status=status, category=category, priority=priority)
+        return [self._tasks_by_id[task_id] for task_id in sorted(ids)]
+
+    @up_to_date
+    def count(self, status: str = None, category: str = None,
+              priority: str = None) -> int:
+        """通过二级索引统计任务数"""
+        self._refresh_index()
+        criteria = {FIELD_STATUS: status, FIELD_CATEGORY: category,
+                    FIELD_PRIORITY: priority}
+        criteria = {field: value for field, value in criteria.items() if value is not None}
+        if not criteria:
+            return len(self._tasks_by_id)
+        if len(criteria) == 1:
+            return self._index.count(*next(iter(criteria.items())))
+        return len(self._index.query(**criteria))
+
+    @up_to_date
+    def sorted_tasks(self, task_ids=None) -> List[Task]:
+        """
+        按优先级和创建时间排序的任务
+
+        Args:
+            task_ids: 只返回这些ID的任务（可选，如索引查询结果）
+
+        Returns:
+            排序后的任务列表，使用增量维护的有序索引，无需每次排序
+        """
+        self._refresh_index()
+        if task_ids is None:
+            return [self._tasks_by_id[task_id] for task_id in self._index.ordered_ids()]
+
+        return [self._tasks_by_id[task_id]
+                for task_id in sorted(task_ids, key=self._index.sort_key)]
+
+    @up_to_date
+    def to_table(self) -> TaskTable:
+        """导出为列式任务表，供大批量统计和报表使用"""
+        return TaskTable.from_tasks(self._tasks_by_id.values())
+
     # ==================== 辅助方法 ====================
 
     def _find_task(self, task_id: int) -> Optional[Task]:
         """查找任务"""
-        return next((t for t in self.tasks if t.id == task_id), None)
+        return self._tasks_by_id.get(task_id)
 
     def help(self) -> str:
         """显示帮助信息"""
@@ -202,7 +1015,8 @@ Commands:
   delete <id>          Delete a task
   clear                Clear all completed tasks
   stats                Show task statistics
-  report               Generate and export task report
+  report [--format F] [path]
+                       Export task report (txt, csv, jsonl, md, html)
   help                 Show this help message"""
 
 
@@ -264,9 +1078,27 @@ def main():
         print(manager.analyzer.get_today_report())
 
     elif command == "report":
-        filepath = DEFAULT_SUMMARY_FILE
-        result = manager.analyzer.export_summary(filepath)
-        print(result)
+        # report [--format FMT] [filepath]
+        fmt = REPORT_FORMAT_TXT
+        filepath = None
+        args = sys.argv[2:]
+        while args:
+            arg = args.pop(0)
+            if arg.startswith("--format="):
+                fmt = arg.split("=", 1)[1]
+            elif arg == "--format" and args:
+                fmt = args.pop(0)
+            elif filepath is None and not arg.startswith("--"):
+                filepath = arg
+            else:
+                print(MSG_REPORT_FORMAT_USAGE)
+                sys.exit(1)
+
+        try:
+            print(manager.analyzer.export_summary(filepath, fmt))
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
 
     elif command == "help" or command == "--help" or command == "-h":
         print(manager.help())
@@ -0,0 +1,192 @@
+"""
+任务管理CLI工具 - 列式任务表
+"""
+
+from array import array
+from collections import Counter, namedtuple
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from constants import (
+    FIELD_ID, FIELD_DESCRIPTION, FIELD_STATUS,
+    FIELD_CREATED_AT, FIELD_COMPLETED_AT, FIELD_PRIORITY, FIELD_CATEGORY,
+    VALID_STATUSES, PRIORITIES, CATEGORIES,
+    DEFAULT_CATEGORY, PRIORITY_MEDIUM
+)
+from timestamps import to_epoch_us, from_epoch_us
+
+
+# 缺失时间戳的占位值
+NO_TIMESTAMP = -1
+
+# 表中一行的只读视图，字段与 Task 相同，可直接交给统计和报表组件
+TaskRow = namedtuple('TaskRow', [
+    FIELD_ID, FIELD_DESCRIPTION, FIELD_STATUS,
+    FIELD_CREATED_AT, FIELD_COMPLETED_AT, FIELD_PRIORITY, FIELD_CATEGORY
+])
+
+
+class Codebook:
+    """字符串驻留表：取值 ↔ 小整数编码"""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value: str) -> int:
+        """获取取值的编码，新取值自动登记"""
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._codes[value] = code
+        return code
+
+    def code_of(self, value: str) -> Optional[int]:
+        """获取已登记取值的编码，未登记返回None"""
+        return self._codes.get(value)
+
+    def decode(self, code: int) -> str:
+        """编码还原为取值"""
+        return self.values[code]
+
+
+class TaskTable:
+    """列式任务表
+
+    每个字段一列：状态/分类/优先级存为驻留编码，时间戳存为
+    epoch微秒整数，描述统一存入UTF-8字节池并记录偏移。
+    适合一次加载数十万任务做统计和报表，逐行访问时返回 TaskRow。
+    """
+
+    def __init__(self):
+        self.statuses = Codebook(VALID_STATUSES)
+        self.categories = Codebook(CATEGORIES)
+        self.priorities = Codebook(PRIORITIES)
+
+        self.ids = array('q')
+        self.status_codes = array('B')
+        self.category_codes = array('H')
+        self.priority_codes = array('B')
+        self.created_us = array('q')
+        self.completed_us = array('q')
+
+        # 描述字符串池：第i个描述为 _pool[_offsets[i]:_offsets[i + 1]]
+        self._pool = bytearray()
+        self._offsets = array('Q', [0])
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable) -> 'TaskTable':
+        """从任务对象（或任何具有相同属性的对象）构建"""
+        table = cls()
+        for task in tasks:
+            table.append(task)
+        return table
+
+    @classmethod
+    def from_dicts(cls, records: Iterable[Dict]) -> 'TaskTable':
+        """从存储加载的任务字典构建，无需先创建 Task 对象"""
+        table = cls()
+        for record in records:
+            table.append_values(
+                record[FIELD_ID],
+                record[FIELD_DESCRIPTION],
+                record[FIELD_STATUS],
+                record.get(FIELD_CREATED_AT),
+                record.get(FIELD_COMPLETED_AT),
+                record.get(FIELD_PRIORITY, PRIORITY_MEDIUM),
+                record.get(FIELD_CATEGORY, DEFAULT_CATEGORY),
+            )
+        return table
+
+    def append(self, task):
+        """追加一个任务"""
+        self.append_values(
+            task.id,
+            task.description,
+            task.status,
+            task.createdAt,
+            task.completedAt,
+            getattr(task, 'priority', PRIORITY_MEDIUM),
+            getattr(task, 'category', DEFAULT_CATEGORY),
+        )
+
+    def append_values(self, id: int, description: str, status: str,
+                      created_at: Optional[str], completed_at: Optional[str],
+                      priority: str, category: str):
+        """按字段追加一行"""
+        self.ids.append(id)
+        self.status_codes.append(self.statuses.encode(status))
+        self.category_codes.append(self.categories.encode(category))
+        self.priority_codes.append(self.priorities.encode(priority))
+        self.created_us.append(self._encode_time(created_at))
+        self.completed_us.append(self._encode_time(completed_at))
+
+        self._pool += description.encode('utf-8')
+        self._offsets.append(len(self._pool))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[TaskRow]:
+        for i in range(len(self.ids)):
+            yield self.row(i)
+
+    def row(self, i: int) -> TaskRow:
+        """获取第i行"""
+        return TaskRow(
+            self.ids[i],
+            self.description(i),
+            self.statuses.decode(self.status_codes[i]),
+            self._decode_time(self.created_us[i]),
+            self._decode_time(self.completed_us[i]),
+            self.priorities.decode(self.priority_codes[i]),
+            self.categories.decode(self.category_codes[i]),
+        )
+
+    def description(self, i: int) -> str:
+        """获取第i行的描述"""
+        return self._pool[self._offsets[i]:self._offsets[i + 1]].decode('utf-8')
+
+    # ==================== 列统计 ====================
+
+    def count(self, field: str, value: str) -> int:
+        """统计某列等于value的行数"""
+        codebook, column = self._column(field)
+        code = codebook.code_of(value)
+        if code is None:
+            return 0
+        return column.count(code)
+
+    def distribution(self, field: str) -> Dict[str, int]:
+        """统计某列各取值的行数（只包含出现过的取值）"""
+        codebook, column = self._column(field)
+        return {codebook.decode(code): n for code, n in Counter(column).items()}
+
+    def memory_usage(self) -> int:
+        """列数据占用的字节数（近似）"""
+        columns = (self.ids, self.status_codes, self.category_codes,
+                   self.priority_codes, self.created_us, self.completed_us,
+                   self._offsets)
+        return (sum(column.itemsize * len(column) for column in columns)
+                + len(self._pool))
+
+    def _column(self, field: str):
+        """获取字段对应的编码表和列"""
+        if field == FIELD_STATUS:
+            return self.statuses, self.status_codes
+        if field == FIELD_CATEGORY:
+            return self.categories, self.category_codes
+        if field == FIELD_PRIORITY:
+            return self.priorities, self.priority_codes
+        raise ValueError(f"Unsupported column: {field}")
+
+    @staticmethod
+    def _encode_time(value: Optional[str]) -> int:
+        epoch = to_epoch_us(value)
+        return NO_TIMESTAMP if epoch is None else epoch
+
+    @staticmethod
+    def _decode_time(value: int) -> Optional[str]:
+        return None if value == NO_TIMESTAMP else from_epoch_us(value)
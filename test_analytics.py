@@ -2,13 +2,25 @@
 智能分析与报表模块的测试
 """
 
+import csv
+import json
 import os
 import sys
-from datetime import datetime
-
-from analytics import TaskStatistics, TaskAnalyzer, ReportGenerator, TaskAnalyzerService
-from storage import MockTaskStorage
+import tempfile
+from datetime import datetime, timedelta
+
+from analytics import (
+    TaskStatistics, RunningStatistics, CompletionTimeAnalyzer,
+    TaskAnalyzer, ReportGenerator, TaskAnalyzerService
+)
+from exporters import get_exporter, EXPORTERS
+from rollups import DailyRollups
+from sketches import QuantileSketch
+from storage import MockTaskStorage, JSONTaskStorage
 from task import TaskManager, Task
+import analytics
+import vector_stats
+from vector_stats import VectorizedTaskStatistics
 
 
 # ==================== 测试工具 ====================
@@ -305,6 +317,20 @@ def test_report_generator(tester):
         "导出消息应包含文件名"
     )
 
+    # 测试5: 流式导出与一次性生成的内容一致
+    def without_time(text):
+        return [line for line in text.splitlines() if not line.startswith("生成时间")]
+
+    with open(test_file, encoding='utf-8') as f:
+        tester.assert_equal(without_time(f.read()), without_time(generator.generate_full_report()),
+                            "流式导出的文件内容应与完整报表一致")
+
+    lines = generator.iter_full_report()
+    tester.assert_equal(next(lines), "=" * 50, "报表应按行惰性生成")
+    tester.assert_equal(list(generator.iter_task_list())[1:],
+                        [generator.format_task(task) for task in tasks],
+                        "任务列表应逐个任务生成")
+
     # 清理测试文件
     if os.path.exists(test_file):
         os.remove(test_file)
@@ -407,9 +433,7 @@ def test_analyzer_service(tester):
     for i in range(4):
         manager.add(f"积压任务{i+1}")
 
-    # 刷新分析器以获取最新的任务列表
-    manager.analyzer._refresh_components()
-
+    # 统计由变更事件增量维护，无需刷新
     # 检查待办数
     pending_count = manager.analyzer.statistics.calculate_pending()
     print(f"  [DEBUG] 待办数: {pending_count}")
@@ -490,6 +514,412 @@ def test_integration(tester):
         os.remove(test_file)
 
 
+# ==================== TaskTable 测试 ====================
+
+def test_task_table(tester):
+    """测试列式任务表"""
+    print("\n" + "=" * 70)
+    print("测试: TaskTable")
+    print("=" * 70)
+
+    manager = TaskManager(storage=MockTaskStorage())
+    manager.create("写报告", priority="High", category="Work")
+    manager.create("复习", priority="Low", category="Study")
+    manager.create("买菜", category="Life")
+    manager.done(2)
+
+    table = manager.to_table()
+    tester.assert_equal(len(table), 3, "表行数应与任务数一致")
+
+    row = table.row(1)
+    task = manager._find_task(2)
+    tester.assert_equal(row.description, "复习", "应从字符串池还原描述")
+    tester.assert_equal(row.createdAt, task.createdAt, "时间戳应能往返转换")
+    tester.assert_equal(row.completedAt, task.completedAt, "完成时间应能往返转换")
+
+    # 统计组件直接使用列式表
+    list_stats = TaskStatistics(manager.tasks)
+    table_stats = TaskStatistics(table)
+    tester.assert_equal(table_stats.calculate_completed(), list_stats.calculate_completed(),
+                        "列式表已完成数应与任务列表一致")
+    tester.assert_equal(table_stats.get_stats_by_category(), list_stats.get_stats_by_category(),
+                        "列式表分类统计应与任务列表一致")
+    tester.assert_equal(table_stats.get_priority_distribution(),
+                        list_stats.get_priority_distribution(),
+                        "列式表优先级分布应与任务列表一致")
+
+    # 报表组件逐行使用列式表
+    generator = ReportGenerator(table, TaskAnalyzer(table_stats))
+    tester.assert_contains(generator.format_task_list(), "[1] 写报告 (High, Work, pending)",
+                           "报表应能格式化列式表中的任务")
+
+
+# ==================== RunningStatistics 测试 ====================
+
+def test_running_statistics(tester):
+    """测试增量统计"""
+    print("\n" + "=" * 70)
+    print("测试: RunningStatistics")
+    print("=" * 70)
+
+    manager = TaskManager(storage=MockTaskStorage())
+    tester.assert_true(isinstance(manager.analyzer.statistics, RunningStatistics),
+                       "分析服务应使用增量统计")
+
+    manager.create("写报告", priority="High", category="Work")
+    manager.create("复习", priority="Low", category="Study")
+    manager.create("买菜", category="Life")
+    manager.done(1)
+    manager.delete(3)
+    manager._find_task(2).category = "Work"
+
+    stats = manager.analyzer.get_statistics()
+    expected = TaskStatistics(manager.tasks)
+    tester.assert_equal(stats['total'], expected.calculate_total(), "增量总数应与全量计算一致")
+    tester.assert_equal(stats['completed'], expected.calculate_completed(), "增量已完成数应一致")
+    tester.assert_equal(stats['pending'], expected.calculate_pending(), "增量待办数应一致")
+    tester.assert_equal(stats['by_category'], expected.get_stats_by_category(), "增量分类统计应一致")
+    tester.assert_equal(stats['by_priority'], expected.get_priority_distribution(), "增量优先级分布应一致")
+
+    manager.clear()
+    stats = manager.analyzer.get_statistics()
+    tester.assert_equal((stats['total'], stats['completed']), (1, 0), "清除后计数器应更新")
+
+    # 监听器收到的事件
+    events = []
+    manager.add_listener(lambda event, task, previous: events.append((event, task.id)))
+    task = manager.create("新任务")
+    manager.done(task.id)
+    manager.clear()
+    tester.assert_equal(events, [("added", task.id), ("done", task.id), ("cleared", task.id)],
+                        "监听器应按顺序收到变更事件")
+
+
+# ==================== VectorizedTaskStatistics 测试 ====================
+
+def test_vectorized_statistics(tester):
+    """测试向量化统计"""
+    print("\n" + "=" * 70)
+    print("测试: VectorizedTaskStatistics")
+    print("=" * 70)
+
+    manager = TaskManager(storage=MockTaskStorage())
+    manager.create("写报告", priority="High", category="Work")
+    manager.create("开会", priority="Low", category="Work")
+    manager.create("复习", priority="High", category="Study")
+    manager.done(1)
+    manager.done(3)
+
+    if vector_stats.np is None:
+        try:
+            VectorizedTaskStatistics.from_tasks(manager.tasks)
+            tester.assert_true(False, "未安装numpy时应提示安装")
+        except ImportError:
+            tester.assert_true(True, "未安装numpy时应提示安装")
+        return
+
+    vectorized = VectorizedTaskStatistics.from_tasks(manager.tasks)
+    tester.assert_equal(vectorized.get_statistics(), manager.analyzer.get_statistics(),
+                        "向量化统计结果应与分析服务一致")
+
+    cross = vectorized.get_cross_tabs()
+    tester.assert_equal(cross['category_status']['Work'], {"done": 1, "pending": 1},
+                        "分类×状态交叉表应正确")
+    tester.assert_equal(cross['priority_status']['High'], {"done": 2},
+                        "优先级×状态交叉表应正确")
+
+    empty = VectorizedTaskStatistics.from_tasks([])
+    tester.assert_equal(empty.get_statistics()['completion_rate'], 0.0, "空数据完成率应为0")
+    tester.assert_equal(empty.get_completion_hours()['count'], 0, "空数据不应有耗时统计")
+    tester.assert_equal(vectorized.get_completion_hours()['count'], 2, "应统计已完成任务的耗时")
+
+
+# ==================== 完成耗时分位数测试 ====================
+
+def test_completion_times(tester):
+    """测试分位数草图与完成耗时分析"""
+    print("\n" + "=" * 70)
+    print("测试: CompletionTimeAnalyzer")
+    print("=" * 70)
+
+    values = [float(i) for i in range(1, 1001)]
+    sketch = QuantileSketch()
+    sketch.extend(values)
+    for q, exact in ((0.5, 500.5), (0.9, 900.1), (0.99, 990.01)):
+        estimate = sketch.quantile(q)
+        tester.assert_true(abs(estimate - exact) <= exact * 0.02,
+                           f"p{int(q * 100)} 估计值应在相对误差范围内")
+
+    # 分片合并结果与整体一致
+    left, right = QuantileSketch(), QuantileSketch()
+    left.extend(values[::2])
+    right.extend(values[1::2])
+    left.merge(right)
+    tester.assert_equal(left.quantile(0.9), sketch.quantile(0.9), "合并后的分位数应与整体一致")
+    tester.assert_equal(QuantileSketch.from_dict(sketch.to_dict()).quantile(0.5),
+                        sketch.quantile(0.5), "序列化往返后分位数不变")
+    tester.assert_equal(QuantileSketch().quantile(0.5), None, "空草图没有分位数")
+
+    manager = TaskManager(storage=MockTaskStorage())
+    manager.create("写报告", priority="High", category="Work")
+    manager.create("复习", priority="Low", category="Study")
+    manager.done(1)
+    manager.done(2)
+    task = manager._find_task(1)
+    task.createdAt = "2024-01-01T00:00:00Z"
+    task.completedAt = "2024-01-01T10:00:00Z"
+
+    analyzer = CompletionTimeAnalyzer(manager.tasks)
+    summary = analyzer.summarize()
+    tester.assert_equal(summary['overall']['count'], 2, "应统计全部已完成任务")
+    tester.assert_true(abs(summary['by_category']['Work']['p50'] - 10) <= 0.2,
+                       "分类耗时应约为10小时")
+    tester.assert_equal(summary['by_priority']['Low']['count'], 1, "应按优先级分组")
+
+    # 分析服务随完成事件增量更新，清除后历史耗时仍保留
+    manager.create("开会")
+    manager.done(3)
+    manager.clear()
+    times = manager.analyzer.get_completion_times()
+    tester.assert_equal(times['overall']['count'], 3, "完成事件应计入耗时草图且清除后保留")
+
+    # 草图随元数据持久化，重启后清除的任务仍计入
+    reloaded = TaskManager(storage=manager.storage)
+    tester.assert_equal(len(reloaded.tasks), 0, "已完成任务应已被清除")
+    tester.assert_equal(reloaded.analyzer.get_completion_times()['overall']['count'], 3,
+                        "重启后应从元数据恢复历史耗时")
+    tester.assert_equal(
+        reloaded.analyzer.get_completion_times()['by_category'],
+        times['by_category'], "重启后分类耗时应与重启前一致")
+
+    restored = CompletionTimeAnalyzer.from_dict(analyzer.to_dict())
+    restored.merge(analyzer)
+    tester.assert_equal(restored.summarize()['overall']['count'], 4, "分片合并应累加样本数")
+
+
+# ==================== 吞吐量时间序列测试 ====================
+
+def test_timeseries(tester):
+    """测试每日汇总与时间序列"""
+    print("\n" + "=" * 70)
+    print("测试: DailyRollups")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filepath = os.path.join(tmpdir, "tasks.json")
+        manager = TaskManager(storage=JSONTaskStorage(filepath))
+        manager.create("写报告")
+        manager.create("复习")
+        manager.create("买菜")
+        manager.done(1)
+        manager.delete(3)
+
+        today = datetime.now().date().isoformat()
+        series = manager.analyzer.get_timeseries()
+        tester.assert_equal(len(series), 30, "默认返回最近30天")
+        tester.assert_equal(series[-1], {'date': today, 'created': 3, 'completed': 1,
+                                          'removed': 1, 'backlog': 1},
+                            "当天应统计新建、完成和积压")
+
+        # 汇总随任务保存，重新加载后无需遍历任务即可回答
+        reloaded = TaskManager(storage=JSONTaskStorage(filepath))
+        tester.assert_equal(reloaded.analyzer.rollups.buckets, {today: [3, 1, 1]},
+                            "每日汇总应持久化到存储元数据")
+        tester.assert_true(reloaded.meta.get("next_id") == 4, "汇总不应覆盖其他元数据")
+
+    # 由历史任务补建汇总，并按周聚合
+    storage = MockTaskStorage()
+    storage.data = [
+        {"id": 1, "description": "a", "status": "done",
+         "createdAt": "2024-01-01T09:00:00Z", "completedAt": "2024-01-03T09:00:00Z"},
+        {"id": 2, "description": "b", "status": "pending",
+         "createdAt": "2024-01-02T09:00:00Z", "completedAt": None},
+        {"id": 3, "description": "c", "status": "pending",
+         "createdAt": "2024-01-09T09:00:00Z", "completedAt": None},
+    ]
+    manager = TaskManager(storage=storage)
+    daily = manager.analyzer.get_timeseries("2024-01-02", "2024-01-03")
+    tester.assert_equal([point['backlog'] for point in daily], [2, 1], "积压量应包含起始日之前的累计")
+    weekly = manager.analyzer.get_timeseries("2024-01-01", "2024-01-14", granularity="week")
+    tester.assert_equal([(p['date'], p['created'], p['completed'], p['backlog']) for p in weekly],
+                        [("2024-01-01", 2, 1, 1), ("2024-01-08", 1, 0, 2)],
+                        "按周聚合应从周一开始")
+
+    try:
+        manager.analyzer.get_timeseries(granularity="month")
+        tester.assert_true(False, "无效粒度应报错")
+    except ValueError:
+        tester.assert_true(True, "无效粒度应报错")
+
+    # 日期无效或范围过大时返回固定的错误消息，不逐天生成
+    for start, end, expected in (("0001-01-01", "2024-01-01", "时间范围最多"),
+                                 ("2024-02-30", None, "无效的日期: 2024-02-30")):
+        try:
+            manager.analyzer.get_timeseries(start=start, end=end)
+            tester.assert_true(False, f"{start} 应报错")
+        except ValueError as e:
+            tester.assert_contains(str(e), expected, f"{start} 应返回固定的错误消息")
+    tester.assert_equal(len(manager.analyzer.get_timeseries(end="0001-01-10")), 10,
+                        "默认起始日不应早于最小日期")
+
+
+# ==================== 积压预测测试 ====================
+
+def test_backlog_forecast(tester):
+    """测试积压预测"""
+    print("\n" + "=" * 70)
+    print("测试: 积压预测")
+    print("=" * 70)
+
+    manager = TaskManager(storage=MockTaskStorage())
+    forecast = manager.analyzer.get_forecast()
+    tester.assert_equal((forecast['backlog'], forecast['days_to_clear']), (0, 0.0),
+                        "没有待办时积压已清空")
+
+    for i in range(4):
+        manager.create(f"任务{i}")
+    manager.done(1)
+
+    forecast = manager.analyzer.get_forecast(threshold=5)
+    tester.assert_true(forecast['arrival_rate'] > forecast['completion_rate'] > 0,
+                       "速率应来自每日汇总")
+    tester.assert_equal(forecast['clear_date'], None, "新增快于完成时积压不会清空")
+    tester.assert_true(forecast['days_to_threshold'] > 0, "应预测超过阈值的时间")
+    tester.assert_true(manager.analyzer.get_forecast(threshold=5) is forecast,
+                       "没有变更时应直接返回缓存结果")
+
+    manager.done(2)
+    manager.done(3)
+    manager.delete(4)
+    forecast = manager.analyzer.get_forecast(threshold=5)
+    tester.assert_equal(forecast['backlog'], 0, "变更后缓存应失效")
+
+    yesterday = (datetime.now().date() - timedelta(days=1)).isoformat()
+    analyzer = TaskAnalyzer(TaskStatistics([create_mock_task(1, "a"), create_mock_task(2, "b")]),
+                            DailyRollups({yesterday: [1, 4, 0]}))
+    forecast = analyzer.forecast_backlog(threshold=1)
+    tester.assert_true(forecast['days_to_clear'] > 0, "流出快于新增时应预测清空时间")
+    tester.assert_equal(forecast['days_to_threshold'], 0.0, "已超过阈值时天数为0")
+
+    tester.assert_contains(manager.analyzer.get_today_report(), "积压预测",
+                           "今日简报应包含积压预测")
+
+
+# ==================== 报表导出器测试 ====================
+
+def test_exporters(tester):
+    """测试多格式报表导出"""
+    print("\n" + "=" * 70)
+    print("测试: 报表导出器")
+    print("=" * 70)
+
+    manager = TaskManager(storage=MockTaskStorage())
+    manager.create("写报告, 含逗号", priority="High", category="Work")
+    manager.create("<b>复习</b> | 第二章", category="Study")
+    manager.done(1)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for fmt in EXPORTERS:
+            filepath = os.path.join(tmpdir, f"report.{fmt}")
+            result = manager.analyzer.export_summary(filepath, fmt)
+            tester.assert_contains(result, filepath, f"{fmt} 导出消息应包含文件名")
+            with open(filepath, encoding='utf-8', newline='') as f:
+                content = f.read()
+            tester.assert_equal("".join(manager.analyzer.iter_report(fmt)).count("\n"),
+                                content.count("\n"), f"{fmt} 下载内容应与导出文件一致")
+
+        with open(os.path.join(tmpdir, "report.csv"), encoding='utf-8', newline='') as f:
+            rows = list(csv.reader(f))
+        tester.assert_equal(rows[0][:3], ["id", "description", "status"], "CSV首行应为字段名")
+        tester.assert_equal(rows[1][1], "写报告, 含逗号", "CSV应正确转义逗号")
+
+        with open(os.path.join(tmpdir, "report.jsonl"), encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        tasks = [record for record in records if record['section'] == 'tasks']
+        tester.assert_equal((tasks[0]['id'], tasks[0]['status']), (1, "done"),
+                            "JSON Lines应每个任务一行")
+
+        with open(os.path.join(tmpdir, "report.md"), encoding='utf-8') as f:
+            tester.assert_contains(f.read(), "\\| 第二章", "Markdown应转义竖线")
+        with open(os.path.join(tmpdir, "report.html"), encoding='utf-8') as f:
+            tester.assert_contains(f.read(), "&lt;b&gt;复习&lt;/b&gt;", "HTML应转义任务描述")
+
+    # 分块大小有上限，与任务数无关
+    generator = ReportGenerator(manager.tasks, manager.analyzer.analyzer)
+    chunks = list(get_exporter("csv").iter_chunks(generator, chunk_size=10))
+    tester.assert_true(len(chunks) > 1, "内容应按分块生成")
+
+    try:
+        manager.analyzer.export_summary(fmt="pdf")
+        tester.assert_true(False, "不支持的格式应报错")
+    except ValueError:
+        tester.assert_true(True, "不支持的格式应报错")
+
+
+# ==================== 结果缓存测试 ====================
+
+def test_result_cache(tester):
+    """测试按数据版本缓存分析结果"""
+    print("\n" + "=" * 70)
+    print("测试: 分析结果缓存")
+    print("=" * 70)
+
+    manager = TaskManager(storage=MockTaskStorage())
+    service = manager.analyzer
+    version = manager.version
+    manager.create("写报告")
+    tester.assert_true(manager.version > version, "变更后数据版本应递增")
+
+    stats = service.get_statistics()
+    tester.assert_true(service.get_statistics() is stats, "数据未变化时应返回缓存结果")
+    manager._find_task(1).category = "Work"
+    tester.assert_equal(service.get_statistics()['by_category'], {"Work": 1},
+                        "直接修改字段后缓存也应失效")
+
+    # 报表内容渲染一次后直接复用分块，生成时间每次输出时重新生成
+    rendered = []
+    original = ReportGenerator.iter_report_body
+    ReportGenerator.iter_report_body = lambda self: (rendered.append(1), original(self))[1]
+    real_datetime = analytics.datetime
+
+    class FrozenDatetime(datetime):
+        current = datetime(2024, 1, 1, 9, 0, 0)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current
+
+    try:
+        analytics.datetime = FrozenDatetime
+        first = "".join(service.iter_report("txt"))
+        FrozenDatetime.current = datetime(2024, 1, 1, 10, 30, 0)
+        second = "".join(service.iter_report("txt"))
+        tester.assert_equal(len(rendered), 1, "未变化时报表只渲染一次")
+        tester.assert_true("生成时间: 2024-01-01 09:00:00" in first, "首次输出应带当前生成时间")
+        tester.assert_true("生成时间: 2024-01-01 10:30:00" in second,
+                           "缓存的报表也应带输出时的生成时间")
+        tester.assert_equal(first.split("\n")[4:], second.split("\n")[4:],
+                            "缓存的报表内容应与首次一致")
+        manager.done(1)
+        "".join(service.iter_report("txt"))
+        tester.assert_equal(len(rendered), 2, "变更后应重新渲染报表")
+    finally:
+        ReportGenerator.iter_report_body = original
+        analytics.datetime = real_datetime
+
+    # 报表生成器每次基于当前快照，不保留启动时的任务列表
+    manager.create("启动后新增")
+    manager.delete(1)
+    tester.assert_equal([t.description for t in service.report_generator.tasks], ["启动后新增"],
+                        "报表应使用当前的任务，不包含已删除的任务")
+
+    # 同一版本内按参数缓存，条目数有上限
+    small = TaskAnalyzerService(manager, cache_size=2)
+    for days in range(5):
+        small.get_timeseries(end=f"2024-01-0{days + 1}")
+    tester.assert_equal(len(small._cache), 2, "缓存条目数不应超过上限")
+
+
 # ==================== 主测试入口 ====================
 
 def main():
@@ -506,6 +936,14 @@ def main():
     test_report_generator(tester)
     test_analyzer_service(tester)
     test_integration(tester)
+    test_task_table(tester)
+    test_running_statistics(tester)
+    test_vectorized_statistics(tester)
+    test_completion_times(tester)
+    test_timeseries(tester)
+    test_backlog_forecast(tester)
+    test_exporters(tester)
+    test_result_cache(tester)
 
     # 打印测试结果
     tester.print_summary()
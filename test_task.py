@@ -2,13 +2,26 @@
 任务管理CLI工具 - 测试文件（重构版）
 """
 
+import json
+import multiprocessing
+import os
 import sys
+import tempfile
+import threading
+import time
 from task import Task, TaskManager
-from storage import MockTaskStorage
+from events import EventFeed
+from sync import SyncService
+from batch import BatchService
+from timestamps import to_epoch_us
+from storage import (
+    MockTaskStorage, JSONTaskStorage, WALTaskStorage, SQLiteTaskStorage,
+    WriteBehindStorage, create_storage
+)
 from constants import (
     MSG_ADDED, MSG_TASK_NOT_FOUND, MSG_TASK_MARKED_DONE,
     MSG_TASK_DELETED, MSG_CLEARED_ALL, MSG_EMPTY_DESCRIPTION,
-    MSG_NO_TASKS, STATUS_PENDING, STATUS_DONE
+    MSG_NO_TASKS, STATUS_PENDING, STATUS_DONE, STORAGE_JSON, STORAGE_WAL
 )
 
 
@@ -60,6 +73,33 @@ class TaskTester:
         return self.failed == 0
 
 
+class DeltaRecordingStorage(MockTaskStorage):
+    """记录增量写入调用的Mock存储"""
+
+    supports_delta = True
+
+    def __init__(self, data=None):
+        super().__init__(data)
+        self.changes = []
+
+    def apply_changes(self, upserts, deleted_ids):
+        self.changes.append((list(upserts), list(deleted_ids)))
+
+
+class FailingStorage(DeltaRecordingStorage):
+    """前 failures 次增量写入失败的Mock存储"""
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    def apply_changes(self, upserts, deleted_ids):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("磁盘已满")
+        super().apply_changes(upserts, deleted_ids)
+
+
 # ==================== 测试用例 ====================
 
 def test_add_tasks(tester: TaskTester):
@@ -283,6 +323,840 @@ def test_id_auto_increment(tester: TaskTester):
     tester.assert_equal(manager.tasks[2].id, 3, "第三个任务ID应为3")
 
 
+def test_wal_storage(tester: TaskTester):
+    """测试13: 追加日志存储"""
+    print("\n测试13: 追加日志存储")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, "tasks.json")
+        storage = WALTaskStorage(filepath, compact_threshold=100, background=False)
+        manager = TaskManager(storage=storage)
+
+        manager.add("任务1")
+        manager.add("任务2")
+        manager.done(1)
+        manager.delete(2)
+
+        with open(storage.log_path, 'r', encoding='utf-8') as f:
+            lines = [line for line in f.read().splitlines() if '"meta"' not in line]
+        tester.assert_equal(len(lines), 4, "每次变更只追加一条日志")
+
+        reloaded = TaskManager(storage=WALTaskStorage(filepath))
+        tester.assert_equal(len(reloaded.tasks), 1, "重放日志后应剩余1个任务")
+        tester.assert_equal(reloaded.tasks[0].status, STATUS_DONE, "重放日志后状态应正确")
+
+        # 压缩后日志清空，快照包含全部任务
+        storage.compact()
+        tester.assert_true(not os.path.exists(storage.log_path), "压缩后日志应被清除")
+        reloaded = TaskManager(storage=WALTaskStorage(filepath))
+        tester.assert_equal(len(reloaded.tasks), 1, "压缩后应从快照加载任务")
+
+        # 写了一半的尾部记录应被忽略
+        manager.add("任务3")
+        with open(storage.log_path, 'a', encoding='utf-8') as f:
+            f.write('{"op": "put", "task": {"id": 9')
+        reloaded = TaskManager(storage=WALTaskStorage(filepath))
+        tester.assert_equal(len(reloaded.tasks), 2, "应忽略损坏的尾部记录")
+
+        # 存在未压缩的日志时，即使选择JSON也应使用WAL读取
+        tester.assert_true(isinstance(create_storage(filepath, STORAGE_JSON), WALTaskStorage),
+                           "存在追加日志时应使用WAL存储")
+        other = os.path.join(tmp_dir, "other.json")
+        tester.assert_true(isinstance(create_storage(other, STORAGE_JSON), JSONTaskStorage),
+                           "没有日志时应按选择使用JSON存储")
+        tester.assert_true(isinstance(create_storage(other, STORAGE_WAL), WALTaskStorage),
+                           "应能选择WAL存储")
+        try:
+            create_storage(other, "xml")
+            tester.assert_true(False, "未知的存储类型应报错")
+        except ValueError:
+            tester.assert_true(True, "未知的存储类型应报错")
+
+
+def test_wal_compaction_threshold(tester: TaskTester):
+    """测试14: 日志达到阈值自动压缩"""
+    print("\n测试14: 日志自动压缩")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, "tasks.json")
+        storage = WALTaskStorage(filepath, compact_threshold=3)
+        manager = TaskManager(storage=storage)
+
+        for i in range(5):
+            manager.add(f"任务{i + 1}")
+        storage.close()
+
+        reloaded = TaskManager(storage=WALTaskStorage(filepath))
+        tester.assert_equal(len(reloaded.tasks), 5, "后台压缩后数据应完整")
+        tester.assert_true(not os.path.exists(storage.old_log_path), "压缩后不应遗留旧日志")
+
+
+def test_sqlite_storage(tester: TaskTester):
+    """测试15: SQLite存储"""
+    print("\n测试15: SQLite存储")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, "tasks.db")
+        storage = SQLiteTaskStorage(filepath)
+        manager = TaskManager(filepath)
+        tester.assert_true(isinstance(manager.storage, SQLiteTaskStorage), ".db文件应使用SQLite存储")
+        manager.storage.close()
+
+        manager = TaskManager(storage=storage)
+        manager.add("任务1")
+        manager.add("任务2")
+        manager.add("任务3")
+        manager.done(2)
+        manager.delete(3)
+
+        tester.assert_equal(storage.count(), 2, "应按行写入任务")
+        pending = storage.query(status=STATUS_PENDING)
+        tester.assert_equal([t["id"] for t in pending], [1], "应通过索引查询待办任务")
+        tester.assert_equal(storage.count(status=STATUS_DONE), 1, "应通过索引统计已完成任务")
+
+        # 管理器的过滤查询由内存中的二级索引回答，不访问数据库
+        queries = []
+        storage.query = lambda **criteria: queries.append(criteria)
+        tester.assert_equal([t.id for t in manager.query(status=STATUS_DONE)], [2],
+                            "管理器查询结果应正确")
+        tester.assert_equal(queries, [], "管理器查询不应访问存储")
+        del storage.query
+        tester.assert_true(isinstance(create_storage(os.path.join(tmp_dir, "env.json"), "sqlite"),
+                                      SQLiteTaskStorage), "应能选择SQLite存储")
+
+        manager.clear()
+        reloaded = TaskManager(storage=SQLiteTaskStorage(filepath))
+        tester.assert_equal(len(reloaded.tasks), 1, "清除后重新加载应剩余1个任务")
+        tester.assert_equal(reloaded.tasks[0].description, "任务1", "重新加载的任务内容应正确")
+
+        # 整体保存应删除多余的行
+        storage.save([{"id": 5, "description": "唯一任务", "status": STATUS_PENDING}])
+        tester.assert_equal([t["id"] for t in storage.load()], [5], "整体保存应替换全部任务")
+        storage.close()
+        reloaded.storage.close()
+
+
+def test_json_backup_rotation(tester: TaskTester):
+    """测试16: JSON原子保存与备份轮转"""
+    print("\n测试16: 备份轮转")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, "tasks.json")
+        storage = JSONTaskStorage(filepath, backup_count=2)
+        storage.create_if_not_exists()
+
+        for i in range(1, 4):
+            storage.save([{"id": i, "description": f"版本{i}", "status": "pending"}])
+
+        tester.assert_equal(storage.load()[0]["id"], 3, "主文件应为最新版本")
+        tester.assert_equal(
+            JSONTaskStorage(storage.get_backup_path(1)).load()[0]["id"], 2,
+            "第1代备份应为上一版本"
+        )
+        tester.assert_equal(
+            JSONTaskStorage(storage.get_backup_path(2)).load()[0]["id"], 1,
+            "第2代备份应为更早版本"
+        )
+        tester.assert_true(not os.path.exists(storage.get_backup_path(3)), "不应超过配置的备份代数")
+        tester.assert_true(not os.path.exists(filepath + ".tmp"), "不应遗留临时文件")
+
+
+def test_dirty_tracking(tester: TaskTester):
+    """测试17: 脏标记与增量保存"""
+    print("\n测试17: 脏标记与增量保存")
+    storage = DeltaRecordingStorage([
+        {"id": 1, "description": "任务1", "status": "pending"},
+        {"id": 2, "description": "任务2", "status": "pending"},
+        {"id": 3, "description": "任务3", "status": "done"},
+    ])
+    manager = TaskManager(storage=storage)
+    tester.assert_true(not any(t.dirty for t in manager.tasks), "加载的任务不应为脏")
+
+    manager.done(2)
+    upserts, deleted = storage.changes[-1]
+    tester.assert_equal([t["id"] for t in upserts], [2], "完成任务只应写入该任务")
+    tester.assert_equal(deleted, [], "完成任务不应删除任务")
+    tester.assert_true(not manager.tasks[1].dirty, "保存后任务应为干净")
+
+    manager.add("任务4")
+    tester.assert_equal([t["id"] for t in storage.changes[-1][0]], [4], "添加任务只应写入新任务")
+
+    # 直接修改字段后保存也只写入该任务
+    manager.tasks[0].description = "任务1（修改）"
+    manager._save_tasks()
+    tester.assert_equal(storage.changes[-1][0][0]["description"], "任务1（修改）", "应写入直接修改的任务")
+
+    manager.clear()
+    tester.assert_equal(sorted(storage.changes[-1][1]), [2, 3], "清除应只删除已完成任务")
+
+    count = len(storage.changes)
+    manager._save_tasks()
+    tester.assert_equal(len(storage.changes), count, "无变更时不应写入存储")
+
+
+def test_write_behind(tester: TaskTester):
+    """测试18: 写合并"""
+    print("\n测试18: 写合并")
+    inner = DeltaRecordingStorage()
+    storage = WriteBehindStorage(inner, window=60, max_ops=1000)
+    manager = TaskManager(storage=storage)
+
+    manager.add("任务1")
+    manager.add("任务2")
+    manager.done(1)
+    manager.delete(2)
+    tester.assert_equal(len(inner.changes), 0, "窗口期内不应写入底层存储")
+
+    manager.flush()
+    tester.assert_equal(len(inner.changes), 1, "多次变更应合并为一次写入")
+    upserts, deleted = inner.changes[0]
+    tester.assert_equal([t["id"] for t in upserts], [1], "同一任务只写入最后状态")
+    tester.assert_equal(upserts[0]["status"], STATUS_DONE, "合并后的任务状态应正确")
+    tester.assert_equal(deleted, [2], "删除应覆盖此前的写入")
+
+    # 达到最大变更数时不等窗口期结束
+    inner = DeltaRecordingStorage()
+    storage = WriteBehindStorage(inner, window=60, max_ops=2)
+    manager = TaskManager(storage=storage)
+    manager.add("任务1")
+    manager.add("任务2")
+    for _ in range(100):
+        if inner.changes:
+            break
+        time.sleep(0.01)
+    tester.assert_equal(len(inner.changes), 1, "达到最大变更数后应立即写入")
+    storage.close()
+
+    # wait=True 时返回前变更已经落盘
+    inner = DeltaRecordingStorage()
+    storage = WriteBehindStorage(inner, window=0.01, wait=True)
+    manager = TaskManager(storage=storage)
+    manager.add("任务1")
+    tester.assert_equal(len(inner.changes), 1, "组提交模式应等待落盘完成")
+    storage.close()
+
+    # 写入失败：只报告给等待这次变更的调用方，变更保留在队列中重试
+    inner = FailingStorage(failures=1)
+    storage = WriteBehindStorage(inner, window=0.01, retry=0.05)
+    manager = TaskManager(storage=storage)
+    manager.add("任务1")
+    try:
+        storage.wait()
+        tester.assert_true(False, "等待失败的写入应抛出异常")
+    except OSError:
+        tester.assert_true(True, "等待失败的写入应抛出异常")
+    manager.add("任务2")
+    tester.assert_true(True, "之后无关的写入不应抛出上一次的异常")
+    storage.wait()
+    written = sorted(t["id"] for upserts, _ in inner.changes for t in upserts)
+    tester.assert_equal(written, [1, 2], "失败的变更应在重试时与新变更一起写入")
+    manager.delete(1)
+    storage.close()
+    tester.assert_equal(inner.changes[-1][1], [1], "关闭时应落盘剩余变更")
+
+
+def test_id_not_reused(tester: TaskTester):
+    """测试19: ID计数器持久化"""
+    print("\n测试19: ID计数器持久化")
+    storage = MockTaskStorage()
+    manager = TaskManager(storage=storage)
+
+    task = manager.create("任务1", priority="High", category="Work")
+    tester.assert_equal(task.id, 1, "create应返回新建的任务")
+    tester.assert_equal(task.priority, "High", "create应设置优先级")
+    tester.assert_true(manager._find_task(1) is task, "应通过ID直接找到任务")
+    tester.assert_true(manager.create("   ") is None, "空描述不应创建任务")
+
+    manager.add("任务2")
+    manager.delete(2)
+    manager.add("任务3")
+    tester.assert_equal(manager.tasks[-1].id, 3, "删除的ID不应被重用")
+
+    manager.delete(3)
+    reloaded = TaskManager(storage=storage)
+    reloaded.add("任务4")
+    tester.assert_equal(reloaded.tasks[-1].id, 4, "重新加载后ID计数器应保持单调")
+
+
+def test_secondary_index(tester: TaskTester):
+    """测试20: 二级索引"""
+    print("\n测试20: 二级索引")
+    manager = TaskManager(storage=MockTaskStorage())
+    manager.create("写报告", priority="High", category="Work")
+    manager.create("开会", priority="Low", category="Work")
+    manager.create("复习", priority="High", category="Study")
+    manager.done(2)
+
+    pending_work = manager.query(status=STATUS_PENDING, category="Work")
+    tester.assert_equal([t.id for t in pending_work], [1], "应查询到待办的Work任务")
+    tester.assert_equal(manager.count(priority="High"), 2, "应按优先级统计")
+    tester.assert_equal(manager.count(status=STATUS_DONE), 1, "应按状态统计")
+
+    # 直接修改字段后查询应反映最新值
+    manager._find_task(3).category = "Work"
+    tester.assert_equal(manager.count(category="Work"), 3, "修改分类后索引应更新")
+
+    manager.delete(1)
+    tester.assert_equal([t.id for t in manager.query(category="Work")], [2, 3], "删除后索引应更新")
+
+    manager.clear()
+    tester.assert_equal(manager.count(status=STATUS_DONE), 0, "清除后不应有已完成任务")
+    tester.assert_equal([t.id for t in manager.tasks], [3], "清除应只保留待办任务")
+
+
+def test_task_slots(tester: TaskTester):
+    """测试21: 紧凑任务结构"""
+    print("\n测试21: 紧凑任务结构")
+    task = Task(1, "测试任务")
+    tester.assert_true(not hasattr(task, "__dict__"), "任务对象不应有__dict__")
+    tester.assert_equal(task.priority, "Medium", "默认优先级应为Medium")
+    tester.assert_equal(task.category, "General", "默认分类应为General")
+
+    try:
+        task.unknown_field = 1
+        tester.assert_true(False, "不应允许添加未声明的属性")
+    except AttributeError:
+        tester.assert_true(True, "不应允许添加未声明的属性")
+
+
+def test_schema_migration(tester: TaskTester):
+    """测试22: 存储格式版本与惰性迁移"""
+    print("\n测试22: 存储格式迁移")
+    legacy = [
+        {"id": 1, "description": "旧任务1", "status": "pending"},
+        {"id": 2, "description": "旧任务2", "status": "done"},
+        {"id": 3, "description": "未来格式", "status": "pending", "schemaVersion": 99},
+    ]
+    storage = DeltaRecordingStorage(legacy)
+    manager = TaskManager(storage=storage)
+
+    tester.assert_equal(len(manager.tasks), 2, "应跳过不支持的格式版本")
+    tester.assert_equal(manager.tasks[0].priority, "Medium", "旧记录应补充默认优先级")
+    tester.assert_equal(manager.tasks[0].category, "General", "旧记录应补充默认分类")
+    tester.assert_equal(len(storage.changes), 0, "加载时不应改写存储")
+    tester.assert_true("schemaVersion" not in legacy[0], "迁移不应修改原始记录")
+
+    manager.done(1)
+    upserts, _ = storage.changes[-1]
+    tester.assert_equal(len(upserts), 1, "只有被修改的旧记录写回")
+    tester.assert_equal(upserts[0]["schemaVersion"], 2, "写回的记录应为新格式")
+
+    # 整体保存时原样写回不支持的记录，其ID也不会被重新分配
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, "tasks.json")
+        future = {"id": 5, "description": "未来格式", "status": "pending",
+                  "schemaVersion": 3, "assignee": "alice"}
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump([{"id": 1, "description": "旧任务", "status": "pending"}, future], f)
+        manager = TaskManager(storage=JSONTaskStorage(filepath))
+        task = manager.create("新任务")
+        tester.assert_equal(task.id, 6, "不应重新分配不支持的记录的ID")
+        manager.delete(1)
+        with open(filepath, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        tester.assert_equal([item for item in saved if item["id"] == 5], [future],
+                            "整体保存后不支持的记录应保持不变")
+        tester.assert_equal(sorted(item["id"] for item in saved), [5, 6],
+                            "其他修改应照常保存")
+
+    # 优先级和分类在重新加载后保留
+    storage = MockTaskStorage()
+    manager = TaskManager(storage=storage)
+    manager.create("写报告", priority="High", category="Work")
+    reloaded = TaskManager(storage=storage)
+    tester.assert_equal(reloaded.tasks[0].priority, "High", "重新加载后优先级应保留")
+    tester.assert_equal(reloaded.tasks[0].category, "Work", "重新加载后分类应保留")
+
+
+def test_sorted_order(tester: TaskTester):
+    """测试23: 预计算排序键与有序索引"""
+    print("\n测试23: 有序索引")
+    data = [
+        {"id": 1, "description": "低-旧", "status": "pending", "priority": "Low",
+         "createdAt": "2024-01-01T08:00:00Z"},
+        {"id": 2, "description": "高-旧", "status": "pending", "priority": "High",
+         "createdAt": "2024-01-01T09:00:00Z"},
+        {"id": 3, "description": "高-新", "status": "pending", "priority": "High",
+         "createdAt": "2024-01-02T09:00:00Z"},
+        {"id": 4, "description": "中", "status": "pending",
+         "createdAt": "2024-01-03T09:00:00Z"},
+    ]
+    manager = TaskManager(storage=MockTaskStorage(data))
+    task = manager._find_task(2)
+    tester.assert_equal(task.created_us, 1704099600000000, "应预先解析创建时间")
+    tester.assert_equal(task.priority_weight, 3, "应预先计算优先级权重")
+
+    ids = [t.id for t in manager.sorted_tasks()]
+    tester.assert_equal(ids, [3, 2, 4, 1], "应按优先级、创建时间排序")
+
+    manager._find_task(1).priority = "High"
+    new_task = manager.create("新任务", priority="Low")
+    manager.delete(3)
+    ids = [t.id for t in manager.sorted_tasks()]
+    tester.assert_equal(ids, [2, 1, 4, new_task.id], "变更后有序索引应保持正确")
+
+    subset = [t.id for t in manager.sorted_tasks([4, 1])]
+    tester.assert_equal(subset, [1, 4], "应能对查询结果排序")
+
+
+def test_event_feed(tester: TaskTester):
+    """测试24: 变更事件流"""
+    print("\n测试24: 变更事件流")
+    manager = TaskManager(storage=MockTaskStorage())
+    feed = EventFeed(size=3)
+    manager.add_listener(feed.on_event)
+
+    task = manager.create("写报告", category="Work")
+    manager.done(task.id)
+    events = feed.since(0)
+    tester.assert_equal([(e['seq'], e['event']) for e in events], [(1, "added"), (2, "done")],
+                        "事件应按顺序分配序号")
+    tester.assert_equal(events[0]['stats'],
+                        {"total": 1, "pending": 1, "by_category": {"Work": 1},
+                         "by_priority": {"Medium": 1}}, "新增事件应带统计增量")
+    tester.assert_equal(events[1]['stats'], {"pending": -1, "completed": 1},
+                        "完成事件只改变状态计数")
+    tester.assert_equal(feed.since(1), [events[1]], "应能从指定序号之后续传")
+
+    manager.clear()
+    manager.create("开会")
+    manager.create("复习")
+    tester.assert_equal(feed.since(0), None, "序号被挤出缓冲区时应要求重新同步")
+    tester.assert_equal(feed.since(99), None, "序号大于当前序号时应要求重新同步")
+    tester.assert_equal(feed.wait(feed.seq, timeout=0.01), [], "没有新事件时等待超时返回空列表")
+    tester.assert_equal(feed.since(feed.seq - 1)[0]['task']['description'], "复习",
+                        "事件应包含受影响的任务")
+
+    # 事件ID带有epoch：来自其他实例（重启前或其他进程）的序号需要重新同步
+    event_id = feed.event_id(feed.seq - 1)
+    tester.assert_equal(EventFeed.parse_event_id(event_id), (feed.epoch, feed.seq - 1),
+                        "事件ID应由epoch和序号组成")
+    tester.assert_equal(len(feed.since(feed.seq - 1, feed.epoch)), 1, "相同epoch应能续传")
+    tester.assert_equal(feed.since(feed.seq - 1, "other"), None, "epoch不同时应要求重新同步")
+
+
+def test_delta_sync(tester: TaskTester):
+    """测试25: 增量同步"""
+    print("\n测试25: 增量同步")
+    manager = TaskManager(storage=MockTaskStorage([
+        {"id": 1, "description": "已有任务", "status": "pending"},
+    ]))
+    service = SyncService(manager, size=3)
+
+    first = service.pull()
+    tester.assert_true(first['full'], "首次同步应返回全量数据")
+    tester.assert_equal([t['id'] for t in first['tasks']], [1], "全量数据应包含全部任务")
+
+    task = manager.create("服务端新增")
+    manager.done(1)
+    delta = service.pull(first['version'], first['epoch'])
+    tester.assert_equal(([c['op'] for c in delta['changes']], delta['full']), (["put", "put"], False),
+                        "应只返回客户端版本之后的变更")
+    tester.assert_equal(service.pull(delta['version'], delta['epoch'])['changes'], [],
+                        "没有新变更时应返回空列表")
+    tester.assert_true(service.pull(delta['version'], "other")['full'], "epoch不同时应全量同步")
+
+    # 客户端离线操作：新增、完成已删除的任务、删除
+    manager.delete(task.id)
+    response = service.sync(delta['version'], delta['epoch'], [
+        {"op": "add", "op_id": "c1", "ref": -1, "description": "离线新增",
+         "createdAt": "2024-01-01T08:00:00.000Z"},
+        {"op": "done", "op_id": "c2", "id": task.id, "completedAt": "2024-01-01T09:00:00Z"},
+        {"op": "delete", "op_id": "c3", "id": 1},
+        {"op": "rename", "id": 1},
+    ])
+    statuses = [r['status'] for r in response['results']]
+    tester.assert_equal(statuses, ["applied", "conflict", "applied", "rejected"],
+                        "冲突应按固定规则解决")
+    new_id = response['results'][0]['id']
+    tester.assert_equal(manager._find_task(new_id).createdAt, "2024-01-01T08:00:00.000Z",
+                        "应保留客户端的创建时间")
+    changes = {(c['op'], c.get('id') or c['task']['id']) for c in response['changes']}
+    tester.assert_equal(changes, {("delete", task.id), ("delete", 1), ("put", new_id)},
+                        "同一任务只返回最后一次变更")
+
+    retry = service.push([{"op": "add", "op_id": "c1", "ref": -1, "description": "离线新增"}])
+    tester.assert_equal((retry[0]['id'], len(manager.tasks)), (new_id, 1),
+                        "重试的操作不应重复应用")
+
+    # 已应用的操作随元数据保存，服务重启后重试同样不会重复应用
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "tasks.json")
+        op = {"op": "add", "op_id": "r1", "ref": -1, "description": "重启前新增"}
+        applied = SyncService(TaskManager(storage=JSONTaskStorage(path))).push([op])
+        restarted = TaskManager(storage=JSONTaskStorage(path))
+        retry = SyncService(restarted).push([op])
+        tester.assert_equal((retry, len(restarted.tasks)), (applied, 1),
+                            "重启后重试的操作应返回第一次的结果且不重复应用")
+        tester.assert_equal(restarted.get(applied[0]['id']).description, "重启前新增",
+                            "应能按ID获取任务")
+
+    count = len(manager.tasks)
+    malformed = service.push([
+        {"op": "done", "id": [1]},
+        {"op": "add", "op_id": {"a": 1}, "description": "坏的op_id"},
+        {"op": "add", "ref": [-3], "description": "坏的ref"},
+        {"op": "add", "description": "坏的优先级", "priority": "Urgent!!"},
+        {"op": "add", "description": "坏的分类", "category": 3},
+    ])
+    tester.assert_equal(([r['status'] for r in malformed], len(manager.tasks)),
+                        (["rejected"] * 5, count), "类型错误的操作应被拒绝而不是抛出异常")
+
+    results = service.push([{"op": "add", "ref": -2, "description": "临时任务"},
+                            {"op": "done", "id": -2}])
+    tester.assert_equal(manager._find_task(results[0]['id']).status, "done",
+                        "同一批操作可以用临时ID引用新增的任务")
+
+    # 日志超出上限后，过旧的版本需要全量同步
+    for i in range(3):
+        manager.create(f"任务{i}")
+    tester.assert_true(service.pull(delta['version'], delta['epoch'])['full'],
+                       "版本早于日志范围时应全量同步")
+
+
+def test_batch(tester: TaskTester):
+    """测试26: 批量操作"""
+    print("\n测试26: 批量操作")
+    storage = DeltaRecordingStorage([
+        {"id": 1, "description": "任务1", "status": "pending"},
+        {"id": 2, "description": "任务2", "status": "pending"},
+        {"id": 3, "description": "任务3", "status": "done"},
+    ])
+    manager = TaskManager(storage=storage)
+    events = []
+    manager.add_listener(lambda event, task, previous: events.append(event))
+
+    with manager.batch():
+        manager.done(1)
+        with manager.batch():
+            manager.delete(3)
+        tester.assert_equal(len(storage.changes), 0, "batch()中不应写入存储")
+    tester.assert_equal(len(storage.changes), 1, "退出batch()时只应写入一次")
+    tester.assert_equal(events, ["done", "deleted"], "batch()中照常发出变更事件")
+
+    service = BatchService(manager)
+    response = service.apply([
+        {"op": "add", "description": "新任务", "priority": "High"},
+        {"op": "update", "id": 2, "description": "任务2（修改）", "category": "Work"},
+        {"op": "done", "id": 2},
+        {"op": "delete", "id": 1},
+    ])
+    tester.assert_true(response['applied'], "全部有效时应应用")
+    tester.assert_equal([r['success'] for r in response['results']], [True] * 4,
+                        "每个操作都应返回结果")
+    tester.assert_equal(len(storage.changes), 2, "一批操作只应写入一次")
+    task = manager._find_task(2)
+    tester.assert_equal((task.description, task.category, task.status),
+                        ("任务2（修改）", "Work", STATUS_DONE), "操作应按顺序应用")
+
+    response = service.apply([
+        {"op": "add", "description": "不应创建"},
+        {"op": "delete", "id": 2},
+        {"op": "done", "id": 2},
+        {"op": "update", "id": 4, "priority": "Urgent"},
+    ])
+    tester.assert_true(not response['applied'], "有无效操作时不应应用")
+    tester.assert_equal([r['success'] for r in response['results']], [True, True, False, False],
+                        "应指出无效的操作")
+    tester.assert_equal((len(manager.tasks), len(storage.changes)), (2, 2),
+                        "有无效操作时数据和存储都不应变化")
+    tester.assert_equal(manager.update(99, category="Work"), MSG_TASK_NOT_FOUND.format(task_id=99),
+                        "修改不存在的任务应返回错误")
+
+
+def test_concurrent_access(tester: TaskTester):
+    """测试27: 多线程写入与快照读取"""
+    print("\n测试27: 多线程访问")
+    manager = TaskManager(storage=MockTaskStorage())
+    manager.create("已有任务")
+
+    before = manager.snapshot()
+    manager.done(1)
+    tester.assert_equal(before.get(1).status, STATUS_PENDING, "已发布的快照不应随后续写入变化")
+    tester.assert_equal(manager.snapshot().get(1).status, STATUS_DONE, "写入后应发布新快照")
+    try:
+        before.get(1).status = STATUS_DONE
+        tester.assert_true(False, "快照中的任务应只读")
+    except AttributeError:
+        tester.assert_true(True, "快照中的任务应只读")
+
+    # batch() 持有写锁，其他线程在退出前只看到旧快照
+    seen = []
+    with manager.batch():
+        manager.create("批量任务")
+        reader = threading.Thread(target=lambda: seen.append(len(manager.snapshot())))
+        reader.start()
+        reader.join()
+    tester.assert_equal((seen, len(manager.snapshot())), ([1], 2), "批量修改退出后才对其他线程可见")
+
+    errors = []
+
+    def writer(worker):
+        try:
+            for i in range(50):
+                task = manager.create(f"任务{worker}-{i}")
+                if i % 2:
+                    manager.done(task.id)
+                if i % 5 == 0:
+                    manager.delete(task.id)
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(200):
+                snapshot = manager.snapshot()
+                tasks = snapshot.sorted_tasks(status=STATUS_PENDING)
+                assert all(task.status == STATUS_PENDING for task in tasks)
+                manager.analyzer.get_statistics()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    threads += [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    tester.assert_equal(errors, [], "并发读写不应出错")
+    ids = [task.id for task in manager.tasks]
+    tester.assert_equal((len(ids), len(set(ids))), (2 + 4 * 40, 2 + 4 * 40), "并发创建的ID应唯一")
+    tester.assert_equal(manager.analyzer.get_statistics()['total'], len(ids),
+                        "并发写入后统计应与任务数一致")
+    tester.assert_equal(len(manager.snapshot()), len(ids), "最终快照应包含全部任务")
+
+
+def test_shared_storage(tester: TaskTester):
+    """测试28: 多进程共享存储"""
+    print("\n测试28: 多进程共享存储")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        factories = {
+            "JSON": lambda: JSONTaskStorage(os.path.join(tmpdir, "tasks.json")),
+            "WAL": lambda: WALTaskStorage(os.path.join(tmpdir, "tasks.wal.json"), background=False),
+            "SQLite": lambda: SQLiteTaskStorage(os.path.join(tmpdir, "tasks.db")),
+        }
+        for name, factory in factories.items():
+            # 两个管理器各自使用独立的存储对象，模拟两个工作进程
+            a = TaskManager(storage=factory(), shared=True)
+            b = TaskManager(storage=factory(), shared=True)
+            events = []
+            a.add_listener(lambda event, task, previous: events.append((event, task.id)))
+
+            a.create("进程A的任务")
+            b.create("进程B的任务")
+            tester.assert_equal([task.id for task in a.tasks], [1, 2],
+                                f"{name}: 应看到其他进程新增的任务且ID不重复")
+            tester.assert_equal(events, [("added", 1), ("added", 2)],
+                                f"{name}: 其他进程的修改应作为变更事件通知")
+
+            b.done(1)
+            b.delete(2)
+            snapshot = a.snapshot()
+            tester.assert_equal((len(snapshot), snapshot.get(1).status), (1, STATUS_DONE),
+                                f"{name}: 快照应反映其他进程的修改")
+            stats = a.analyzer.get_statistics()
+            tester.assert_equal((stats['total'], stats['completed']), (1, 1),
+                                f"{name}: 统计应随重新加载增量更新")
+            created = a.analyzer.get_timeseries()[-1]['created']
+            tester.assert_equal(created, 2, f"{name}: 每日汇总不应重复计入其他进程的修改")
+
+            loads = []
+            original_load = a.storage.load
+            a.storage.load = lambda: (loads.append(1), original_load())[1]
+            a.snapshot()
+            a.create("再次新增")
+            tester.assert_equal(loads, [], f"{name}: 存储未被其他进程修改时不应重新加载")
+            tester.assert_equal(b.snapshot().get(3).description, "再次新增",
+                                f"{name}: 新ID应在各进程间单调递增")
+            for manager in (a, b):
+                close = getattr(manager.storage, 'close', None)
+                if close is not None:
+                    close()
+
+        # 事件流按进程计数：重连到另一个进程时，序号可能恰好存在但含义不同，
+        # 靠epoch识别并要求客户端重新拉取
+        path = os.path.join(tmpdir, "events.json")
+        a = TaskManager(storage=JSONTaskStorage(path), shared=True)
+        b = TaskManager(storage=JSONTaskStorage(path), shared=True)
+        feed_a, feed_b = EventFeed(), EventFeed()
+        a.add_listener(feed_a.on_event)
+        b.add_listener(feed_b.on_event)
+        a.create("进程A的任务")
+        b.snapshot()
+        epoch, seq = EventFeed.parse_event_id(feed_a.event_id(feed_a.seq))
+        a.create("客户端断线期间的任务")
+        tester.assert_equal((seq, feed_b.seq, feed_b.since(seq)), (1, 1, []),
+                            "只比较序号时另一个进程会误以为客户端没有错过事件")
+        tester.assert_equal(feed_b.wait(seq, 0.01, epoch), None,
+                            "连到另一个进程（epoch不同）时应发送reset")
+        tester.assert_equal([e['task']['id'] for e in feed_a.since(seq, epoch)], [2],
+                            "连回原进程时应正常续传")
+
+        # 跨进程锁：同一锁文件的两个锁对象互斥
+        first = JSONTaskStorage(os.path.join(tmpdir, "lock.json"))
+        second = JSONTaskStorage(os.path.join(tmpdir, "lock.json"))
+        acquired = []
+
+        def take_lock():
+            with second.lock():
+                acquired.append(1)
+
+        with first.lock():
+            thread = threading.Thread(target=take_lock)
+            thread.start()
+            thread.join(0.1)
+            tester.assert_equal(acquired, [], "锁被持有时其他进程应等待")
+        thread.join(1)
+        tester.assert_equal(acquired, [1], "锁释放后其他进程应获得锁")
+
+        # 真实的多个进程同时写入同一文件
+        path = os.path.join(tmpdir, "processes.json")
+        workers = [multiprocessing.Process(target=_shared_storage_worker, args=(path, 20))
+                   for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+        ids = [task.id for task in TaskManager(path, shared=True).tasks]
+        tester.assert_equal(sorted(ids), list(range(1, 61)), "多个进程同时写入不应丢失修改或重复分配ID")
+
+
+def test_paging(tester: TaskTester):
+    """测试29: 分页与过滤"""
+    print("\n测试29: 分页与过滤")
+    data = []
+    for i in range(1, 41):
+        data.append({
+            "id": i, "description": f"任务{i}", "priority": ("High", "Medium", "Low")[i % 3],
+            "category": "Work" if i % 2 else "Study",
+            "status": "done" if i % 4 == 0 else "pending",
+            "createdAt": f"2024-01-{(i - 1) % 28 + 1:02d}T08:00:00Z",
+            "completedAt": f"2024-02-{i // 4:02d}T08:00:00Z" if i % 4 == 0 else None,
+        })
+    manager = TaskManager(storage=MockTaskStorage(data))
+    snapshot = manager.snapshot()
+    expected = [t.id for t in manager.sorted_tasks()]
+
+    def collect(limit, **criteria):
+        ids, after = [], None
+        while True:
+            page = snapshot.page(limit=limit, after=after, **criteria)
+            ids.extend(t.id for t in page.tasks)
+            if page.next_key is None:
+                return ids, page.total
+            after = page.next_key
+
+    tester.assert_equal(collect(7), (expected, 40), "逐页读取应得到完整的有序列表")
+    page = snapshot.page(limit=40)
+    tester.assert_equal((len(page.tasks), page.next_key), (40, None), "最后一页不应返回下一页起点")
+
+    pending_work = [t.id for t in manager.sorted_tasks()
+                    if t.status == STATUS_PENDING and t.category == "Work"]
+    tester.assert_equal(collect(3, status=STATUS_PENDING, category="Work"),
+                        (pending_work, len(pending_work)), "过滤后分页应保持顺序")
+    tester.assert_equal(collect(5, status=STATUS_PENDING)[0],
+                        [t.id for t in manager.sorted_tasks() if t.status == STATUS_PENDING],
+                        "宽过滤条件沿有序索引扫描也应得到相同结果")
+
+    created = (to_epoch_us("2024-01-05"), to_epoch_us("2024-01-08"))
+    ids, total = collect(2, created=created)
+    tester.assert_equal(sorted(ids), [5, 6, 7, 33, 34, 35], "应按创建时间范围过滤（含起不含止）")
+    completed = (to_epoch_us("2024-02-03"), None)
+    ids, _ = collect(None, completed=completed, category="Study")
+    tester.assert_equal(sorted(ids), [12, 16, 20, 24, 28, 32, 36, 40],
+                        "应按完成时间范围过滤，只包含已完成任务")
+
+    # keyset分页：翻页期间的增删不影响其余任务
+    first = snapshot.page(limit=10)
+    manager.delete(first.tasks[-1].id)
+    manager.delete(expected[15])
+    manager.create("新的高优先级任务", priority="High")
+    rest = manager.snapshot().page(after=first.next_key)
+    tester.assert_equal([t.id for t in rest.tasks],
+                        [i for i in expected[10:] if i != expected[15]],
+                        "上一页之后的任务不应因删除或新增而跳过或重复")
+    tester.assert_equal(snapshot.page(status="unknown").tasks, [], "没有匹配任务时返回空页")
+
+
+def test_conditional_get(tester: TaskTester):
+    """测试30: Web接口的ETag与条件GET"""
+    print("\n测试30: Web接口的ETag与条件GET")
+    client = _import_app().app.test_client()
+    client.post('/api/tasks', json={'description': '写周报'})
+
+    response = client.get('/api/tasks?status=pending')
+    etag = response.headers.get('ETag')
+    tester.assert_equal((response.status_code, bool(etag)), (200, True), "GET应返回200和ETag")
+
+    response = client.get('/api/tasks?status=pending', headers={'If-None-Match': etag})
+    tester.assert_equal((response.status_code, response.get_data()), (304, b""),
+                        "ETag未变化时应返回304且没有响应体")
+    tester.assert_equal(response.headers.get('ETag'), etag, "304响应应带相同的ETag")
+
+    other = client.get('/api/tasks?status=done', headers={'If-None-Match': etag})
+    tester.assert_equal(other.status_code, 200, "不同的查询参数不应共用ETag")
+
+    response = client.post('/api/tasks', json={'description': '整理笔记'})
+    tester.assert_equal(response.status_code, 200, "新增任务应成功")
+    response = client.get('/api/tasks?status=pending', headers={'If-None-Match': etag})
+    tester.assert_equal(response.status_code, 200, "修改后旧ETag应失效并返回200")
+    tester.assert_true(response.headers.get('ETag') not in (None, etag), "修改后应返回新的ETag")
+    tester.assert_equal(len(response.get_json()['tasks']), 2, "修改后应返回最新的任务列表")
+
+
+def test_field_validation(tester: TaskTester):
+    """测试31: 写入时校验优先级和分类"""
+    print("\n测试31: 写入时校验优先级和分类")
+    manager = TaskManager(storage=MockTaskStorage())
+    task = manager.create("写周报")
+    version = manager.version
+    for kwargs in ({"priority": 3}, {"priority": "Urgent"}, {"category": ["a"]},
+                   {"category": ""}):
+        for action in (lambda: manager.create("坏数据", **kwargs),
+                       lambda: manager.update(task.id, **kwargs)):
+            try:
+                action()
+                tester.assert_true(False, f"{kwargs} 应被拒绝")
+            except ValueError:
+                tester.assert_true(True, f"{kwargs} 应被拒绝")
+    tester.assert_equal((len(manager.tasks), manager.version, len(manager.snapshot())),
+                        (1, version, 1), "校验失败时不应修改任何状态")
+    tester.assert_equal((task.priority, task.category), ("Medium", "General"),
+                        "校验失败时任务字段保持不变")
+
+    client = _import_app().app.test_client()
+    before = len(client.get('/api/tasks').get_json()['tasks'])
+    for payload in ({"priority": 3}, {"category": ["a"]}, {"priority": "Urgent!!"}):
+        response = client.post('/api/tasks', json=dict(payload, description="坏数据"))
+        tester.assert_equal(response.status_code, 400, f"POST {payload} 应返回400")
+    tester.assert_equal(len(client.get('/api/tasks').get_json()['tasks']), before,
+                        "被拒绝的任务不应写入")
+    response = client.post('/api/sync', json={"ops": [{"op": "done", "id": [1]},
+                                                      {"op": "add", "description": "坏数据",
+                                                       "priority": "Urgent!!"}]})
+    statuses = [r['status'] for r in response.get_json()['results']]
+    tester.assert_equal((response.status_code, statuses), (200, ["rejected", "rejected"]),
+                        "同步接口应拒绝类型错误的操作")
+
+
+def _import_app():
+    """导入 app 模块：导入时按 HOME 创建默认存储，指向临时目录以免读写用户的任务文件"""
+    home = os.environ.get('HOME')
+    os.environ['HOME'] = tempfile.mkdtemp()
+    try:
+        import app
+    finally:
+        if home is None:
+            del os.environ['HOME']
+        else:
+            os.environ['HOME'] = home
+    return app
+
+
+def _shared_storage_worker(path: str, count: int):
+    """测试28的工作进程：在共享存储中新增任务"""
+    manager = TaskManager(path, shared=True)
+    for i in range(count):
+        manager.create(f"进程{os.getpid()}-{i}")
+
+
 # ==================== 运行测试 ====================
 
 def run_all_tests():
@@ -306,6 +1180,25 @@ def run_all_tests():
         test_storage_operations(tester)
         test_mark_already_done(tester)
         test_id_auto_increment(tester)
+        test_wal_storage(tester)
+        test_wal_compaction_threshold(tester)
+        test_sqlite_storage(tester)
+        test_json_backup_rotation(tester)
+        test_dirty_tracking(tester)
+        test_write_behind(tester)
+        test_id_not_reused(tester)
+        test_secondary_index(tester)
+        test_task_slots(tester)
+        test_schema_migration(tester)
+        test_sorted_order(tester)
+        test_event_feed(tester)
+        test_delta_sync(tester)
+        test_batch(tester)
+        test_concurrent_access(tester)
+        test_shared_storage(tester)
+        test_paging(tester)
+        test_conditional_get(tester)
+        test_field_validation(tester)
 
     finally:
         pass  # Mock存储自动清理
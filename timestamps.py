@@ -0,0 +1,40 @@
+"""
+任务管理CLI工具 - 时间戳转换
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def now_iso() -> str:
+    """生成当前时间的任务时间戳字符串"""
+    return datetime.now().isoformat() + "Z"
+
+
+def to_epoch_us(value: Optional[str]) -> Optional[int]:
+    """
+    任务时间戳字符串转换为epoch微秒
+
+    末尾的Z以及没有时区信息的时间均按UTC处理，
+    与Web端排序的解析方式一致。无法解析时返回None。
+    """
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    delta = dt - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def from_epoch_us(value: Optional[int]) -> Optional[str]:
+    """epoch微秒转换回任务时间戳字符串"""
+    if value is None:
+        return None
+    dt = datetime.fromtimestamp(value // 1000000, tz=timezone.utc).replace(
+        microsecond=value % 1000000, tzinfo=None
+    )
+    return dt.isoformat() + "Z"
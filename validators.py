@@ -4,9 +4,11 @@
 
 from typing import Dict, List
 from constants import (
-    FIELD_ID, FIELD_DESCRIPTION, FIELD_STATUS,
+    FIELD_ID, FIELD_DESCRIPTION, FIELD_STATUS, FIELD_PRIORITY, FIELD_CATEGORY,
     VALID_STATUSES, ERR_MISSING_FIELD, ERR_INVALID_ID_TYPE,
-    ERR_INVALID_DESC_TYPE, ERR_INVALID_STATUS
+    ERR_INVALID_DESC_TYPE, ERR_INVALID_STATUS,
+    ERR_INVALID_PRIORITY_TYPE, ERR_INVALID_CATEGORY_TYPE,
+    ERR_INVALID_PRIORITY, ERR_INVALID_CATEGORY, PRIORITIES
 )
 
 
@@ -55,6 +57,22 @@ class TaskValidator:
         if data[FIELD_STATUS] not in VALID_STATUSES:
             raise ValueError(ERR_INVALID_STATUS)
 
+        # 验证优先级和分类类型（可选字段）
+        if FIELD_PRIORITY in data and not isinstance(data[FIELD_PRIORITY], str):
+            raise ValueError(ERR_INVALID_PRIORITY_TYPE)
+
+        if FIELD_CATEGORY in data and not isinstance(data[FIELD_CATEGORY], str):
+            raise ValueError(ERR_INVALID_CATEGORY_TYPE)
+
+    @staticmethod
+    def validate_priority_category(priority=None, category=None):
+        """验证要写入的优先级和分类（None 表示不修改），无效时抛出异常"""
+        if priority is not None and priority not in PRIORITIES:
+            raise ValueError(ERR_INVALID_PRIORITY.format(choices="/".join(PRIORITIES)))
+
+        if category is not None and (not isinstance(category, str) or not category):
+            raise ValueError(ERR_INVALID_CATEGORY)
+
     @staticmethod
     def validate_create_params(task_id: int, description: str):
         """验证创建任务参数"""
@@ -0,0 +1,145 @@
+"""
+向量化统计引擎 - 面向大批量导出任务的离线分析
+
+需要 numpy（pip install -r requirements_analytics.txt）。
+"""
+
+from typing import Dict, Iterable
+
+from constants import (
+    STATUS_PENDING, STATUS_DONE, ERR_NUMPY_REQUIRED
+)
+from task_table import TaskTable, NO_TIMESTAMP
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class VectorizedTaskStatistics:
+    """向量化任务统计
+
+    直接以 TaskTable 的列（状态/分类/优先级编码、epoch时间戳）
+    作为 numpy 数组（零拷贝），用 bincount 一次得到计数、分布和交叉表。
+    get_statistics() 的结果与 TaskAnalyzerService.get_statistics 结构相同。
+    """
+
+    def __init__(self, table: TaskTable):
+        """
+        初始化向量化统计
+
+        Args:
+            table: 列式任务表
+
+        Raises:
+            ImportError: 未安装numpy
+        """
+        if np is None:
+            raise ImportError(ERR_NUMPY_REQUIRED)
+
+        self.table = table
+        self.status = np.frombuffer(table.status_codes, dtype=np.uint8)
+        self.category = np.frombuffer(table.category_codes, dtype=np.uint16)
+        self.priority = np.frombuffer(table.priority_codes, dtype=np.uint8)
+        self.created_us = np.frombuffer(table.created_us, dtype=np.int64)
+        self.completed_us = np.frombuffer(table.completed_us, dtype=np.int64)
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable) -> 'VectorizedTaskStatistics':
+        """从任务对象构建"""
+        return cls(TaskTable.from_tasks(tasks))
+
+    @classmethod
+    def from_dicts(cls, records: Iterable[Dict]) -> 'VectorizedTaskStatistics':
+        """从导出的任务字典构建"""
+        return cls(TaskTable.from_dicts(records))
+
+    def get_statistics(self) -> Dict:
+        """
+        获取完整统计数据
+
+        Returns:
+            {total, completed, pending, completion_rate, by_category, by_priority}
+        """
+        total = int(self.status.size)
+        status_counts = self._bincount(self.status, len(self.table.statuses.values))
+        completed = self._count_of(status_counts, self.table.statuses, STATUS_DONE)
+        pending = self._count_of(status_counts, self.table.statuses, STATUS_PENDING)
+
+        return {
+            'total': total,
+            'completed': completed,
+            'pending': pending,
+            'completion_rate': (completed / total) * 100 if total else 0.0,
+            'by_category': self._distribution(self.category, self.table.categories),
+            'by_priority': self._distribution(self.priority, self.table.priorities),
+        }
+
+    def get_cross_tabs(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """
+        交叉统计
+
+        Returns:
+            {'category_status': {分类: {状态: 数量}},
+             'priority_status': {优先级: {状态: 数量}},
+             'category_priority': {分类: {优先级: 数量}}}
+        """
+        return {
+            'category_status': self._cross_tab(self.category, self.table.categories,
+                                               self.status, self.table.statuses),
+            'priority_status': self._cross_tab(self.priority, self.table.priorities,
+                                               self.status, self.table.statuses),
+            'category_priority': self._cross_tab(self.category, self.table.categories,
+                                                 self.priority, self.table.priorities),
+        }
+
+    def get_completion_hours(self) -> Dict[str, float]:
+        """
+        已完成任务的耗时统计（小时）
+
+        Returns:
+            {count, mean, median, max}，没有可计算的任务时均为0
+        """
+        mask = (self.completed_us != NO_TIMESTAMP) & (self.created_us != NO_TIMESTAMP)
+        hours = (self.completed_us[mask] - self.created_us[mask]) / 3.6e9
+        if hours.size == 0:
+            return {'count': 0, 'mean': 0.0, 'median': 0.0, 'max': 0.0}
+        return {
+            'count': int(hours.size),
+            'mean': float(hours.mean()),
+            'median': float(np.median(hours)),
+            'max': float(hours.max()),
+        }
+
+    @staticmethod
+    def _bincount(codes, size: int):
+        return np.bincount(codes, minlength=size)
+
+    @staticmethod
+    def _count_of(counts, codebook, value: str) -> int:
+        code = codebook.code_of(value)
+        if code is None or code >= counts.size:
+            return 0
+        return int(counts[code])
+
+    def _distribution(self, codes, codebook) -> Dict[str, int]:
+        """各取值的数量（只包含出现过的取值）"""
+        counts = self._bincount(codes, len(codebook.values))
+        return {codebook.decode(code): int(n) for code, n in enumerate(counts) if n}
+
+    def _cross_tab(self, rows, row_codebook, cols, col_codebook) -> Dict[str, Dict[str, int]]:
+        """两列组合编码后一次bincount得到交叉表"""
+        n_rows = len(row_codebook.values)
+        n_cols = len(col_codebook.values)
+        combined = rows.astype(np.int64) * n_cols + cols
+        matrix = self._bincount(combined, n_rows * n_cols).reshape(n_rows, n_cols)
+
+        result = {}
+        for row_code in np.nonzero(matrix.sum(axis=1))[0]:
+            row = matrix[row_code]
+            result[row_codebook.decode(int(row_code))] = {
+                col_codebook.decode(int(col_code)): int(row[col_code])
+                for col_code in np.nonzero(row)[0]
+            }
+        return result